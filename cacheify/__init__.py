@@ -0,0 +1,10 @@
+__all__ = ['cached']
+
+def __getattr__(name):
+    # `cached` is imported on first use, so importing a submodule such as the cache factory
+    # does not load the decorators and the modules they depend on
+    if name == 'cached':
+        from .cache.decorators import cached
+        globals()['cached'] = cached
+        return cached
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
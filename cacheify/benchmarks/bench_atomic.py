@@ -0,0 +1,52 @@
+"""
+Compares the atomic operations of RedisCache, one Lua script each, with the read-modify-write cycle
+they replace: a Redlock, a `get`, then a `set`.
+Requires a Redis server reachable through REDIS_URL (see docker-compose.yml).
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_atomic.py [--iterations N]
+"""
+import argparse
+from cacheify.cache.redis.redis_cache import RedisCache
+from harness import measure, print_table
+
+def run(iterations: int) -> None:
+    cache = RedisCache(key='bench:atomic')
+    cache.clear()
+    cache.preload_scripts()
+    keys = [f'key{i}' for i in range(1000)]
+
+    def locked_incr(i):
+        key = keys[i % 1000]
+        with cache.lock(key):
+            cache.set(key, (cache.get(key) or 0) + 1)
+
+    def locked_add(i):
+        key = keys[i % 1000]
+        with cache.lock(key):
+            if cache.get_many([key])[0] is None:
+                cache.set(key, i)
+
+    rows = {
+        'redlock get + set': measure(locked_incr, iterations),
+        'incr': measure(lambda i: cache.incr(keys[i % 1000]), iterations),
+        'redlock get + set if absent': measure(locked_add, iterations),
+        'add': measure(lambda i: cache.add(keys[i % 1000], i), iterations),
+        'get_or_set': measure(lambda i: cache.get_or_set(keys[i % 1000], i), iterations),
+    }
+    cache.set_many({key: 0 for key in keys})
+
+    def compare_and_set(i):
+        key = keys[i % 1000]
+        value, version = cache.get_with_version(key)
+        cache.compare_and_set(key, value + 1, version)
+
+    rows['get_with_version + compare_and_set'] = measure(compare_and_set, iterations)
+    print_table('RedisCache read-modify-write', rows)
+    cache.clear()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,50 @@
+"""
+Measures how long clearing a large cache takes: a blocking `DEL` of the Redis hash against `RedisCache.clear`,
+which unlinks it, and the row-by-row delete of the SQLite table against `DiskCache.clear`, which truncates it.
+The Redis timings are how long the server is blocked for every client.
+Requires a Redis server reachable through REDIS_URL (see docker-compose.yml).
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_clear.py [--entries N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from cacheify.cache.disk.disk_cache import DiskCache
+from cacheify.cache.redis.redis_cache import RedisCache
+
+def timed(operation) -> float:
+    started = time.perf_counter()
+    operation()
+    return time.perf_counter() - started
+
+def delete_rows(disk: DiskCache) -> None:
+    with disk._transaction() as db:
+        db.execute('DELETE FROM entries')
+
+def run(entries: int) -> None:
+    mapping = {f'key{i}': 'x' * 100 for i in range(entries)}
+    cache = RedisCache(key='bench:clear')
+    rows = {}
+    cache.set_many(mapping)
+    rows['redis DEL'] = timed(lambda: cache._redis.delete(*cache._keys))
+    cache.set_many(mapping)
+    rows['RedisCache.clear (UNLINK)'] = timed(cache.clear)
+    with tempfile.TemporaryDirectory() as directory:
+        disk = DiskCache(path=os.path.join(directory, 'bench.sqlite'), compaction_interval=None)
+        disk.set_many(mapping)
+        rows['sqlite DELETE with triggers'] = timed(lambda: delete_rows(disk))
+        disk.set_many(mapping)
+        rows['DiskCache.clear (truncate)'] = timed(disk.clear)
+        disk.close()
+    print(f'Clearing {entries:,} entries')
+    print(f"{'case':<32}{'ms':>12}")
+    for name, seconds in rows.items():
+        print(f'{name:<32}{seconds * 1000:>12.2f}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=500000)
+    args = parser.parse_args()
+    run(args.entries)
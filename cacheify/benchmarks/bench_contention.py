@@ -0,0 +1,37 @@
+"""
+Measures LocalCache throughput under thread contention with a single lock stripe, the former
+global lock, against the default lock stripes, on a mixed workload of 90% reads and 10% writes.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_contention.py [--iterations N] [--threads 1,8,32]
+"""
+import argparse
+from cacheify.cache.local.local_cache import LocalCache
+from harness import measure_threaded, print_table
+
+def run(iterations: int, thread_counts: list) -> None:
+    keys = [f'key{i}' for i in range(10000)]
+    value = {'id': 1, 'name': 'cacheify'}
+    for threads in thread_counts:
+        rows = {}
+        for stripes in (1, LocalCache.DEFAULT_STRIPES):
+            cache = LocalCache(key='bench:contention', stripes=stripes)
+            cache.set_many({key: value for key in keys})
+
+            def mixed(i):
+                key = keys[(i * 7919) % 10000]
+                if i % 10:
+                    cache.get(key)
+                else:
+                    cache.set(key, value)
+
+            rows[f'stripes={stripes} mixed'] = measure_threaded(mixed, iterations, threads)
+        print_table(f'{threads} threads', rows)
+        print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--threads', type=lambda text: [int(item) for item in text.split(',')], default=[1, 8, 32])
+    args = parser.parse_args()
+    run(args.iterations, args.threads)
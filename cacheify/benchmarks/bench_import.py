@@ -0,0 +1,62 @@
+"""
+Measures the cold-start cost of importing cacheify modules with `python -X importtime`, each in a fresh
+interpreter, and lists the optional backend dependencies they pull in. Exits with status 1 if importing the
+factory loads a backend dependency or takes longer than `--max-ms`, so it can guard startup regressions in CI.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_import.py [--runs N] [--max-ms MS]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULES = [
+    'cacheify',
+    'cacheify.cache.cache_factory',
+    'cacheify.cache.local.local_cache',
+    'cacheify.cache.disk.disk_cache',
+    'cacheify.cache.redis.redis_cache',
+]
+
+# Imported by some backends only, so the factory must not import them
+BACKEND_DEPENDENCIES = ('redis', 'pottery', 'fakeredis', 'cachetools')
+
+def import_time(module: str) -> Tuple[float, List[str]]:
+    """Imports `module` in a new interpreter. Returns its cumulative import time in ms and the dependencies it loaded."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env, check=True)
+    # Lines read 'import time: self [us] | cumulative | imported package', nested imports being indented
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    loaded = [name for name in BACKEND_DEPENDENCIES if name in times]
+    return times[module] / 1000, loaded
+
+def run(runs: int, max_ms: float) -> bool:
+    print(f"{'module':<40}{'best (ms)':>12}  backend dependencies")
+    passed = True
+    for module in MODULES:
+        samples = [import_time(module) for _ in range(runs)]
+        best = min(milliseconds for milliseconds, _ in samples)
+        loaded = samples[0][1]
+        print(f"{module:<40}{best:>12.1f}  {', '.join(loaded) or '-'}")
+        if module == 'cacheify.cache.cache_factory' and (loaded or best > max_ms):
+            passed = False
+    return passed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    # The factory imports in about 35 ms on a developer machine, so the budget leaves room for CI noise only
+    parser.add_argument('--max-ms', type=float, default=50.0, help='The import time budget of the factory')
+    args = parser.parse_args()
+    if not run(args.runs, args.max_ms):
+        print('cacheify.cache.cache_factory exceeds its import budget', file=sys.stderr)
+        sys.exit(1)
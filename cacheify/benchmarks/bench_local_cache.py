@@ -0,0 +1,54 @@
+"""
+Compares the native LocalCache engine against the former fakeredis + pottery RedisDict path.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_local_cache.py [--iterations N]
+"""
+import argparse
+import fakeredis
+from pottery import RedisDict
+from cacheify.cache.local.local_cache import LocalCache
+from harness import measure, print_table
+
+VALUES = {
+    'str': 'value',
+    'dict': {'id': 1, 'name': 'cacheify', 'tags': ['a', 'b', 'c']},
+}
+
+def run(iterations: int) -> None:
+    for value_name, value in VALUES.items():
+        fake_dict = RedisDict(redis=fakeredis.FakeStrictRedis(server=fakeredis.FakeServer()), key='bench')
+        local_cache = LocalCache(key='bench')
+        keys = [f'key{i}' for i in range(1000)]
+        for key in keys:
+            fake_dict[key] = value
+            local_cache.set(key, value)
+
+        def fake_set(i):
+            fake_dict[keys[i % 1000]] = value
+
+        def fake_get(i):
+            return fake_dict.get(keys[i % 1000])
+
+        def local_set(i):
+            local_cache.set(keys[i % 1000], value)
+
+        def local_get(i):
+            return local_cache.get(keys[i % 1000])
+
+        rows = {
+            'fakeredis RedisDict set': measure(fake_set, iterations),
+            'fakeredis RedisDict get': measure(fake_get, iterations),
+            'LocalCache set': measure(local_set, iterations),
+            'LocalCache get': measure(local_get, iterations),
+        }
+        print_table(f'value={value_name}', rows)
+        for op in ('set', 'get'):
+            speedup = rows[f'LocalCache {op}']['ops_per_sec'] / rows[f'fakeredis RedisDict {op}']['ops_per_sec']
+            print(f'LocalCache {op} speedup: {speedup:.1f}x')
+        print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    run(parser.parse_args().iterations)
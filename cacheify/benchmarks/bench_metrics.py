@@ -0,0 +1,37 @@
+"""
+Measures the cost of the metrics instrumentation on LocalCache operations: a cache that was never
+instrumented, an instrumented one, and one instrumented then uninstrumented, which must match the first.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_metrics.py [--iterations N]
+"""
+import argparse
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.metrics import instrument, uninstrument
+from harness import measure, print_table
+
+def run(iterations: int) -> None:
+    plain = LocalCache(key='bench:plain')
+    instrumented = LocalCache(key='bench:instrumented')
+    instrument(instrumented)
+    disabled = LocalCache(key='bench:disabled')
+    instrument(disabled)
+    uninstrument(disabled)
+    keys = [f'key{i}' for i in range(1000)]
+    caches = {'plain': plain, 'instrumented': instrumented, 'uninstrumented': disabled}
+    rows = {}
+    for name, cache in caches.items():
+        for key in keys:
+            cache.set(key, 'value')
+        rows[f'{name} get'] = measure(lambda i, cache=cache: cache.get(keys[i % 1000]), iterations)
+        rows[f'{name} set'] = measure(lambda i, cache=cache: cache.set(keys[i % 1000], 'value'), iterations)
+    print_table('LocalCache metrics overhead', rows)
+    for op in ('get', 'set'):
+        for name in ('instrumented', 'uninstrumented'):
+            overhead = rows['plain ' + op]['ops_per_sec'] / rows[f'{name} {op}']['ops_per_sec'] - 1
+            print(f'{name} {op} overhead: {overhead:+.1%}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50000)
+    run(parser.parse_args().iterations)
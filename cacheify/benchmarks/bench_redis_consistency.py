@@ -0,0 +1,65 @@
+"""
+Compares RedisCache consistency modes against a raw redis client.
+Requires a Redis server reachable through REDIS_URL (see docker-compose.yml).
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_redis_consistency.py [--iterations N] [--threads N]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cacheify.cache.redis.redis_cache import CONSISTENCY_MODES, RedisCache
+from harness import measure, print_table
+
+def threaded_ops_per_sec(operation, iterations: int, threads: int) -> float:
+    per_thread = max(1, iterations // threads)
+
+    def worker(offset):
+        for i in range(per_thread):
+            operation(offset + i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(0, per_thread * threads, per_thread)))
+    return per_thread * threads / (time.perf_counter() - started)
+
+def run(iterations: int, threads: int) -> None:
+    rows = {}
+    throughput = {}
+    keys = [f'key{i}' for i in range(1000)]
+    for mode in CONSISTENCY_MODES:
+        cache = RedisCache(key=f'bench:{mode}', consistency=mode)
+        cache.clear()
+        for key in keys:
+            cache.set(key, 'value')
+
+        def get(i):
+            return cache.get(keys[i % 1000])
+
+        def set(i):
+            cache.set(keys[i % 1000], 'value')
+
+        rows[f'{mode} get'] = measure(get, iterations, warmup=100)
+        rows[f'{mode} set'] = measure(set, iterations, warmup=100)
+        throughput[f'{mode} get x{threads} threads'] = threaded_ops_per_sec(get, iterations, threads)
+        cache.clear()
+
+    raw = RedisCache(key='bench:raw')._redis
+    raw.hset('bench:raw', mapping={key: '"value"' for key in keys})
+    rows['raw client HGET'] = measure(lambda i: raw.hget('bench:raw', keys[i % 1000]), iterations, warmup=100)
+    throughput[f'raw client HGET x{threads} threads'] = threaded_ops_per_sec(
+        lambda i: raw.hget('bench:raw', keys[i % 1000]), iterations, threads
+    )
+    raw.delete('bench:raw')
+
+    print_table('RedisCache consistency modes', rows)
+    print()
+    for name, ops in throughput.items():
+        print(f'{name:<44}{ops:>14,.0f} ops/sec')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    run(args.iterations, args.threads)
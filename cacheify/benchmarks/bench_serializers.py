@@ -0,0 +1,58 @@
+"""
+Compares the bytes stored and the encode/decode time of every serializer and compression pair.
+Codecs whose optional package is not installed are skipped.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_serializers.py [--iterations N]
+"""
+import argparse
+import random
+import string
+from cacheify.cache.redis.encoding import encode
+from cacheify.cache.serializers import COMPRESSORS, SERIALIZERS, CacheCodec
+from harness import measure
+
+def make_value(size: int) -> dict:
+    """Builds a JSON document of roughly `size` bytes, mixing repetitive and random text like typical API payloads."""
+    rng = random.Random(size)
+    items, total = [], 0
+    while total < size:
+        item = {
+            'id': len(items),
+            'name': ''.join(rng.choices(string.ascii_letters, k=12)),
+            'status': rng.choice(['active', 'pending', 'disabled']),
+            'score': rng.random(),
+            'tags': rng.sample(['alpha', 'beta', 'gamma', 'delta', 'epsilon'], 3),
+        }
+        items.append(item)
+        total += len(encode(item))
+    return {'items': items, 'total': len(items)}
+
+def codecs() -> dict:
+    available = {}
+    for serializer in SERIALIZERS:
+        for compression in (None, *COMPRESSORS):
+            try:
+                available[f'{serializer}+{compression or "none"}'] = CacheCodec(serializer, compression)
+            except ImportError:
+                pass
+    return available
+
+def run(iterations: int) -> None:
+    for size in (20_000, 200_000):
+        value = make_value(size)
+        baseline = len(encode(value).encode())
+        print(f'value size ~{size // 1000} KB (plain JSON: {baseline:,} bytes)')
+        print(f"{'codec':<24}{'bytes':>12}{'ratio':>8}{'encode p50 (us)':>18}{'decode p50 (us)':>18}")
+        for name, codec in codecs().items():
+            payload = codec.encode(value)
+            encoded = measure(lambda i: codec.encode(value), iterations, warmup=iterations // 10)
+            decoded = measure(lambda i: codec.decode(payload), iterations, warmup=iterations // 10)
+            print(f"{name:<24}{len(payload):>12,}{len(payload) / baseline:>8.2f}"
+                  f"{encoded['p50_us']:>18.1f}{decoded['p50_us']:>18.1f}")
+        print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    run(parser.parse_args().iterations)
@@ -0,0 +1,138 @@
+"""
+Measures the throughput and p50/p99 latency of get, set, pop, keys and len on every backend,
+for each combination of value size, number of keys and number of threads, and writes the results
+as JSON. Given a baseline file from an earlier run, it reports the cases whose throughput dropped
+by more than the tolerance and exits with status 1, so CI can catch regressions.
+
+The 'redis' backend requires a Redis server reachable through REDIS_URL (see docker-compose.yml);
+it is skipped when the server cannot be reached.
+
+Usage (from the `cacheify` directory):
+    python benchmarks/bench_suite.py [--backends local,redis] [--value-sizes 16,1024,65536]
+        [--key-counts 100,10000] [--threads 1,8] [--iterations N]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+from redis.exceptions import ConnectionError as RedisConnectionError
+from cacheify.cache.cacheable import Cacheable
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.redis.redis_cache import RedisCache
+from harness import measure_threaded, print_table
+
+BACKENDS: Dict[str, Callable[[], Cacheable]] = {
+    'local': lambda: LocalCache(key='bench:suite'),
+    'redis': lambda: RedisCache(key='bench:suite'),
+}
+
+# keys() and len() walk the whole cache, so they run this many times fewer than the other operations
+BULK_DIVISOR = 100
+
+CASE_FIELDS = ('backend', 'operation', 'value_size', 'keys', 'threads')
+
+def case_id(result: dict) -> tuple:
+    return tuple(result[field] for field in CASE_FIELDS)
+
+def open_backend(name: str) -> Optional[Cacheable]:
+    cache = BACKENDS[name]()
+    try:
+        cache.clear()
+    except RedisConnectionError as error:
+        print(f'Skipping the {name} backend: {error}', file=sys.stderr)
+        return None
+    return cache
+
+def run_case(cache: Cacheable, value_size: int, key_count: int, threads: int, iterations: int) -> Dict[str, dict]:
+    value = 'x' * value_size
+    keys = [f'key{i}' for i in range(key_count)]
+    cache.clear()
+    for start in range(0, key_count, 1000):
+        cache.set_many({key: value for key in keys[start:start + 1000]})
+    bulk_iterations = max(5, iterations // BULK_DIVISOR)
+    results = {
+        'get': measure_threaded(lambda i: cache.get(keys[i % key_count]), iterations, threads, warmup=100),
+        'set': measure_threaded(lambda i: cache.set(keys[i % key_count], value), iterations, threads, warmup=100),
+        'keys': measure_threaded(lambda i: cache.keys(), bulk_iterations, threads, warmup=1),
+        'len': measure_threaded(lambda i: len(cache), bulk_iterations, threads, warmup=1),
+        # Every call pops a distinct key, so pop runs last and at most once per key
+        'pop': measure_threaded(lambda i: cache.pop(keys[i]), min(iterations, key_count), threads, warmup=0),
+    }
+    cache.clear()
+    return results
+
+def run(backends: List[str], value_sizes: List[int], key_counts: List[int], threads: List[int], iterations: int) -> List[dict]:
+    results = []
+    for backend in backends:
+        cache = open_backend(backend)
+        if cache is None:
+            continue
+        for value_size in value_sizes:
+            for key_count in key_counts:
+                for thread_count in threads:
+                    rows = run_case(cache, value_size, key_count, thread_count, iterations)
+                    print_table(f'{backend} value_size={value_size} keys={key_count} threads={thread_count}', rows)
+                    print()
+                    for operation, row in rows.items():
+                        results.append({
+                            'backend': backend, 'operation': operation, 'value_size': value_size,
+                            'keys': key_count, 'threads': thread_count, **row,
+                        })
+    return results
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Returns a description of every case whose throughput is more than `tolerance` below the baseline."""
+    previous = {case_id(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = previous.get(case_id(result))
+        if reference is None or not reference['ops_per_sec']:
+            continue
+        change = result['ops_per_sec'] / reference['ops_per_sec'] - 1
+        if change < -tolerance:
+            name = ' '.join(f'{field}={value}' for field, value in zip(CASE_FIELDS, case_id(result)))
+            regressions.append(
+                f'{name}: {result["ops_per_sec"]:,.0f} ops/sec vs {reference["ops_per_sec"]:,.0f} ({change:+.1%})'
+            )
+    return regressions
+
+def int_list(text: str) -> List[int]:
+    return [int(item) for item in text.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', type=lambda text: text.split(','), default=list(BACKENDS))
+    parser.add_argument('--value-sizes', type=int_list, default=[16, 1024, 65536])
+    parser.add_argument('--key-counts', type=int_list, default=[100, 10000])
+    parser.add_argument('--threads', type=int_list, default=[1, 8])
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the results with this JSON file from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='The tolerated throughput drop, 0.2 for 20%%')
+    args = parser.parse_args()
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f'Unknown backends: {sorted(unknown)}. Expected some of {list(BACKENDS)}')
+
+    results = run(args.backends, args.value_sizes, args.key_counts, args.threads, args.iterations)
+    if args.output:
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'results': results,
+        }
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No throughput regression beyond {args.tolerance:.0%}')
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Callable, Dict, List
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Returns the `pct` percentile (0-100) of an already sorted list of samples."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+def measure(operation: Callable[[int], object], iterations: int=10000, warmup: int=1000) -> Dict[str, float]:
+    """
+    Runs `operation(i)` for `iterations` rounds and reports throughput and latency.
+
+    Args:
+        operation (Callable[[int], object]): The operation to benchmark. It receives the iteration index.
+        iterations (int): The number of measured calls.
+        warmup (int): The number of unmeasured calls made before measuring.
+
+    Returns:
+        Dict[str, float]: The throughput in ops/sec and the p50/p99 latency in microseconds.
+    """
+    for i in range(warmup):
+        operation(i)
+    timer = time.perf_counter
+    samples = []
+    started = timer()
+    for i in range(iterations):
+        op_started = timer()
+        operation(i)
+        samples.append(timer() - op_started)
+    elapsed = timer() - started
+    samples.sort()
+    return {
+        'ops_per_sec': iterations / elapsed if elapsed else 0.0,
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+    }
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    print(title)
+    print(f"{'case':<32}{'ops/sec':>14}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, result in rows.items():
+        print(f"{name:<32}{result['ops_per_sec']:>14,.0f}{result['p50_us']:>12.2f}{result['p99_us']:>12.2f}")
+
+def measure_threaded(operation: Callable[[int], object], iterations: int=10000, threads: int=1, warmup: int=1000) -> Dict[str, float]:
+    """
+    Like `measure`, with `iterations` calls shared by `threads` threads started together.
+    The throughput counts the calls of every thread; the latencies are those of all the calls.
+    """
+    if threads <= 1:
+        return measure(operation, iterations, warmup)
+    for i in range(warmup):
+        operation(i)
+    per_thread = max(1, iterations // threads)
+    timer = time.perf_counter
+    samples: List[List[float]] = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        thread_samples = samples[index]
+        offset = index * per_thread
+        barrier.wait()
+        for i in range(offset, offset + per_thread):
+            op_started = timer()
+            operation(i)
+            thread_samples.append(timer() - op_started)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = timer()
+    for thread in workers:
+        thread.join()
+    elapsed = timer() - started
+    merged = sorted(sample for thread_samples in samples for sample in thread_samples)
+    return {
+        'ops_per_sec': len(merged) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(merged, 50) * 1e6,
+        'p99_us': percentile(merged, 99) * 1e6,
+    }
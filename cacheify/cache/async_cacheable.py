@@ -0,0 +1,192 @@
+import asyncio
+import inspect
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+from .cacheable import MISSING
+from .json_types import JSONType
+
+class SingleFlight:
+    """
+    SingleFlight hands out one `asyncio.Lock` per key, so that concurrent coroutines loading the same key
+    wait for the first one instead of all hitting the backing data source. Locks are dropped once unused.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, list] = {}  # key -> [lock, number of coroutines using it]
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        holder = self._locks.get(key)
+        if holder is None:
+            holder = self._locks[key] = [asyncio.Lock(), 0]
+        holder[1] += 1
+        try:
+            async with holder[0]:
+                yield
+        finally:
+            holder[1] -= 1
+            if not holder[1]:
+                del self._locks[key]
+
+class AsyncCacheable(ABC):
+    """
+    The asyncio counterpart of `Cacheable`. Every operation is a coroutine, so caches can be used
+    from an event loop without blocking it or hopping to a thread pool.
+    """
+
+    @property
+    @abstractmethod
+    def key(self) -> Any:
+        """
+        An abstract property for getting the cache key. Each subclass must implement this property.
+        """
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: JSONType, ttl: Optional[int]=None):
+        """
+        Set a JSON serializable value in the cache with an optional time-to-live (TTL).
+        See `Cacheable.set` for the TTL semantics.
+        """
+        pass
+
+    @abstractmethod
+    async def pop(self, key: str) -> Any:
+        pass
+
+    @abstractmethod
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """Gets the payload stored under `key` without decoding it. See `Cacheable.get_bytes`."""
+        pass
+
+    @abstractmethod
+    async def set_bytes(self, key: str, value: Union[bytes, bytearray, memoryview], ttl: Optional[int]=None):
+        """Stores `value` as-is, bypassing the serializer. See `Cacheable.set_bytes`."""
+        pass
+
+    @abstractmethod
+    async def get_many(self, keys: Iterable[str], default: Any=MISSING) -> List[Any]:
+        """
+        Gets several values in a single operation, in the same order as `keys`.
+        See `Cacheable.get_many`.
+        """
+        pass
+
+    @abstractmethod
+    async def set_many(self, mapping: Mapping[str, JSONType], ttl: Union[int, Mapping[str, int], None]=None):
+        """
+        Sets several values in a single operation. See `Cacheable.set_many`.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        pass
+
+    @abstractmethod
+    async def keys(self) -> Iterable:
+        pass
+
+    @abstractmethod
+    async def values(self) -> Iterable:
+        pass
+
+    @abstractmethod
+    async def items(self) -> Iterable:
+        """Returns key-value pairs."""
+        pass
+
+    @abstractmethod
+    async def scan_keys(self, cursor: int=0, count: int=1000) -> Tuple[int, List[str]]:
+        """Returns one page of keys and the cursor of the next page. See `Cacheable.scan_keys`."""
+        pass
+
+    @abstractmethod
+    async def scan_items(self, cursor: int=0, count: int=1000) -> Tuple[int, List[Tuple[str, Any]]]:
+        """Returns one page of key-value pairs and the cursor of the next page. See `Cacheable.scan_keys`."""
+        pass
+
+    async def iter_keys(self, count: int=1000, cursor: int=0) -> AsyncIterator[str]:
+        """Streams the keys page by page with `scan_keys`. See `Cacheable.iter_keys`."""
+        while True:
+            cursor, keys = await self.scan_keys(cursor, count)
+            for key in keys:
+                yield key
+            if not cursor:
+                return
+
+    async def iter_items(self, count: int=1000, cursor: int=0) -> AsyncIterator[Tuple[str, Any]]:
+        """Streams the key-value pairs page by page with `scan_items`. See `Cacheable.iter_keys`."""
+        while True:
+            cursor, items = await self.scan_items(cursor, count)
+            for item in items:
+                yield item
+            if not cursor:
+                return
+
+    @abstractmethod
+    async def expire(self, ttl: int, key: Optional[str]=None, **kwargs) -> bool:
+        """
+        Expires a single entry, or the whole cache when `key` is None. See `Cacheable.expire`.
+        """
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        """
+        Clears the cache by removing all cached items.
+        """
+        pass
+
+    @abstractmethod
+    async def size(self) -> int:
+        """Returns the number of entries, the awaitable equivalent of `len()`."""
+        pass
+
+    def lock(self, name: Optional[str]=None, auto_release_time: Optional[float]=None) -> AsyncContextManager:
+        """
+        Returns an async context manager locking `name`, or the whole cache when `name` is None.
+        The default lock only coordinates coroutines of this process; distributed backends override it.
+        """
+        return self._single_flight.lock(name)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        """Streams the cache keys with `iter_keys`."""
+        return self.iter_keys()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Union[JSONType, Awaitable[JSONType]]], ttl: Optional[int]=None) -> Any:
+        """
+        Returns the cached value of `key`, or calls `loader` and caches its result on a miss.
+        Concurrent misses on the same key within the process are coalesced: only one coroutine
+        runs `loader` while the others wait for its result.
+
+        Args:
+            key (str): The key to look up.
+            loader (Callable): A function or coroutine function computing the value.
+            ttl (Optional[int], optional): The time-to-live of the loaded value in seconds. Defaults to None.
+        """
+        value = (await self.get_many([key]))[0]
+        if value is not MISSING:
+            return value
+        async with self._single_flight.lock(key):
+            # Another coroutine may have loaded the value while we were waiting for the lock
+            value = (await self.get_many([key]))[0]
+            if value is not MISSING:
+                return value
+            value = loader()
+            if inspect.isawaitable(value):
+                value = await value
+            await self.set(key, value, ttl)
+            return value
+
+    @property
+    def _single_flight(self) -> SingleFlight:
+        single_flight = self.__dict__.get('_single_flight_instance')
+        if single_flight is None:
+            single_flight = self.__dict__['_single_flight_instance'] = SingleFlight()
+        return single_flight
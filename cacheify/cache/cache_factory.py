@@ -1,14 +1,114 @@
+import importlib
+from typing import TYPE_CHECKING, Callable, Dict, Union
 from cacheify.cache.cacheable import Cacheable
-from cacheify.cache.local.local_cache import LocalCache
-from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.serializers import CacheCodec, Serializer
+
+if TYPE_CHECKING:
+    from cacheify.cache.async_cacheable import AsyncCacheable
+
+# A cache class, or the 'module:attribute' path of one, imported when the first cache of its type is created
+Backend = Union[str, Callable[..., Union[Cacheable, 'AsyncCacheable']]]
+
+ENTRY_POINT_GROUP = 'cacheify.backends'
+ASYNC_ENTRY_POINT_GROUP = 'cacheify.async_backends'
+
+def _load(path: str) -> Callable:
+    module, _, attribute = path.partition(':')
+    backend = importlib.import_module(module)
+    for name in attribute.split('.'):
+        backend = getattr(backend, name)
+    return backend
+
+def _entry_points(group: str) -> list:
+    from importlib import metadata  # Only imported when a cache type is not registered
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return list(entry_points.select(group=group))
+    return list(entry_points.get(group, []))  # Python < 3.10
 
 class CacheifyFactory:
+    """
+    CacheifyFactory creates caches by type name from a registry of backends. Built-in backends are registered
+    as module paths and only imported when a cache of their type is created, so importing the factory does not
+    load `redis` or `pottery`, and a process only pays for the backends it uses.
+
+    Other backends are added with `register`, or declared by their package as entry points of the
+    `cacheify.backends` group (`cacheify.async_backends` for asynchronous caches), which are looked up
+    the first time an unregistered type is requested:
+
+        [project.entry-points."cacheify.backends"]
+        memcached = "my_package.memcached:MemcachedCache"
+
+    Args:
+        cache_type (str): The name of the backend, e.g. 'local', 'redis', 'tiered', 'sharded', 'shared' or 'disk'.
+    """
+    _backends: Dict[str, Backend] = {
+        'local': 'cacheify.cache.local.local_cache:LocalCache',
+        'redis': 'cacheify.cache.redis.redis_cache:RedisCache',
+        'tiered': 'cacheify.cache.tiered.tiered_cache:TieredCache',
+        'sharded': 'cacheify.cache.redis.sharded_redis_cache:ShardedRedisCache',
+        'shared': 'cacheify.cache.local.shared_cache:SharedMemoryCache',
+        'disk': 'cacheify.cache.disk.disk_cache:DiskCache',
+    }
+    _async_backends: Dict[str, Backend] = {
+        'local': 'cacheify.cache.local.async_local_cache:AsyncLocalCache',
+        'redis': 'cacheify.cache.redis.async_redis_cache:AsyncRedisCache',
+    }
+    _discovered = {ENTRY_POINT_GROUP: False, ASYNC_ENTRY_POINT_GROUP: False}
+
     def __init__(self, cache_type: str='local'):
         self.cache_type = cache_type
 
-    def get_cache(self, config: dict={}, **kwargs) -> Cacheable:
-        if self.cache_type == 'local':
-            return LocalCache(**config)
-        elif self.cache_type == 'redis':
-            return RedisCache(**config)
-        raise ValueError('Invalid cache type')
\ No newline at end of file
+    @classmethod
+    def register(cls, name: str, backend: Backend, asynchronous: bool=False) -> None:
+        """
+        Registers a backend under `name`, replacing any backend of that name.
+
+        Args:
+            name (str): The cache type passed to the factory.
+            backend (Backend): The cache class, or any callable taking the cache config as keyword arguments,
+                or its 'module:attribute' path, imported when the first cache of this type is created.
+            asynchronous (bool): Whether the backend creates `AsyncCacheable` caches, returned by `get_async_cache`.
+        """
+        (cls._async_backends if asynchronous else cls._backends)[name] = backend
+
+    @classmethod
+    def backends(cls, asynchronous: bool=False) -> list:
+        """Returns the names of the registered backends, including those declared as entry points."""
+        registry, group = cls._registry(asynchronous)
+        cls._discover(registry, group)
+        return sorted(registry)
+
+    @classmethod
+    def _registry(cls, asynchronous: bool) -> tuple:
+        return (cls._async_backends, ASYNC_ENTRY_POINT_GROUP) if asynchronous else (cls._backends, ENTRY_POINT_GROUP)
+
+    @classmethod
+    def _discover(cls, registry: Dict[str, Backend], group: str) -> None:
+        # Entry points are read once; backends registered explicitly take precedence
+        if cls._discovered[group]:
+            return
+        cls._discovered[group] = True
+        for entry_point in _entry_points(group):
+            registry.setdefault(entry_point.name, entry_point.value)
+
+    def _backend(self, asynchronous: bool) -> Callable:
+        registry, group = self._registry(asynchronous)
+        if self.cache_type not in registry:
+            self._discover(registry, group)
+        backend = registry.get(self.cache_type)
+        if backend is None:
+            raise ValueError('Invalid cache type')
+        if isinstance(backend, str):
+            backend = registry[self.cache_type] = _load(backend)
+        return backend
+
+    def get_cache(self, config: dict={}, serializer: Union[str, Serializer, CacheCodec, None]=None, **kwargs) -> Cacheable:
+        if serializer is not None:
+            config = {**config, 'serializer': serializer}
+        return self._backend(asynchronous=False)(**config)
+
+    def get_async_cache(self, config: dict={}, serializer: Union[str, Serializer, CacheCodec, None]=None, **kwargs) -> 'AsyncCacheable':
+        if serializer is not None:
+            config = {**config, 'serializer': serializer}
+        return self._backend(asynchronous=True)(**config)
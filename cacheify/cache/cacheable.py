@@ -1,6 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Iterable, Optional, Any
+from typing import Callable, Iterable, Iterator, List, Mapping, Optional, Any, Tuple, Union
 from .json_types import JSONType
+from .snapshot import SnapshotEntry, load_snapshot, write_snapshot
+
+class _Missing:
+    """The type of the `MISSING` sentinel, returned by bulk reads for keys that are not cached."""
+
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+    def __bool__(self) -> bool:
+        return False
+
+MISSING = _Missing()
+
+class Version:
+    """
+    An opaque token identifying the state of an entry, returned by `Cacheable.get_with_version`
+    and checked by `Cacheable.compare_and_set`.
+    """
+    __slots__ = ('token',)
+
+    def __init__(self, token: Any):
+        self.token = token  # The stored payload, or the version number of backends that keep one per entry
+
+    def matches(self, token: Any) -> bool:
+        return token is self.token or (type(token) is type(self.token) and token == self.token)
+
+def per_key_ttl(ttl: Union[int, Mapping[str, int], None], key: str) -> Optional[int]:
+    """Resolves the TTL of `key` from the `ttl` argument of `Cacheable.set_many`."""
+    return ttl.get(key) if isinstance(ttl, Mapping) else ttl
 
 class Cacheable(ABC):
     
@@ -17,15 +46,22 @@ class Cacheable(ABC):
         pass
 
     @abstractmethod
-    def set(self, key: str, value: JSONType, ttl: Optional[int]=None):
+    def set(self, key: str, value: JSONType, ttl: Optional[int]=None, tags: Optional[Iterable[str]]=None):
         """
-        Set a JSON serializable value in the cache with an optional time-to-live (TTL).
+        Set a serializable value in the cache with an optional time-to-live (TTL).
 
         Args:
             key (str): The key under which the value is stored.
-            value (JSONType): The value to be stored in the cache. Must be JSON serializable.
+            value (JSONType): The value to be stored in the cache. Must be serializable by the cache's
+                              serializer, JSON by default (see `cacheify.cache.serializers`).
             ttl (Optional[int], optional): The time-to-live for the cache entry in seconds.
                                         If None, the entry does not expire. Defaults to None.
+                                        The TTL only applies to this entry; other entries are not affected,
+                                        and overwriting an entry replaces its previous TTL.
+            tags (Optional[Iterable[str]], optional): Labels of the entry, e.g. the upstream records it was computed
+                                        from, so that `invalidate_tags` can delete every entry depending on a record.
+                                        Overwriting an entry replaces its tags, while the atomic operations
+                                        (`incr`, `compare_and_set`...) keep them. Defaults to None.
         """
         pass
 
@@ -33,6 +69,66 @@ class Cacheable(ABC):
     def pop(self, key: str) -> Any:
         pass
 
+    @abstractmethod
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Gets the payload stored under `key` as-is, without decoding it. Meant for values that are already
+        encoded, such as rendered HTML or protobuf messages, and are written with `set_bytes`.
+
+        Returns:
+            Optional[bytes]: The stored bytes, or None if the key is not cached.
+        """
+        pass
+
+    @abstractmethod
+    def set_bytes(self, key: str, value: Union[bytes, bytearray, memoryview], ttl: Optional[int]=None):
+        """
+        Stores `value` as-is, bypassing the serializer. Entries written this way must be read with `get_bytes`.
+
+        Args:
+            key (str): The key under which the value is stored.
+            value (Union[bytes, bytearray, memoryview]): The payload. `bytes` are stored without being copied.
+            ttl (Optional[int], optional): The time-to-live for the cache entry in seconds, see `set`.
+        """
+        pass
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str], default: Any=MISSING) -> List[Any]:
+        """
+        Gets several values in a single operation.
+
+        Args:
+            keys (Iterable[str]): The keys to look up.
+            default (Any, optional): The value returned for keys that are not in the cache. Defaults to `MISSING`,
+                                     which tells misses apart from cached None values.
+        Returns:
+            List[Any]: The values in the same order as `keys`.
+        """
+        pass
+
+    @abstractmethod
+    def set_many(self, mapping: Mapping[str, JSONType], ttl: Union[int, Mapping[str, int], None]=None):
+        """
+        Sets several serializable values in a single operation.
+
+        Args:
+            mapping (Mapping[str, JSONType]): The key-value pairs to store.
+            ttl (Union[int, Mapping[str, int], None], optional): Either one time-to-live in seconds for every entry,
+                                        or a mapping of per-key TTLs; keys missing from the mapping do not expire.
+                                        If None, the entries do not expire. Defaults to None.
+        """
+        pass
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        Deletes several entries in a single operation.
+
+        Returns:
+            int: The number of entries that were deleted.
+        """
+        pass
+
     @abstractmethod
     def keys(self) -> Iterable:
         pass
@@ -46,6 +142,44 @@ class Cacheable(ABC):
         """Returns key-value pairs."""
         pass
 
+    @abstractmethod
+    def scan_keys(self, cursor: int=0, count: int=1000) -> Tuple[int, List[str]]:
+        """
+        Returns one page of keys and the cursor of the next page, without locking the cache.
+        Start with cursor 0 and call again with the returned cursor until it is 0. As with Redis `SCAN`,
+        keys present during the whole iteration are returned at least once, keys added or removed meanwhile
+        may or may not be, and the page size is only approximately `count`.
+
+        Args:
+            cursor (int, optional): The cursor returned by the previous call, or 0 to start. Defaults to 0.
+            count (int, optional): The approximate number of keys per page. Defaults to 1000.
+        """
+        pass
+
+    @abstractmethod
+    def scan_items(self, cursor: int=0, count: int=1000) -> Tuple[int, List[Tuple[str, Any]]]:
+        """Returns one page of key-value pairs and the cursor of the next page, see `scan_keys`."""
+        pass
+
+    def iter_keys(self, count: int=1000, cursor: int=0) -> Iterator[str]:
+        """
+        Streams the keys page by page with `scan_keys`, so memory stays bounded by `count`
+        however large the cache is. Pass a cursor returned by `scan_keys` to resume an iteration.
+        """
+        while True:
+            cursor, keys = self.scan_keys(cursor, count)
+            yield from keys
+            if not cursor:
+                return
+
+    def iter_items(self, count: int=1000, cursor: int=0) -> Iterator[Tuple[str, Any]]:
+        """Streams the key-value pairs page by page with `scan_items`, see `iter_keys`."""
+        while True:
+            cursor, items = self.scan_items(cursor, count)
+            yield from items
+            if not cursor:
+                return
+
     @abstractmethod
     def expire(self, ttl: int, key: Optional[str]=None, **kwargs) -> bool:
         """
@@ -53,12 +187,25 @@ class Cacheable(ABC):
         
         Args:
             ttl (int): The time-to-live in seconds after which the cache entry should expire.
-            key (Optional[str], optional): The key of the cache entry to expire. If None, the method will use the key associated with the cacheable instance. Defaults to None.
-                Note: Setting a key manually should only be done if necessary and with an understanding of the cache implementation.
+            key (Optional[str], optional): The key of the cache entry to expire. Only that entry is affected.
+                If None, the whole cache (the key associated with the cacheable instance) expires. Defaults to None.
             **kwargs: Additional keyword arguments that support the expiration logic in specific implementations of Cacheable.
                 Each concrete implementation should document the supported keyword arguments in its own docstring if any.
         Returns:
-            bool: True if the cache entry was successfully expired, False otherwise.
+            bool: True if the expiration was set, False otherwise (e.g. the entry does not exist).
+        """
+        pass
+
+    @abstractmethod
+    def lock(self, name: Optional[str]=None, auto_release_time: Optional[float]=None) -> Any:
+        """
+        Returns a lock for an explicit critical section, e.g. recomputing an entry only once across workers.
+        The lock is a context manager that also provides `acquire(blocking=True, timeout=-1)` and `release()`.
+
+        Args:
+            name (Optional[str]): The name of the resource to lock. If None, the whole cache is locked.
+            auto_release_time (Optional[float]): The time in seconds after which a distributed lock is released
+                                        automatically, in case its holder dies. Ignored by in-process locks.
         """
         pass
 
@@ -69,6 +216,174 @@ class Cacheable(ABC):
         """
         pass
 
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Deletes every entry stored with at least one of `tags`, see `set`.
+
+        Returns:
+            int: The number of entries that were deleted.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support tags')
+
+    def invalidate_prefix(self, prefix: str, count: int=1000) -> int:
+        """
+        Deletes every entry whose key starts with `prefix`, one `scan_keys` page and one `delete_many` call
+        at a time, so memory stays bounded however many entries match. The deletion is not atomic: entries
+        written meanwhile may or may not be deleted.
+
+        Returns:
+            int: The number of entries that were deleted.
+        """
+        deleted = cursor = 0
+        while True:
+            cursor, keys = self.scan_keys(cursor, count)
+            matching = [key for key in keys if key.startswith(prefix)]
+            if matching:
+                deleted += self.delete_many(matching)
+            if not cursor:
+                return deleted
+
+    def get_or_set(self, key: str, value: JSONType, ttl: Optional[int]=None) -> Any:
+        """
+        Atomically returns the value cached under `key`, or stores `value` and returns it if there is none.
+
+        Args:
+            key (str): The key of the entry.
+            value (JSONType): The value stored if the key is not cached.
+            ttl (Optional[int], optional): The time-to-live of the stored value in seconds, see `set`.
+        """
+        def update(payload, remaining):
+            if payload is MISSING:
+                return self._encode(value), ttl, value
+            return MISSING, remaining, self._decode(payload)
+        return self._update(key, update)
+
+    def add(self, key: str, value: JSONType, ttl: Optional[int]=None) -> bool:
+        """
+        Atomically stores `value` only if `key` is not cached (set-if-absent).
+
+        Returns:
+            bool: True if the value was stored, False if the key was already cached.
+        """
+        def update(payload, remaining):
+            if payload is MISSING:
+                return self._encode(value), ttl, True
+            return MISSING, remaining, False
+        return self._update(key, update)
+
+    def get_with_version(self, key: str) -> Tuple[Any, Optional[Version]]:
+        """
+        Returns the value cached under `key` with a version token for `compare_and_set`,
+        or `(None, None)` if the key is not cached.
+        """
+        def update(payload, remaining):
+            if payload is MISSING:
+                return MISSING, remaining, (None, None)
+            return MISSING, remaining, (self._decode(payload), Version(payload))
+        return self._update(key, update)
+
+    def compare_and_set(self, key: str, value: JSONType, version: Optional[Version], ttl: Optional[int]=None) -> bool:
+        """
+        Atomically stores `value` only if the entry has not changed since `get_with_version` returned `version`,
+        so that concurrent read-modify-write cycles never overwrite each other's updates. Backends that number
+        every write of an entry, like `RedisCache`, detect any overwrite. The others compare the stored payload,
+        so the swap also succeeds if the entry was meanwhile overwritten with an identical value.
+
+        Args:
+            key (str): The key of the entry.
+            value (JSONType): The new value.
+            version (Optional[Version]): The version returned by `get_with_version`. If None, the value is only
+                                        stored if the key is not cached, like `add`.
+            ttl (Optional[int], optional): The time-to-live of the new value in seconds, see `set`.
+        Returns:
+            bool: True if the value was stored, False if the entry changed.
+        """
+        def update(payload, remaining):
+            unchanged = payload is MISSING if version is None else payload is not MISSING and version.matches(payload)
+            if unchanged:
+                return self._encode(value), ttl, True
+            return MISSING, remaining, False
+        return self._update(key, update)
+
+    def incr(self, key: str, delta: int=1, ttl: Optional[int]=None) -> int:
+        """
+        Atomically adds `delta` to the integer cached under `key`, starting from 0 if the key is not cached.
+
+        Args:
+            key (str): The key of the counter.
+            delta (int, optional): The amount to add. Defaults to 1.
+            ttl (Optional[int], optional): The time-to-live in seconds of a counter created by this call, e.g. the
+                                        window of a rate limit. Existing counters keep their remaining TTL.
+        Returns:
+            int: The new value of the counter.
+        Raises:
+            TypeError: If the cached value is not an integer.
+        """
+        def update(payload, remaining):
+            if payload is MISSING:
+                return self._encode(delta), ttl, delta
+            current = self._decode(payload)
+            if type(current) is not int:
+                raise TypeError(f'The entry {key!r} is not an integer')
+            return self._encode(current + delta), remaining, current + delta
+        return self._update(key, update)
+
+    def decr(self, key: str, delta: int=1, ttl: Optional[int]=None) -> int:
+        """Atomically subtracts `delta` from the integer cached under `key`, see `incr`."""
+        return self.incr(key, -delta, ttl)
+
+    def _update(self, key: str, update: Callable[[Any, Optional[float]], Tuple[Any, Optional[float], Any]]) -> Any:
+        """
+        Runs `update` on the entry of `key` while no other write can change it, and returns its result.
+        `update` is called with the stored payload, or `MISSING`, and the remaining TTL of the entry in seconds,
+        or None. It returns the payload to store, or `MISSING` to leave the entry as it is, the TTL of the stored
+        payload, and the result. Caches implementing it also provide `_encode` and `_decode`.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support atomic operations')
+
+    def _ttls(self, keys: List[str]) -> List[Any]:
+        """
+        Returns the remaining time-to-live of each entry in seconds, None if it never expires, or `MISSING` if it
+        is not cached. Used by `TieredCache` to keep L1 copies no longer than the entries they were read from.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not report TTLs')
+
+    def dump(self, path: str, compress: bool=True) -> int:
+        """
+        Writes every live entry, with its remaining TTL, to a snapshot file that `load` reads back,
+        e.g. to start a new worker with a warm cache. Entries are streamed, so memory stays bounded
+        however large the cache is, and the snapshot is replaced atomically. See `cacheify.cache.snapshot`.
+
+        Args:
+            path (str): The path of the snapshot file.
+            compress (bool): Whether to gzip compress the snapshot. Defaults to True.
+        Returns:
+            int: The number of entries written.
+        """
+        return write_snapshot(path, self._export_entries(), compress)
+
+    def load(self, path: str, batch_size: int=1000) -> int:
+        """
+        Stores the entries of a snapshot written by `dump`, by this or another kind of cache, keeping their
+        remaining TTL. Entries that expired since the snapshot was taken are skipped, and existing entries
+        with the same keys are overwritten.
+
+        Args:
+            path (str): The path of the snapshot file.
+            batch_size (int): The number of entries written per batch. Defaults to 1000.
+        Returns:
+            int: The number of entries loaded.
+        """
+        return load_snapshot(path, self._import_entries, batch_size)
+
+    def _export_entries(self) -> Iterator[SnapshotEntry]:
+        """Streams the live entries of the cache for `dump`."""
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
+    def _import_entries(self, entries: List[SnapshotEntry]) -> None:
+        """Stores a batch of snapshot entries for `load`. Entries whose TTL has run out are skipped."""
+        raise NotImplementedError(f'{type(self).__name__} does not support snapshots')
+
     @abstractmethod
     def __iter__(self) -> Iterable:
         """Iterates over cache keys."""
@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+from .async_cacheable import AsyncCacheable, SingleFlight
+from .cacheable import MISSING, Cacheable
+from .refresh import AsyncRefresher, Refresher
+
+logger = logging.getLogger(__name__)
+
+# The receiver of a method, left out of its keys
+_RECEIVERS = ('self', 'cls')
+
+def _stable_repr(value: Any) -> str:
+    if type(value).__repr__ is object.__repr__:
+        raise TypeError(f'Cannot build a stable cache key from a {type(value).__name__} argument, '
+                        'whose repr holds its memory address: pass a key_fn to the decorator')
+    return repr(value)
+
+def _string_keys(value: Any) -> Any:
+    # Converts dictionary keys to strings as JSON does, so that keys of mixed types can be sorted
+    if isinstance(value, dict):
+        return {key if isinstance(key, str) else _dumps(key): _string_keys(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_string_keys(item) for item in value]
+    return value
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=_stable_repr, separators=(',', ':'))
+
+def make_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    Builds a deterministic cache key for a call of `func`.
+    Arguments are bound to the function signature first, so `f(1)` and `f(a=1)` share a key,
+    then hashed from their JSON representation with sorted keys. Values that are not JSON
+    serializable fall back to `repr`, which should therefore be stable for such arguments:
+    a TypeError is raised for objects with the default `repr`, which holds their memory address.
+    The `self` or `cls` argument of a method is left out, so its results are shared by every
+    instance, in every process; pass a `key_fn` that identifies the instance otherwise.
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        first = next(iter(arguments), None)
+        if first in _RECEIVERS:
+            arguments = {name: value for name, value in arguments.items() if name != first}
+    except (TypeError, ValueError):
+        arguments = {'args': args, 'kwargs': kwargs}
+    try:
+        payload = _dumps(arguments)
+    except TypeError:
+        payload = _dumps(_string_keys(arguments))
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f'{func.__module__}.{func.__qualname__}:{digest}'
+
+@contextmanager
+def _holding(lock: Any) -> Iterator[None]:
+    """
+    Holds `lock` like a `with` statement, except that failing to release it is only logged: a distributed lock
+    held past its `auto_release_time` was already released by the server, and the computed value is still good.
+    """
+    lock.__enter__()
+    try:
+        yield
+    finally:
+        try:
+            lock.__exit__(None, None, None)
+        except (RuntimeError, ValueError) as error:  # pottery's ReleaseUnlockedLock, redis-py's LockNotOwnedError
+            logger.warning('Could not release the lock of a cached function, it probably expired: %r', error)
+
+@asynccontextmanager
+async def _async_holding(lock: Any) -> AsyncIterator[None]:
+    """The `async with` counterpart of `_holding`."""
+    await lock.__aenter__()
+    try:
+        yield
+    finally:
+        try:
+            await lock.__aexit__(None, None, None)
+        except (RuntimeError, ValueError) as error:  # redis-py's LockNotOwnedError
+            logger.warning('Could not release the lock of a cached function, it probably expired: %r', error)
+
+def _should_refresh(entry: list, beta: float) -> bool:
+    """
+    Decides whether to recompute an entry ahead of its expiration (XFetch). The probability
+    increases as the expiration approaches, scaled by how long the value took to compute,
+    so a single caller usually refreshes it before the whole fleet sees a miss.
+    """
+    _, delta, expires_at = entry
+    if expires_at is None or beta <= 0:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+def _is_stale(entry: list) -> bool:
+    return entry[2] is not None and time.time() >= entry[2]
+
+def _envelope(value: Any, started: float, ttl: Optional[int]) -> list:
+    return [value, time.perf_counter() - started, time.time() + ttl if ttl else None]
+
+def cached(cache: Union[Cacheable, AsyncCacheable], ttl: Optional[int]=None, key_fn: Optional[Callable[..., str]]=None,
+           beta: float=1.0, lock_timeout: float=10, stale_ttl: Optional[float]=None,
+           refresher: Union[Refresher, AsyncRefresher, None]=None):
+    """
+    Memoizes a function, or a coroutine function, in a cache.
+
+    On a miss only one caller computes the value: the others wait on `cache.lock`, which is a
+    process-wide lock for in-memory caches and a short-lived distributed lock for Redis caches,
+    then read the freshly cached value. Entries with a TTL are also refreshed early, with a
+    probability that grows as they approach their expiration (XFetch), to avoid stampedes on hot keys.
+
+    With `stale_ttl`, `ttl` becomes a soft TTL and entries are kept `stale_ttl` seconds longer, until their
+    hard TTL (stale-while-revalidate). Once an entry is due for a refresh, callers get its current value at
+    once while a `refresher` recomputes it in the background, once per key. If the recomputation fails,
+    the stale value keeps being served until the hard TTL, and the next call retries it.
+
+    Args:
+        cache (Union[Cacheable, AsyncCacheable]): The cache storing the results. Results must be JSON serializable.
+                                        Coroutine functions call a synchronous cache in the default executor.
+        ttl (Optional[int], optional): The time-to-live of the results in seconds. If None, they do not expire.
+        key_fn (Optional[Callable[..., str]], optional): Builds the cache key from the call arguments.
+                                        Defaults to a hash of the arguments, see `make_key`.
+        beta (float, optional): How eagerly entries are refreshed before expiring. 0 disables early refresh.
+                                Defaults to 1.0.
+        lock_timeout (float, optional): The time in seconds after which a distributed lock is released
+                                        automatically. Defaults to 10.
+        stale_ttl (Optional[float], optional): How long, in seconds, entries are served stale after `ttl`
+                                        while being refreshed. Requires `ttl`. If None, entries are recomputed
+                                        by the caller that finds them due, and are dropped once `ttl` runs out.
+        refresher (Union[Refresher, AsyncRefresher, None], optional): Runs the background refreshes: a `Refresher`
+                                        for functions, an `AsyncRefresher` for coroutine functions. Defaults to
+                                        a new one per decorated function, exposed as its `refresher` attribute.
+                                        See `cacheify.cache.refresh`.
+    """
+    if stale_ttl is not None and not ttl:
+        raise ValueError('stale_ttl requires a ttl')
+    # Entries are stored until their hard TTL, while their envelope holds the soft expiration
+    store_ttl = ttl + stale_ttl if stale_ttl else ttl
+
+    def decorator(func: Callable) -> Callable:
+        def cache_key(args, kwargs) -> str:
+            return key_fn(*args, **kwargs) if key_fn else make_key(func, args, kwargs)
+
+        if not inspect.iscoroutinefunction(func):
+            background = (refresher or Refresher()) if stale_ttl else None
+
+            def compute(key, args, kwargs):
+                started = time.perf_counter()
+                value = func(*args, **kwargs)
+                cache.set(key, _envelope(value, started, ttl), store_ttl)
+                return value
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = cache_key(args, kwargs)
+                entry = cache.get_many([key])[0]
+                if entry is not MISSING:
+                    if background is not None and (_is_stale(entry) or _should_refresh(entry, beta)):
+                        background.submit(key, lambda: compute(key, args, kwargs))
+                        return entry[0]
+                    return compute(key, args, kwargs) if _should_refresh(entry, beta) else entry[0]
+                with _holding(cache.lock(key, auto_release_time=lock_timeout)):
+                    # Another worker may have computed the value while we were waiting for the lock
+                    entry = cache.get_many([key])[0]
+                    if entry is not MISSING:
+                        return entry[0]
+                    return compute(key, args, kwargs)
+            wrapper.refresher = background
+            return wrapper
+
+        is_async_cache = isinstance(cache, AsyncCacheable)
+        # A synchronous cache lock would block the event loop, so coroutines coordinate in-process instead
+        single_flight = SingleFlight()
+        async_background = (refresher or AsyncRefresher()) if stale_ttl else None
+
+        async def call(method, *args):
+            # The methods of a synchronous cache block, so they run in the default executor, off the event loop
+            if is_async_cache:
+                return await method(*args)
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+        async def read(key):
+            return (await call(cache.get_many, [key]))[0]
+
+        async def async_compute(key, args, kwargs):
+            started = time.perf_counter()
+            value = await func(*args, **kwargs)
+            await call(cache.set, key, _envelope(value, started, ttl), store_ttl)
+            return value
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            key = cache_key(args, kwargs)
+            entry = await read(key)
+            if entry is not MISSING:
+                if async_background is not None and (_is_stale(entry) or _should_refresh(entry, beta)):
+                    async_background.submit(key, lambda: async_compute(key, args, kwargs))
+                    return entry[0]
+                return await async_compute(key, args, kwargs) if _should_refresh(entry, beta) else entry[0]
+            lock = cache.lock(key, auto_release_time=lock_timeout) if is_async_cache else single_flight.lock(key)
+            async with _async_holding(lock):
+                entry = await read(key)
+                if entry is not MISSING:
+                    return entry[0]
+                return await async_compute(key, args, kwargs)
+        async_wrapper.refresher = async_background
+        return async_wrapper
+
+    return decorator
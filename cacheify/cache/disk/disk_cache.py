@@ -0,0 +1,499 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from cacheify.cache.cacheable import MISSING, Cacheable, per_key_ttl
+from cacheify.cache.local.shared_cache import _LockFile, _open_lock_file, key_hash
+from cacheify.cache.redis.encoding import decode, encode
+from cacheify.cache.serializers import CacheCodec, Serializer, get_codec
+from cacheify.cache.snapshot import entry_payload, payload_entry
+
+# Named locks are hashed over this many byte-range locks of the lock file, see `DiskCache.lock`
+NAMED_LOCK_SLOTS = 1 << 16
+
+# Reads record their access time in memory; they are written to the database with the next write,
+# at the next compaction, or once this many keys are waiting
+TOUCH_BUFFER = 10000
+
+# Entries evicted per statement while the cache is above its limits
+EVICTION_BATCH = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT NOT NULL UNIQUE,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES ('count', 0), ('bytes', 0);
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+    UPDATE totals SET value = value + 1 WHERE name = 'count';
+    UPDATE totals SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TABLE IF NOT EXISTS tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+"""
+
+# Dropped by `clear` while it empties the tables: without triggers, SQLite truncates a table
+# instead of deleting its rows one by one
+_DELETE_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+    UPDATE totals SET value = value - 1 WHERE name = 'count';
+    UPDATE totals SET value = value - OLD.size WHERE name = 'bytes';
+END""",
+    """CREATE TRIGGER IF NOT EXISTS entries_untagged AFTER DELETE ON entries BEGIN
+    DELETE FROM tags WHERE key = OLD.key;
+END""",
+)
+
+_UPSERT = """
+INSERT INTO entries (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at, size = excluded.size
+"""
+
+_LIVE = '(expires_at IS NULL OR expires_at > ?)'
+
+def _encode(value) -> bytes:
+    return encode(value).encode()
+
+def default_path(key: str) -> str:
+    """Returns the database of the cache `key`, in `$XDG_CACHE_HOME/cacheify` (~/.cache/cacheify by default)."""
+    directory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'cacheify')
+    return os.path.join(directory, re.sub(r'[^\w.-]', '_', key) + '.sqlite')
+
+class DiskCache(Cacheable):
+    """
+    DiskCache is a persistent cache stored in a SQLite database, so entries survive restarts and are
+    shared by the processes of the host. It can be used on its own or as the L2 of a `TieredCache`,
+    which then starts warm after a restart.
+
+    The database runs in WAL mode, so readers never wait for writers, and is memory-mapped up to
+    `mmap_size` bytes, so reads are served from the page cache without copying through read calls.
+    Expired entries are skipped by reads and deleted by `compact()`, which a background thread runs
+    every `compaction_interval` seconds, along with returning free pages to the file system.
+
+    The tags of the entries are kept in a `tags` table, whose rows are deleted along with their entry,
+    including when it expires and is compacted, so the tag index never outgrows the cache.
+
+    Once `max_entries` or `max_bytes` is exceeded, the least recently used entries are evicted. The size of
+    an entry is the length of its key plus the length of its encoded value; the file itself is larger,
+    by the SQLite page and index overhead. Access times are recorded in memory and written in batches,
+    so reads do not write to the database.
+
+    Args:
+        key (str): The name of the cache, which determines the default database.
+        path (Optional[str]): The database file. Defaults to `default_path(key)`.
+        max_entries (Optional[int]): The maximum number of entries. Unbounded if None.
+        max_bytes (Optional[int]): The maximum total size of the entries. Unbounded if None.
+        mmap_size (int): How many bytes of the database are memory-mapped.
+        compaction_interval (Optional[float]): The period of the background compaction, in seconds. None disables it.
+        timeout (float): How long a write waits for another process to finish its write, in seconds.
+        serializer (Union[str, Serializer, CacheCodec, None]): Stores entries as encoded bytes,
+            see `cacheify.cache.serializers`. If None, entries are stored as JSON.
+    """
+
+    def __init__(self, *, key: str='cache', path: Optional[str]=None, max_entries: Optional[int]=None,
+                 max_bytes: Optional[int]=None, mmap_size: int=256 * 1024 * 1024, compaction_interval: Optional[float]=60,
+                 timeout: float=5.0, serializer: Union[str, Serializer, CacheCodec, None]=None, **kwargs):
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError('max_entries must be a positive integer')
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError('max_bytes must be a positive integer')
+        self._key = key
+        self.path = path or default_path(key)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mmap_size = mmap_size
+        self.timeout = timeout
+        self._codec = get_codec(serializer)
+        self._encode, self._decode = (self._codec.encode, self._codec.decode) if self._codec else (_encode, decode)
+        self._eviction_listener: Optional[Callable[[int], None]] = None
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> last access time not yet written
+        self._touched_lock = threading.Lock()
+        self._lock_file: Optional[_LockFile] = None
+        self._lock_file_guard = threading.Lock()
+        # executescript commits any open transaction first, so the script opens its own
+        self._connection().executescript(f"BEGIN IMMEDIATE; {_SCHEMA} {'; '.join(_DELETE_TRIGGERS)}; COMMIT;")
+        self._stopped = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        if compaction_interval:
+            self._compactor = threading.Thread(target=self._compact_periodically, args=(compaction_interval,),
+                                               name='cacheify-disk-compaction', daemon=True)
+            self._compactor.start()
+
+    @property
+    def key(self):
+        return self._key
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared by threads, nor survive a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')  # Only applies to a new database
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        self._local.connection, self._local.pid = connection, os.getpid()
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def close(self) -> None:
+        """Stops the background compaction and closes the database connections."""
+        self._stopped.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        with self._transaction() as db:
+            self._flush_touches(db)
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def lock(self, name=None, auto_release_time=None):
+        """
+        Returns a lock on `name`, or on the whole cache when `name` is None, held across threads and processes
+        through the `<path>.lock` file. Names are hashed over `NAMED_LOCK_SLOTS` locks, so distinct names may
+        rarely share one. `auto_release_time` is ignored since the lock of a process is released when it dies.
+        """
+        with self._lock_file_guard:
+            if self._lock_file is None:
+                self._lock_file = _open_lock_file(self.path + '.lock')
+        return self._lock_file.lock(key_hash(repr(name).encode()) % NAMED_LOCK_SLOTS)
+
+    def _set_eviction_listener(self, listener: Optional[Callable[[int], None]]) -> None:
+        """Calls `listener` with the number of entries evicted by each write that evicted some."""
+        self._eviction_listener = listener
+
+    def _touch(self, keys: List[str]) -> None:
+        now = time.time()
+        with self._touched_lock:
+            for key in keys:
+                self._touched[key] = now
+            full = len(self._touched) >= TOUCH_BUFFER
+        if full:
+            with self._transaction() as db:
+                self._flush_touches(db)
+
+    def _flush_touches(self, db: sqlite3.Connection) -> None:
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            db.executemany('UPDATE entries SET accessed_at = ? WHERE key = ?', [(at, key) for key, at in touched.items()])
+
+    def _evict(self, db: sqlite3.Connection) -> int:
+        """Deletes the least recently used entries until the cache is within its limits. Returns how many."""
+        if self.max_entries is None and self.max_bytes is None:
+            return 0
+        evicted = 0
+        while True:
+            totals = dict(db.execute('SELECT name, value FROM totals'))
+            excess = totals['count'] - self.max_entries if self.max_entries is not None else 0
+            if self.max_bytes is not None and totals['bytes'] > self.max_bytes:
+                excess = max(excess, 1)
+            if excess <= 0:
+                return evicted
+            batch = min(excess, EVICTION_BATCH) if excess > 1 else 1
+            evicted += db.execute(
+                'DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed_at LIMIT ?)', (batch,)
+            ).rowcount
+
+    def _write(self, entries: list, tags: Optional[list]=None) -> None:
+        """Writes `(key, payload, ttl)` entries in one transaction, then evicts entries beyond the limits."""
+        with self._transaction() as db:
+            evicted = self._store(db, entries, tags)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    def _store(self, db: sqlite3.Connection, entries: list, tags: Optional[list]=None, keep_tags: bool=False) -> int:
+        """
+        Writes `(key, payload, ttl)` entries within a transaction, replacing their tags with `tags`,
+        or keeping them if `keep_tags`. Returns the number of entries evicted.
+        """
+        now = time.time()
+        rows, oversized = [], []
+        for key, payload, ttl in entries:
+            size = len(key) + len(payload)
+            if self.max_bytes is not None and size > self.max_bytes:
+                oversized.append((key,))  # Too large to be cached: drop the previous value, as an eviction would
+            else:
+                rows.append((key, payload, now + ttl if ttl else None, now, size))
+        self._flush_touches(db)
+        if oversized:
+            db.executemany('DELETE FROM entries WHERE key = ?', oversized)
+        db.executemany(_UPSERT, rows)
+        if not keep_tags and (tags or db.execute('SELECT 1 FROM tags LIMIT 1').fetchone()):
+            db.executemany('DELETE FROM tags WHERE key = ?', [(row[0],) for row in rows])
+        if tags:
+            db.executemany('INSERT OR IGNORE INTO tags VALUES (?, ?)', [(tag, row[0]) for row in rows for tag in tags])
+        return self._evict(db)
+
+    def _update(self, key, update):
+        # BEGIN IMMEDIATE takes the write lock of the database, so the update is atomic across processes
+        with self._transaction() as db:
+            now = time.time()
+            row = db.execute(f'SELECT value, expires_at FROM entries WHERE key = ? AND {_LIVE}', (key, now)).fetchone()
+            if row is None:
+                payload, ttl, result = update(MISSING, None)
+            else:
+                payload, ttl, result = update(row[0], None if row[1] is None else row[1] - now)
+            # An update keeps the tags of the entry
+            evicted = 0 if payload is MISSING else self._store(db, [(key, payload, ttl)], keep_tags=row is not None)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+        if row is not None and payload is MISSING:
+            self._touch([key])
+        return result
+
+    def _read(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(f'SELECT value FROM entries WHERE key = ? AND {_LIVE}', (key, time.time())).fetchone()
+        if row is None:
+            return None
+        self._touch([key])
+        return row[0]
+
+    def get(self, key):
+        return self._decode(self._read(key))
+
+    def set(self, key, value, ttl=None, tags=None):
+        self._write([(key, self._encode(value), ttl)], list(tags) if tags else None)
+
+    def invalidate_tags(self, tags):
+        tags = list(tags)
+        now = time.time()
+        deleted = 0
+        with self._transaction() as db:
+            for start in range(0, len(tags), 500):
+                batch = tags[start:start + 500]
+                tagged = f"key IN (SELECT key FROM tags WHERE tag IN ({', '.join('?' * len(batch))}))"
+                deleted += db.execute(f'DELETE FROM entries WHERE {tagged} AND {_LIVE}', (*batch, now)).rowcount
+                db.execute(f'DELETE FROM entries WHERE {tagged}', batch)  # An expired entry is gone, but not counted
+        return deleted
+
+    def invalidate_prefix(self, prefix, count=1000):
+        """
+        Deletes the matching entries in one transaction, with a `GLOB` range scan of the key index. No keys are
+        paged through, so `count`, the page size of `Cacheable.invalidate_prefix`, is ignored.
+        """
+        pattern = re.sub(r'([*?[])', r'[\1]', prefix) + '*'
+        with self._transaction() as db:
+            deleted = db.execute(f'DELETE FROM entries WHERE key GLOB ? AND {_LIVE}', (pattern, time.time())).rowcount
+            db.execute('DELETE FROM entries WHERE key GLOB ?', (pattern,))
+        return deleted
+
+    def pop(self, key):
+        with self._transaction() as db:
+            row = db.execute(f'SELECT value FROM entries WHERE key = ? AND {_LIVE}', (key, time.time())).fetchone()
+            db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        if row is None:
+            raise KeyError(key)
+        return self._decode(row[0])
+
+    def get_bytes(self, key):
+        return self._read(key)
+
+    def set_bytes(self, key, value, ttl=None):
+        self._write([(key, value if type(value) is bytes else bytes(value), ttl)])
+
+    def get_many(self, keys, default=MISSING):
+        keys = list(keys)
+        db, now, found = self._connection(), time.time(), {}
+        # SQLite limits the number of parameters of a statement, so keys are looked up in batches
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ', '.join('?' * len(batch))
+            found.update(db.execute(f'SELECT key, value FROM entries WHERE key IN ({placeholders}) AND {_LIVE}', (*batch, now)))
+        if found:
+            self._touch(list(found))
+        return [self._decode(found[key]) if key in found else default for key in keys]
+
+    def _ttls(self, keys):
+        db, now, deadlines = self._connection(), time.time(), {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ', '.join('?' * len(batch))
+            deadlines.update(db.execute(f'SELECT key, expires_at FROM entries WHERE key IN ({placeholders}) AND {_LIVE}', (*batch, now)))
+        return [
+            MISSING if key not in deadlines else None if deadlines[key] is None else deadlines[key] - now
+            for key in keys
+        ]
+
+    def set_many(self, mapping, ttl=None):
+        self._write([(key, self._encode(value), per_key_ttl(ttl, key)) for key, value in mapping.items()])
+
+    def delete_many(self, keys):
+        now = time.time()
+        with self._transaction() as db:
+            deleted = 0
+            for key in keys:
+                deleted += db.execute(f'DELETE FROM entries WHERE key = ? AND {_LIVE}', (key, now)).rowcount
+                db.execute('DELETE FROM entries WHERE key = ?', (key,))  # An expired entry is gone, but not counted
+        return deleted
+
+    def keys(self):
+        """
+        This is an O(n) operation, so performance may degrade with larger caches.
+        Avoid using this method in performance-critical code.
+        """
+        return [row[0] for row in self._connection().execute(f'SELECT key FROM entries WHERE {_LIVE}', (time.time(),))]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def items(self):
+        rows = self._connection().execute(f'SELECT key, value FROM entries WHERE {_LIVE}', (time.time(),)).fetchall()
+        return [(key, self._decode(payload)) for key, payload in rows]
+
+    def scan_keys(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [key for key, _ in items]
+
+    def scan_items(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [(key, self._decode(payload)) for key, payload in items]
+
+    def _scan(self, cursor, count):
+        # The cursor is the last rowid returned. Overwriting an entry keeps its rowid, so an entry
+        # present during the whole iteration is returned exactly once.
+        rows = self._connection().execute(
+            f'SELECT rowid, key, value FROM entries WHERE rowid > ? AND {_LIVE} ORDER BY rowid LIMIT ?',
+            (cursor, time.time(), count),
+        ).fetchall()
+        return (rows[-1][0] if len(rows) == count else 0), [(key, payload) for _, key, payload in rows]
+
+    def _export_entries(self):
+        # Pages by rowid, like `_scan`, so no read transaction stays open while the snapshot is written
+        cursor = 0
+        while True:
+            rows = self._connection().execute(
+                f'SELECT rowid, key, value, expires_at FROM entries WHERE rowid > ? AND {_LIVE} ORDER BY rowid LIMIT 1000',
+                (cursor, time.time()),
+            ).fetchall()
+            for _, key, payload, expires_at in rows:
+                yield payload_entry(key, payload, expires_at)
+            if len(rows) < 1000:
+                return
+            cursor = rows[-1][0]
+
+    def _import_entries(self, entries):
+        now = time.time()
+        encode = self._codec.encode if self._codec else None
+        self._write([
+            (entry.key, entry_payload(entry, encode), entry.ttl(now))
+            for entry in entries if entry.expires_at is None or entry.expires_at > now
+        ])
+
+    def expire(self, ttl, key=None, **kwargs):
+        """
+        Expires a single entry after `ttl` seconds, or every entry present in the cache when `key` is None.
+        Entries written afterwards keep their own TTL.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if ttl <= 0:
+                if key is None:
+                    self._truncate(db)
+                    return True
+                return db.execute(f'DELETE FROM entries WHERE key = ? AND {_LIVE}', (key, now)).rowcount > 0
+            deadline = now + ttl
+            if key is None:
+                db.execute(f'UPDATE entries SET expires_at = MIN(COALESCE(expires_at, ?), ?) WHERE {_LIVE}', (deadline, deadline, now))
+                return True
+            return db.execute(f'UPDATE entries SET expires_at = ? WHERE key = ? AND {_LIVE}', (deadline, key, now)).rowcount > 0
+
+    def compact(self) -> int:
+        """
+        Deletes the expired entries, evicts entries beyond the limits, writes the pending access times,
+        and returns the free pages to the file system.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        with self._transaction() as db:
+            self._flush_touches(db)
+            removed = db.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),)).rowcount
+            evicted = self._evict(db)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+        db.execute('PRAGMA incremental_vacuum')
+        db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed + evicted
+
+    def _compact_periodically(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            try:
+                self.compact()
+            except sqlite3.Error:
+                pass  # Another process held the database for too long; the next run catches up
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            with self._connections_lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            connection.close()
+
+    def _truncate(self, db: sqlite3.Connection) -> None:
+        db.execute('DROP TRIGGER entries_deleted')
+        db.execute('DROP TRIGGER entries_untagged')
+        db.execute('DELETE FROM entries')
+        db.execute('DELETE FROM tags')
+        db.execute('UPDATE totals SET value = 0')
+        for trigger in _DELETE_TRIGGERS:
+            db.execute(trigger)
+
+    def clear(self):
+        """
+        Empties the tables in a time proportional to their number of pages rather than of rows, by dropping
+        the delete triggers for the duration of the transaction. Other processes never see the cache without them.
+        """
+        with self._transaction() as db:
+            self._truncate(db)
+        with self._touched_lock:
+            self._touched = {}
+
+    def __iter__(self):
+        """
+        Streams the cache keys with `iter_keys`.
+        """
+        return self.iter_keys()
+
+    def __len__(self):
+        db = self._connection()
+        count = db.execute("SELECT value FROM totals WHERE name = 'count'").fetchone()[0]
+        # Expired entries are found through the index on expires_at, without scanning the live ones
+        return count - db.execute('SELECT COUNT(*) FROM entries WHERE expires_at <= ?', (time.time(),)).fetchone()[0]
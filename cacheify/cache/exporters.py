@@ -0,0 +1,259 @@
+"""
+Exporters publishing the `CacheMetrics` recorded by `cacheify.cache.metrics.instrument`.
+
+    - PrometheusExporter renders the Prometheus text exposition format, to be served by the application.
+    - StatsDExporter pushes the counters and mean latencies to a StatsD daemon over UDP.
+    - OpenTelemetryExporter reports the metrics through observable instruments of an OpenTelemetry meter.
+
+Exporters read the metrics when they publish them, so they add nothing to the cache operations themselves.
+"""
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from .metrics import CacheMetrics
+
+class MetricsExporter(ABC):
+    """The base class of the exporters. `instrument(cache, exporters=[...])` adds the metrics of the cache."""
+
+    def __init__(self, *metrics: CacheMetrics):
+        self.metrics: List[CacheMetrics] = list(metrics)
+
+    def add(self, metrics: CacheMetrics) -> None:
+        self.metrics.append(metrics)
+
+    @abstractmethod
+    def export(self):
+        """Publishes the current metrics."""
+        pass
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+class PrometheusExporter(MetricsExporter):
+    """
+    Renders the metrics in the Prometheus text exposition format, with one time series per cache and operation:
+
+        <namespace>_operations_total, <namespace>_operation_errors_total, <namespace>_operation_duration_seconds,
+        <namespace>_hits_total, <namespace>_misses_total, <namespace>_evictions_total, <namespace>_refresh_queue_depth,
+        <namespace>_lock_wait_seconds and <namespace>_payload_bytes.
+
+    Args:
+        *metrics (CacheMetrics): The metrics to export.
+        namespace (str): The prefix of the metric names.
+    """
+
+    def __init__(self, *metrics: CacheMetrics, namespace: str='cacheify'):
+        super().__init__(*metrics)
+        self.namespace = namespace
+
+    def export(self) -> str:
+        return self.render()
+
+    def render(self) -> str:
+        ns = self.namespace
+        snapshots = [metrics.stats() for metrics in self.metrics]
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f'# HELP {ns}_{name} {help_text}')
+            lines.append(f'# TYPE {ns}_{name} {kind}')
+
+        def histogram(name: str, labels: str, snapshot: dict) -> None:
+            for bound, count in snapshot['buckets']:
+                lines.append(f'{ns}_{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}')
+            lines.append(f'{ns}_{name}_sum{{{labels}}} {snapshot["sum"]!r}')
+            lines.append(f'{ns}_{name}_count{{{labels}}} {snapshot["count"]}')
+
+        def labels(snapshot: dict, operation: Optional[str]=None) -> str:
+            text = f'cache="{_escape(snapshot["name"])}"'
+            return text if operation is None else f'{text},operation="{_escape(operation)}"'
+
+        family('operations_total', 'counter', 'Number of cache operations.')
+        for snapshot in snapshots:
+            for operation, stats in sorted(snapshot['operations'].items()):
+                lines.append(f'{ns}_operations_total{{{labels(snapshot, operation)}}} {stats["count"]}')
+        family('operation_errors_total', 'counter', 'Number of cache operations that raised an error.')
+        for snapshot in snapshots:
+            for operation, stats in sorted(snapshot['operations'].items()):
+                lines.append(f'{ns}_operation_errors_total{{{labels(snapshot, operation)}}} {stats["errors"]}')
+        family('operation_duration_seconds', 'histogram', 'Latency of the cache operations.')
+        for snapshot in snapshots:
+            for operation, stats in sorted(snapshot['operations'].items()):
+                histogram('operation_duration_seconds', labels(snapshot, operation), stats)
+        for name, help_text in (('hits', 'Reads that found the key.'), ('misses', 'Reads that did not find the key.'),
+                                ('evictions', 'Entries evicted to respect the size limits.')):
+            family(f'{name}_total', 'counter', help_text)
+            for snapshot in snapshots:
+                lines.append(f'{ns}_{name}_total{{{labels(snapshot)}}} {snapshot[name]}')
+        family('refresh_queue_depth', 'gauge', 'Background refreshes queued or running.')
+        for snapshot in snapshots:
+            lines.append(f'{ns}_refresh_queue_depth{{{labels(snapshot)}}} {snapshot["refresh_queue"]}')
+        family('lock_wait_seconds', 'histogram', 'Time spent waiting for the cache locks.')
+        for snapshot in snapshots:
+            histogram('lock_wait_seconds', labels(snapshot), snapshot['lock_wait'])
+        family('payload_bytes', 'histogram', 'Size of the serialized payloads written to the cache.')
+        for snapshot in snapshots:
+            histogram('payload_bytes', labels(snapshot), snapshot['payload_bytes'])
+        return '\n'.join(lines) + '\n'
+
+class StatsDExporter(MetricsExporter):
+    """
+    Sends the metrics to a StatsD daemon. Every `export()` sends what changed since the previous one:
+    the operation, error, hit, miss and eviction counts as counters, the refresh queue depth as a gauge, and the
+    mean latency of each operation and of the lock waits as timers, in milliseconds. `start()` exports periodically from a daemon thread.
+
+    Args:
+        *metrics (CacheMetrics): The metrics to export.
+        host (str): The StatsD host.
+        port (int): The StatsD port.
+        prefix (str): The prefix of the metric names, followed by the cache name.
+        interval (float): The export period of `start()`, in seconds.
+    """
+    MAX_DATAGRAM = 1432  # Fits in an Ethernet frame with the IP and UDP headers
+
+    def __init__(self, *metrics: CacheMetrics, host: str='localhost', port: int=8125, prefix: str='cacheify', interval: float=10.0):
+        super().__init__(*metrics)
+        self.address = (host, port)
+        self.prefix = prefix
+        self.interval = interval
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._previous: Dict[Tuple[str, str], Tuple[float, float]] = {}  # (cache, metric) -> (count, sum)
+        self._export_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _delta(self, cache: str, metric: str, count: float, total: float=0.0) -> Tuple[float, float]:
+        previous_count, previous_total = self._previous.get((cache, metric), (0, 0.0))
+        self._previous[(cache, metric)] = (count, total)
+        return count - previous_count, total - previous_total
+
+    def lines(self) -> List[str]:
+        """Returns the StatsD lines of the changes since the previous call."""
+        lines = []
+        for metrics in self.metrics:
+            snapshot = metrics.stats()
+            name = f'{self.prefix}.{snapshot["name"]}'
+            for operation, stats in sorted(snapshot['operations'].items()):
+                count, seconds = self._delta(name, operation, stats['count'], stats['sum'])
+                errors, _ = self._delta(name, f'{operation}.errors', stats['errors'])
+                if count:
+                    lines.append(f'{name}.{operation}.count:{count}|c')
+                    lines.append(f'{name}.{operation}.latency:{seconds / count * 1000:.6f}|ms')
+                if errors:
+                    lines.append(f'{name}.{operation}.errors:{errors}|c')
+            for counter in ('hits', 'misses', 'evictions'):
+                count, _ = self._delta(name, counter, snapshot[counter])
+                if count:
+                    lines.append(f'{name}.{counter}:{count}|c')
+            changed, _ = self._delta(name, 'refresh_queue', snapshot['refresh_queue'])
+            if changed:
+                lines.append(f'{name}.refresh_queue:{snapshot["refresh_queue"]}|g')
+            count, seconds = self._delta(name, 'lock_wait', snapshot['lock_wait']['count'], snapshot['lock_wait']['sum'])
+            if count:
+                lines.append(f'{name}.lock_wait:{seconds / count * 1000:.6f}|ms')
+        return lines
+
+    def export(self) -> None:
+        with self._export_lock:
+            datagram = ''
+            for line in self.lines():
+                if datagram and len(datagram) + len(line) + 1 > self.MAX_DATAGRAM:
+                    self._socket.sendto(datagram.encode(), self.address)
+                    datagram = ''
+                datagram = f'{datagram}\n{line}' if datagram else line
+            if datagram:
+                self._socket.sendto(datagram.encode(), self.address)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.export()
+            except OSError:
+                pass  # StatsD is best effort; the next export sends the accumulated changes
+
+    def start(self) -> None:
+        """Exports every `interval` seconds until `stop()` is called."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='cacheify-statsd', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the periodic exports and sends the last changes."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+class OpenTelemetryExporter(MetricsExporter):
+    """
+    Reports the metrics through observable instruments of an OpenTelemetry meter, read by the meter
+    provider's metric readers at every collection. The instruments carry `cache` and `operation` attributes:
+
+        cacheify.operations, cacheify.operation.errors, cacheify.operation.duration (total seconds),
+        cacheify.hits, cacheify.misses, cacheify.evictions, cacheify.lock.wait (total seconds),
+        cacheify.payload.size (total bytes) and the cacheify.refresh.queue gauge.
+
+    OpenTelemetry has no observable histogram, so the latencies are reported as totals; divide them by
+    the operation counts for the mean. Requires the opentelemetry-api package.
+
+    Args:
+        *metrics (CacheMetrics): The metrics to export.
+        meter: The meter creating the instruments. Defaults to the 'cacheify' meter of the global meter provider.
+    """
+
+    def __init__(self, *metrics: CacheMetrics, meter=None):
+        try:
+            from opentelemetry import metrics as otel_metrics
+            from opentelemetry.metrics import Observation
+        except ImportError:
+            raise ImportError('The OpenTelemetry exporter requires the opentelemetry-api package: pip install opentelemetry-api')
+        super().__init__(*metrics)
+        self._observation = Observation
+        meter = meter if meter is not None else otel_metrics.get_meter('cacheify')
+        instruments = (
+            ('cacheify.operations', '1', 'Number of cache operations.', self._operations('count')),
+            ('cacheify.operation.errors', '1', 'Number of cache operations that raised an error.', self._operations('errors')),
+            ('cacheify.operation.duration', 's', 'Total time spent in the cache operations.', self._operations('sum')),
+            ('cacheify.hits', '1', 'Reads that found the key.', self._per_cache(lambda snapshot: snapshot['hits'])),
+            ('cacheify.misses', '1', 'Reads that did not find the key.', self._per_cache(lambda snapshot: snapshot['misses'])),
+            ('cacheify.evictions', '1', 'Entries evicted to respect the size limits.',
+             self._per_cache(lambda snapshot: snapshot['evictions'])),
+            ('cacheify.lock.wait', 's', 'Total time spent waiting for the cache locks.',
+             self._per_cache(lambda snapshot: snapshot['lock_wait']['sum'])),
+            ('cacheify.payload.size', 'By', 'Total size of the serialized payloads written to the cache.',
+             self._per_cache(lambda snapshot: snapshot['payload_bytes']['sum'])),
+        )
+        self.instruments = [
+            meter.create_observable_counter(name, callbacks=[callback], unit=unit, description=description)
+            for name, unit, description, callback in instruments
+        ]
+        self.instruments.append(meter.create_observable_gauge(
+            'cacheify.refresh.queue', callbacks=[self._per_cache(lambda snapshot: snapshot['refresh_queue'])],
+            unit='1', description='Background refreshes queued or running.',
+        ))
+
+    def _operations(self, field: str):
+        def observe(options):
+            return [
+                self._observation(stats[field], {'cache': snapshot['name'], 'operation': operation})
+                for snapshot in (metrics.stats() for metrics in self.metrics)
+                for operation, stats in snapshot['operations'].items()
+            ]
+        return observe
+
+    def _per_cache(self, value):
+        def observe(options):
+            return [
+                self._observation(value(snapshot), {'cache': snapshot['name']})
+                for snapshot in (metrics.stats() for metrics in self.metrics)
+            ]
+        return observe
+
+    def export(self) -> None:
+        """The meter provider's readers collect the metrics; there is nothing to push."""
@@ -0,0 +1,68 @@
+from cacheify.cache.async_cacheable import AsyncCacheable
+from cacheify.cache.cacheable import MISSING
+from .local_cache import LocalCache
+
+class AsyncLocalCache(AsyncCacheable):
+    """
+    AsyncLocalCache exposes a `LocalCache` through the `AsyncCacheable` interface.
+    In-memory operations never block on I/O, so they run inline on the event loop
+    instead of being offloaded to an executor. It accepts the same arguments as `LocalCache`.
+    """
+
+    def __init__(self, **kwargs):
+        self._cache = LocalCache(**kwargs)
+
+    @property
+    def key(self):
+        return self._cache.key
+
+    def _set_eviction_listener(self, listener):
+        self._cache._set_eviction_listener(listener)
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl)
+
+    async def pop(self, key):
+        return self._cache.pop(key)
+
+    async def get_bytes(self, key):
+        return self._cache.get_bytes(key)
+
+    async def set_bytes(self, key, value, ttl=None):
+        self._cache.set_bytes(key, value, ttl)
+
+    async def get_many(self, keys, default=MISSING):
+        return self._cache.get_many(keys, default)
+
+    async def set_many(self, mapping, ttl=None):
+        self._cache.set_many(mapping, ttl)
+
+    async def delete_many(self, keys):
+        return self._cache.delete_many(keys)
+
+    async def keys(self):
+        return self._cache.keys()
+
+    async def values(self):
+        return self._cache.values()
+
+    async def items(self):
+        return self._cache.items()
+
+    async def scan_keys(self, cursor=0, count=1000):
+        return self._cache.scan_keys(cursor, count)
+
+    async def scan_items(self, cursor=0, count=1000):
+        return self._cache.scan_items(cursor, count)
+
+    async def expire(self, ttl, key=None, **kwargs):
+        return self._cache.expire(ttl, key, **kwargs)
+
+    async def clear(self):
+        self._cache.clear()
+
+    async def size(self):
+        return len(self._cache)
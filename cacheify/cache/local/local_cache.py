@@ -1,99 +1,337 @@
+import json
 import threading
-from typing import Optional
-from redis import Redis
-from pottery import RedisDict
-from cacheify.cache.cacheable import Cacheable
-from .connector import RedisConnector
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional, Type, Union
+from cachetools import Cache
+from cacheify.cache.cacheable import MISSING, Cacheable, per_key_ttl
+from cacheify.cache.serializers import CacheCodec, Serializer, get_codec
+from cacheify.cache.snapshot import RAW, VALUE, SnapshotEntry
+from .memory_store import SCAN_BUCKETS, MemoryStore
+
+# Immutable values are stored as-is; anything else is kept JSON encoded so that
+# callers always get an independent copy back, just like a Redis round trip.
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None), bytes)
+
+class _JSONPayload(str):
+    """Marks a stored payload as a JSON document that must be decoded on read."""
+    __slots__ = ()
+
+def _encode(value):
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+    return _JSONPayload(json.dumps(value))
+
+def _decode(payload):
+    if type(payload) is _JSONPayload:
+        return json.loads(payload)
+    return payload
+
+class _NamedLock:
+    """
+    A lock shared by every caller locking the same name within the process.
+    The underlying `threading.Lock` is dropped once nobody holds or waits for it.
+    """
+
+    def __init__(self, locks: dict, guard: threading.Lock, name):
+        self._locks = locks
+        self._guard = guard
+        self._name = name
+
+    def _release_holder(self, holder: list) -> None:
+        with self._guard:
+            holder[1] -= 1
+            if not holder[1]:
+                del self._locks[self._name]
+
+    def acquire(self, blocking: bool=True, timeout: float=-1) -> bool:
+        with self._guard:
+            holder = self._locks.setdefault(self._name, [threading.Lock(), 0])  # [lock, number of users]
+            holder[1] += 1
+        if holder[0].acquire(blocking, timeout):
+            return True
+        self._release_holder(holder)
+        return False
+
+    def release(self) -> None:
+        holder = self._locks[self._name]
+        holder[0].release()
+        self._release_holder(holder)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
 
 class LocalCache(Cacheable):
-    def __init__(self, *, key: str='cache', redis_client: Optional[Redis]=None, **kwargs):
+    """
+    LocalCache is an in-process cache backed by native `MemoryStore`s.
+
+    Keys are spread by hash over `stripes` stores, each guarded by its own lock, so threads working on
+    keys of different stripes do not wait for each other. Operations on several keys lock the stripes
+    they touch, and whole-cache operations (`keys`, `items`, `__len__`, `expire`, `clear`, `invalidate_tags`)
+    lock them all, always in the same order, so they see a consistent snapshot.
+
+    Args:
+        key (str): The name of the cache.
+        max_entries (Optional[int]): The maximum number of entries kept in the cache. Unbounded if None.
+        max_bytes (Optional[int]): The maximum total size of the entries. Unbounded if None. The size of an entry
+            is the length of its key plus the length of its encoded value, see `memory_store.entry_size`.
+        eviction (Union[str, Type[Cache]]): The eviction policy used once a limit is reached: 'lru', 'lfu', 'ttl',
+            'tinylfu' or a `cachetools.Cache` subclass, see `MemoryStore`.
+        serializer (Union[str, Serializer, CacheCodec, None]): Stores entries as encoded bytes,
+            see `cacheify.cache.serializers`. If None, immutable values are stored as-is and others as JSON.
+        stripes (Optional[int]): The number of lock stripes. Defaults to `DEFAULT_STRIPES` for unbounded caches
+            and to 1 for bounded ones: the limits are split between the stripes, whose shares add up to the limits,
+            each evicting its own entries, so with several stripes the eviction order is only approximately global.
+            A bounded cache cannot have more stripes than its limits allow entries or bytes.
+    """
+    DEFAULT_STRIPES = 16
+
+    def __init__(self, *, key: str='cache', max_entries: Optional[int]=None, max_bytes: Optional[int]=None,
+                 eviction: Union[str, Type[Cache]]='lru', serializer: Union[str, Serializer, CacheCodec, None]=None,
+                 stripes: Optional[int]=None, **kwargs):
+        if stripes is None:
+            stripes = 1 if max_entries is not None or max_bytes is not None else self.DEFAULT_STRIPES
+        if stripes <= 0:
+            raise ValueError('stripes must be a positive integer')
+        for name, limit in (('max_entries', max_entries), ('max_bytes', max_bytes)):
+            if limit is not None and 0 < limit < stripes:
+                raise ValueError(f'{name} must be at least the number of stripes ({stripes})')
         self._key = key
-        self._cache = RedisDict(redis=self._normalize_masters(redis_client), key=key)
-        self._semaphore = threading.Semaphore(1)  # A binary semaphore to allow one thread at a time
+        self._stores = [
+            MemoryStore(max_entries=_split(max_entries, stripes, stripe), eviction=eviction,
+                        max_bytes=_split(max_bytes, stripes, stripe))
+            for stripe in range(stripes)
+        ]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._codec = get_codec(serializer)
+        self._encode, self._decode = (self._codec.encode, self._codec.decode) if self._codec else (_encode, _decode)
+        self._named_locks = {}
+        self._named_locks_guard = threading.Lock()
 
-    def _normalize_masters(self, redis_client: Optional[Redis]=None) -> Redis:
-        return redis_client if isinstance(redis_client, Redis) else RedisConnector()
-    
     @property
     def key(self):
         return self._key
 
-    def get(self, key):
-        self._semaphore.acquire()  # Acquire semaphore to ensure thread safety
-        try:
-            return self._cache.get(key)
-        finally:
-            self._semaphore.release()  # Release semaphore so that other threads can proceed
+    @property
+    def stripes(self) -> int:
+        return len(self._stores)
 
-    def set(self, key, value, ttl=None):
-        self._semaphore.acquire()
+    def _stripe(self, key) -> int:
+        return hash(key) % len(self._stores)
+
+    @contextmanager
+    def _locked(self, stripes: Iterable[int]):
+        # Stripes are always locked in ascending order, so two callers cannot deadlock
+        locks = [self._locks[stripe] for stripe in sorted(stripes)]
+        for lock in locks:
+            lock.acquire()
         try:
-            self._cache[key] = value
-            self._cache.redis.expire(self._cache.key, ttl) if ttl else None
+            yield
         finally:
-            self._semaphore.release()
+            for lock in reversed(locks):
+                lock.release()
+
+    def _all_stripes(self):
+        return self._locked(range(len(self._stores)))
+
+    def lock(self, name=None, auto_release_time=None):
+        """
+        Returns an in-process lock on `name`, or on the whole cache when `name` is None.
+        `auto_release_time` is ignored since a thread cannot die while holding the lock.
+        """
+        return _NamedLock(self._named_locks, self._named_locks_guard, name)
+
+    def _set_eviction_listener(self, listener):
+        """Calls `listener` with 1 for every entry evicted to make room for another one."""
+        for store in self._stores:
+            store.set_eviction_listener(listener)
+
+    def get(self, key):
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            payload = self._stores[stripe].get(key)
+        return self._decode(payload)
+
+    def set(self, key, value, ttl=None, tags=None):
+        payload = self._encode(value)
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            self._stores[stripe].set(key, payload, ttl, tags)
+
+    def invalidate_tags(self, tags):
+        """Deletes the tagged entries through the tag index of every stripe, see `MemoryStore.invalidate_tags`."""
+        tags = list(tags)
+        with self._all_stripes():
+            return sum(store.invalidate_tags(tags) for store in self._stores)
 
     def pop(self, key):
-        self._semaphore.acquire()
-        try:
-            return self._cache.pop(key)
-        finally:
-            self._semaphore.release()
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            payload = self._stores[stripe].pop(key)
+        return self._decode(payload)
+
+    def get_bytes(self, key):
+        """
+        Returns the stored bytes object itself: it is immutable, so every reader shares
+        the same buffer and large payloads are never duplicated.
+        """
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            payload = self._stores[stripe].get(key)
+        if payload is not None and not isinstance(payload, bytes):
+            raise TypeError(f'The entry {key!r} was not stored as bytes')
+        return payload
+
+    def set_bytes(self, key, value, ttl=None):
+        payload = value if type(value) is bytes else bytes(value)  # Copy mutable buffers once, on write
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            self._stores[stripe].set(key, payload, ttl)
+
+    def get_many(self, keys, default=MISSING):
+        keys = list(keys)
+        stripes = [self._stripe(key) for key in keys]
+        stores = self._stores
+        with self._locked(set(stripes)):
+            payloads = [stores[stripe].get(key, MISSING) for stripe, key in zip(stripes, keys)]
+        return [default if payload is MISSING else self._decode(payload) for payload in payloads]
+
+    def _ttls(self, keys):
+        stripes = [self._stripe(key) for key in keys]
+        stores = self._stores
+        with self._locked(set(stripes)):
+            return [stores[stripe].ttl(key, MISSING) for stripe, key in zip(stripes, keys)]
+
+    def set_many(self, mapping, ttl=None):
+        entries = [(self._stripe(key), key, self._encode(value), per_key_ttl(ttl, key)) for key, value in mapping.items()]
+        stores = self._stores
+        with self._locked({entry[0] for entry in entries}):
+            for stripe, key, payload, entry_ttl in entries:
+                stores[stripe].set(key, payload, entry_ttl)
+
+    def _update(self, key, update):
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            store = self._stores[stripe]
+            entry = store.lookup(key)
+            payload, ttl, result = update(MISSING, None) if entry is None else update(*entry)
+            if payload is not MISSING:
+                store.set(key, payload, ttl, keep_tags=entry is not None)  # An update keeps the tags of the entry
+        return result
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        stripes = [self._stripe(key) for key in keys]
+        stores = self._stores
+        with self._locked(set(stripes)):
+            return sum(stores[stripe].pop(key, MISSING) is not MISSING for stripe, key in zip(stripes, keys))
 
     def keys(self):
         """
         This is an O(n) operation, so performance may degrade with larger caches.
         Avoid using this method in performance-critical code.
         """
-        self._semaphore.acquire()
-        try:
-            return self._cache.keys()
-        finally:
-            self._semaphore.release()
+        with self._all_stripes():
+            return [key for store in self._stores for key in store.keys()]
 
     def values(self):
-        self._semaphore.acquire()
-        try:
-            return self._cache.values()
-        finally:
-            self._semaphore.release()
+        return [value for _, value in self.items()]
 
     def items(self):
-        self._semaphore.acquire()
-        try:
-            return self._cache.items()
-        finally:
-            self._semaphore.release()
+        with self._all_stripes():
+            items = [item for store in self._stores for item in store.items()]
+        return [(key, self._decode(payload)) for key, payload in items]
+
+    def scan_keys(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [key for key, _ in items]
+
+    def scan_items(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [(key, self._decode(payload)) for key, payload in items]
+
+    def _scan(self, cursor, count):
+        # The cursor is `stripe * SCAN_BUCKETS + bucket`, and only the lock of the stripe being
+        # scanned is held while a page is collected, see `MemoryStore.scan`
+        stripe, bucket = divmod(cursor, SCAN_BUCKETS)
+        page = []
+        while stripe < len(self._stores) and len(page) < count:
+            with self._locks[stripe]:
+                bucket, items = self._stores[stripe].scan(bucket, count - len(page))
+            page.extend(items)
+            if bucket == 0:
+                stripe += 1
+        return (0 if stripe >= len(self._stores) else stripe * SCAN_BUCKETS + bucket), page
+
+    def _export_entries(self):
+        # Bytes, whether written with `set_bytes` or encoded by a serializer, are exported raw
+        for lock, store in zip(self._locks, self._stores):
+            bucket = 0
+            while True:
+                with lock:
+                    bucket, page = store.scan(bucket, 1000, ttl=True)
+                now = time.time()
+                for key, payload, ttl in page:
+                    expires_at = None if ttl is None else now + ttl
+                    if isinstance(payload, bytes):
+                        yield SnapshotEntry(key, RAW, payload, expires_at)
+                    else:
+                        text = payload if type(payload) is _JSONPayload else json.dumps(payload)
+                        yield SnapshotEntry(key, VALUE, text.encode(), expires_at)
+                if not bucket:
+                    break
+
+    def _import_entries(self, entries):
+        now = time.time()
+        rows = []
+        for entry in entries:
+            ttl = entry.ttl(now)
+            if ttl is not None and ttl <= 0:
+                continue
+            payload = entry.data
+            if entry.kind == VALUE:
+                try:
+                    payload = self._encode(json.loads(payload))
+                except ValueError:
+                    pass  # Text written with `set_bytes` by another kind of cache
+            rows.append((self._stripe(entry.key), entry.key, payload, ttl))
+        stores = self._stores
+        with self._locked({row[0] for row in rows}):
+            for stripe, key, payload, ttl in rows:
+                stores[stripe].set(key, payload, ttl)
 
     def expire(self, ttl, key=None, **kwargs):
-        self._semaphore.acquire()
-        try:
-            return self._cache.redis.expire(key or self._cache.key, ttl)
-        finally:
-            self._semaphore.release()
+        """
+        Expires a single entry after `ttl` seconds, or the whole cache when `key` is None.
+        """
+        if key is None:
+            with self._all_stripes():
+                for store in self._stores:
+                    store.expire_all(ttl)
+                return True
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            return self._stores[stripe].expire(key, ttl)
 
     def clear(self):
-        self._semaphore.acquire()
-        try:
-            self._cache.clear()
-        finally:
-            self._semaphore.release()
+        with self._all_stripes():
+            for store in self._stores:
+                store.clear()
 
     def __iter__(self):
         """
-        Returns an iterator over the cache. 
-        This performs an O(n) Redis operation, which can be slow and is 
-        not recommended if performance is critical.
+        Streams the cache keys with `iter_keys`.
         """
-        self._semaphore.acquire()
-        try:
-            return iter(self._cache)
-        finally:
-            self._semaphore.release()
+        return self.iter_keys()
 
     def __len__(self):
-        self._semaphore.acquire()
-        try:
-            return len(self._cache)
-        finally:
-            self._semaphore.release()
\ No newline at end of file
+        with self._all_stripes():
+            return sum(len(store) for store in self._stores)
+
+def _split(limit: Optional[int], stripes: int, stripe: int) -> Optional[int]:
+    # The first `limit % stripes` stripes take one more unit, so the shares add up to the limit
+    return None if limit is None else limit // stripes + (stripe < limit % stripes)
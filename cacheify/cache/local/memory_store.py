@@ -0,0 +1,375 @@
+import heapq
+import math
+import sys
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Type, Union
+from cachetools import Cache, LFUCache, LRUCache, TLRUCache
+from .tinylfu import TinyLFUCache
+
+EVICTION_POLICIES = ('lru', 'lfu', 'ttl', 'tinylfu')
+
+# Keys are indexed in this many buckets by hash, which is what `scan` cursors point to
+SCAN_BUCKETS = 4096
+
+_MISSING = object()
+_NO_EXPIRY = math.inf
+
+def entry_size(key: Hashable, payload: Any) -> int:
+    """
+    Returns the size accounted for an entry: the length of its key and of its serialized payload,
+    in bytes for bytes and in characters for strings, or the in-memory size of other payloads.
+    """
+    key_size = len(key) if isinstance(key, (str, bytes)) else sys.getsizeof(key)
+    payload_size = len(payload) if isinstance(payload, (str, bytes)) else sys.getsizeof(payload)
+    return key_size + payload_size
+
+def _entry_size(entry: tuple) -> int:
+    return entry[2]
+
+class MemoryStore:
+    """
+    MemoryStore is a plain in-process key-value store with bounded size and per-entry expiration.
+    It is not thread-safe; callers are expected to serialize access to it.
+
+    Each entry is kept as a `(payload, expires_at, size)` tuple inside a `cachetools` cache, which takes
+    care of evicting entries once `max_entries` or `max_bytes` is reached according to the selected policy:
+        - 'lru': evicts the least recently used entry.
+        - 'lfu': evicts the least frequently used entry.
+        - 'ttl': evicts expired entries first, then the least recently used one.
+        - 'tinylfu': W-TinyLFU, which only admits new entries that are used more often than the ones
+          they would evict, see `TinyLFUCache`.
+    Any other policy can be plugged in as a `cachetools.Cache` subclass accepting `(maxsize, getsizeof)`.
+    The size of an entry is computed by `entry_size` when it is stored, and only when `max_bytes` is set.
+    An entry larger than `max_bytes` is not stored.
+    Expired entries are dropped lazily on access and in bulk through a min-heap of expiration times,
+    so `__len__` and `keys` never report entries whose TTL has run out. Deadlines of entries that were
+    overwritten or removed stay in the heap until they are due, and the heap is rebuilt from the live
+    entries once it holds twice as many deadlines as the store.
+
+    Keys are also indexed in `SCAN_BUCKETS` buckets by hash, so `scan` can page through the store
+    while it keeps changing. Removed keys are dropped from their bucket lazily, when it is scanned,
+    and the index is rebuilt once it holds twice as many keys as the store.
+
+    Entries stored with tags are indexed by tag for `invalidate_tags`. Keys whose entry expired, was evicted,
+    or was rewritten without the tag are checked and skipped when a tag is invalidated, and the tag index is
+    rebuilt from the live entries once it has doubled since the previous rebuild, so it stays bounded.
+    """
+
+    def __init__(self, max_entries: Optional[int]=None, eviction: Union[str, Type[Cache]]='lru',
+                 timer: Callable[[], float]=time.monotonic, max_bytes: Optional[int]=None):
+        if not (eviction in EVICTION_POLICIES or isinstance(eviction, type) and issubclass(eviction, Cache)):
+            raise ValueError(f"Invalid eviction policy '{eviction}'. Expected one of {EVICTION_POLICIES} or a cachetools.Cache subclass")
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError('max_entries must be a positive integer')
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError('max_bytes must be a positive integer')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self._timer = timer
+        self._data = self._new_cache()
+        self._expiry_heap: List[Tuple[float, Hashable]] = []
+        self._expires_at = _NO_EXPIRY  # Deadline for the whole store, see `expire_all`
+        self._buckets: Dict[int, set] = {}  # Bucket index -> keys, see `scan`
+        self._indexed = 0  # The number of keys in the buckets, including removed ones
+        self._eviction_listener: Optional[Callable[[int], None]] = None
+        self._tags: Dict[Hashable, set] = {}  # Tag -> keys, see `invalidate_tags`
+        self._entry_tags: Dict[Hashable, frozenset] = {}  # Key -> tags of the entry
+        self._tagged = 0  # The number of keys in the tag index, including removed ones
+        self._tag_limit = SCAN_BUCKETS  # The size of the tag index that triggers a rebuild
+
+    def set_eviction_listener(self, listener: Optional[Callable[[int], None]]) -> None:
+        """Calls `listener` with 1 for every entry evicted to make room for another one."""
+        self._eviction_listener = listener
+        self._watch_evictions(self._data)
+
+    def _watch_evictions(self, data: Cache) -> None:
+        # cachetools evicts through `self.popitem()`, so an instance attribute intercepts it
+        # without slowing down stores that nobody listens to
+        listener = self._eviction_listener
+        if listener is None:
+            data.__dict__.pop('popitem', None)
+            return
+        popitem = type(data).popitem.__get__(data)
+
+        def evicting_popitem():
+            item = popitem()
+            listener(1)
+            return item
+        data.popitem = evicting_popitem
+
+    def _new_cache(self) -> Cache:
+        # Bounded by bytes, the cachetools capacity is in bytes and `set` enforces `max_entries` itself
+        if self.max_bytes is not None:
+            maxsize, getsizeof = self.max_bytes, _entry_size
+        else:
+            maxsize, getsizeof = (self.max_entries if self.max_entries is not None else math.inf), None
+        if self.eviction == 'lfu':
+            return LFUCache(maxsize, getsizeof)
+        elif self.eviction == 'ttl':
+            return TLRUCache(maxsize, ttu=lambda _key, entry, _now: entry[1], timer=self._timer, getsizeof=getsizeof)
+        elif self.eviction == 'tinylfu':
+            return TinyLFUCache(maxsize, getsizeof)
+        elif self.eviction == 'lru':
+            return LRUCache(maxsize, getsizeof)
+        return self.eviction(maxsize, getsizeof)
+
+    def _deadline(self, ttl: Optional[float]) -> float:
+        return self._timer() + ttl if ttl else _NO_EXPIRY
+
+    def _check_store_expiry(self, now: float) -> None:
+        if self._expires_at <= now:
+            self.clear()
+
+    def purge(self) -> int:
+        """
+        Removes every expired entry from the store.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        now = self._timer()
+        self._check_store_expiry(now)
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # The heap may hold stale deadlines for entries that were overwritten or re-expired
+            if entry is not None and entry[1] == expires_at:
+                del self._data[key]
+                removed += 1
+        return removed
+
+    def _live_entry(self, key: Hashable) -> Optional[tuple]:
+        now = self._timer()
+        self._check_store_expiry(now)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        entry = self._live_entry(key)
+        return default if entry is None else entry[0]
+
+    def lookup(self, key: Hashable) -> Optional[Tuple[Any, Optional[float]]]:
+        """Returns the payload of a live entry and its remaining time-to-live in seconds, or None if it never expires."""
+        entry = self._live_entry(key)
+        if entry is None:
+            return None
+        return entry[0], (None if entry[1] == _NO_EXPIRY else entry[1] - self._timer())
+
+    def ttl(self, key: Hashable, default: Any=None) -> Any:
+        """
+        Returns the remaining time-to-live of a live entry in seconds, including the deadline set by `expire_all`,
+        None if it never expires, or `default` if there is no such entry. It does not count as an access.
+        """
+        now = self._timer()
+        self._check_store_expiry(now)
+        try:
+            expires_at = min(Cache.__getitem__(self._data, key)[1], self._expires_at)
+        except KeyError:
+            return default
+        if expires_at <= now:
+            return default
+        return None if expires_at == _NO_EXPIRY else expires_at - now
+
+    def set(self, key: Hashable, payload: Any, ttl: Optional[float]=None, tags: Optional[Iterable[Hashable]]=None,
+            keep_tags: bool=False) -> None:
+        """Stores an entry with `tags`, replacing its current tags, or keeping them if `keep_tags` and no tags are given."""
+        expires_at = self._deadline(ttl)
+        self._check_store_expiry(self._timer())
+        data = self._data
+        if self.max_bytes is None:
+            data[key] = (payload, expires_at, 0)
+        else:
+            size = entry_size(key, payload)
+            if size > self.max_bytes:
+                data.pop(key, None)  # Too large to be cached: drop the previous value, as an eviction would
+                return
+            if self.max_entries is not None and key not in data and len(data) >= self.max_entries:
+                data.popitem()
+            data[key] = (payload, expires_at, size)
+        if tags:
+            self._tag(key, tags)
+        elif self._entry_tags and not keep_tags:
+            self._entry_tags.pop(key, None)
+        if expires_at != _NO_EXPIRY:
+            self._push_expiry(expires_at, key)
+        index = hash(key) % SCAN_BUCKETS
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = set()
+        if key not in bucket:
+            bucket.add(key)
+            self._indexed += 1
+            if self._indexed > 2 * len(self._data) + SCAN_BUCKETS:
+                self._rebuild_buckets()
+
+    def _push_expiry(self, expires_at: float, key: Hashable) -> None:
+        heap = self._expiry_heap
+        heapq.heappush(heap, (expires_at, key))
+        # Overwritten, deleted and evicted entries leave their deadline behind until it is due
+        if len(heap) > 2 * len(self._data) + SCAN_BUCKETS:
+            self._rebuild_expiry_heap()
+
+    def _rebuild_expiry_heap(self) -> None:
+        data = self._data
+        entries = ((key, Cache.__getitem__(data, key)) for key in list(data.keys()))  # Not an access, see `scan`
+        heap = [(entry[1], key) for key, entry in entries if entry[1] != _NO_EXPIRY]
+        heapq.heapify(heap)
+        self._expiry_heap = heap
+
+    def _rebuild_buckets(self) -> None:
+        buckets = {}
+        for key in self._data.keys():
+            buckets.setdefault(hash(key) % SCAN_BUCKETS, set()).add(key)
+        self._buckets = buckets
+        self._indexed = len(self._data)
+
+    def _tag(self, key: Hashable, tags: Iterable[Hashable]) -> None:
+        tags = self._entry_tags[key] = frozenset(tags)
+        index = self._tags
+        for tag in tags:
+            keys = index.get(tag)
+            if keys is None:
+                keys = index[tag] = set()
+            keys.add(key)
+        self._tagged += len(tags)
+        if self._tagged > self._tag_limit:
+            self._rebuild_tags()
+
+    def _rebuild_tags(self) -> None:
+        self.purge()
+        data = self._data
+        self._entry_tags = {key: tags for key, tags in self._entry_tags.items() if key in data}
+        index = {}
+        for key, tags in self._entry_tags.items():
+            for tag in tags:
+                index.setdefault(tag, set()).add(key)
+        self._tags = index
+        self._tagged = sum(len(tags) for tags in self._entry_tags.values())
+        self._tag_limit = 2 * self._tagged + SCAN_BUCKETS
+
+    def invalidate_tags(self, tags: Iterable[Hashable]) -> int:
+        """
+        Deletes every entry stored with at least one of `tags`.
+
+        Returns:
+            int: The number of live entries deleted.
+        """
+        now = self._timer()
+        self._check_store_expiry(now)
+        data, entry_tags = self._data, self._entry_tags
+        deleted = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if tag in entry_tags.get(key, ()):
+                    del entry_tags[key]
+                    entry = data.pop(key, None)
+                    deleted += entry is not None and entry[1] > now
+        return deleted
+
+    def pop(self, key: Hashable, default: Any=_MISSING) -> Any:
+        entry = self._live_entry(key)
+        if entry is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        del self._data[key]
+        return entry[0]
+
+    def expire(self, key: Hashable, ttl: float) -> bool:
+        """
+        Sets a new time-to-live on a single entry.
+
+        Returns:
+            bool: True if the entry exists and its TTL was updated, False otherwise.
+        """
+        entry = self._live_entry(key)
+        if entry is None:
+            return False
+        if ttl <= 0:
+            del self._data[key]
+            return True
+        expires_at = self._timer() + ttl
+        self._data[key] = (entry[0], expires_at, entry[2])
+        self._push_expiry(expires_at, key)
+        return True
+
+    def expire_all(self, ttl: float) -> bool:
+        """Schedules the whole store to be cleared after `ttl` seconds."""
+        if ttl <= 0:
+            self.clear()
+        else:
+            self._expires_at = self._timer() + ttl
+        return True
+
+    def keys(self) -> List[Hashable]:
+        self.purge()
+        return list(self._data.keys())
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        self.purge()
+        return [(key, entry[0]) for key, entry in self._data.items()]
+
+    def scan(self, cursor: int=0, count: int=1000, ttl: bool=False) -> Tuple[int, List[tuple]]:
+        """
+        Returns a page of live `(key, payload)` pairs and the cursor of the next page, 0 once every
+        bucket has been visited. Like Redis `SCAN`, `count` is a hint: whole buckets are returned, and
+        entries present during the entire iteration are returned exactly once. Scanning does not count
+        as an access for the eviction policy.
+        With `ttl`, the page holds `(key, payload, ttl)` triples instead, where `ttl` is the remaining
+        time-to-live of the entry in seconds, or None if it never expires.
+        """
+        now = self._timer()
+        self._check_store_expiry(now)
+        page = []
+        data = self._data
+        while cursor < SCAN_BUCKETS and len(page) < count:
+            bucket = self._buckets.get(cursor)
+            cursor += 1
+            if not bucket:
+                continue
+            removed = []
+            for key in bucket:
+                try:
+                    # Cache.__getitem__ bypasses the recency and frequency updates of the subclasses
+                    entry = Cache.__getitem__(data, key)
+                except KeyError:
+                    removed.append(key)
+                    continue
+                if entry[1] > now:
+                    if ttl:
+                        expires_at = min(entry[1], self._expires_at)
+                        page.append((key, entry[0], None if expires_at == _NO_EXPIRY else expires_at - now))
+                    else:
+                        page.append((key, entry[0]))
+            bucket.difference_update(removed)
+            self._indexed -= len(removed)
+        return (0 if cursor >= SCAN_BUCKETS else cursor), page
+
+    def clear(self) -> None:
+        # Swapping the containers is O(1), unlike popping every entry from the cachetools cache
+        self._data = self._new_cache()
+        self._watch_evictions(self._data)
+        self._expiry_heap = []
+        self._expires_at = _NO_EXPIRY
+        self._buckets = {}
+        self._indexed = 0
+        self._tags, self._entry_tags = {}, {}
+        self._tagged, self._tag_limit = 0, SCAN_BUCKETS
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._live_entry(key) is not None
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        self.purge()
+        return len(self._data)
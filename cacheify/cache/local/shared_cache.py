@@ -0,0 +1,567 @@
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from cacheify.cache.cacheable import MISSING, Cacheable, per_key_ttl
+from cacheify.cache.redis.encoding import decode, encode
+from cacheify.cache.serializers import CacheCodec, Serializer, get_codec
+from cacheify.cache.snapshot import entry_payload, payload_entry
+try:
+    import fcntl
+except ImportError:  # Not a POSIX system
+    fcntl = None
+
+_MAGIC = b'CFYSHM01'
+# Magic, layout version, number of slots, slot size, number of stripes, expiration of the whole cache
+_HEADER = struct.Struct('<8sIIIId')
+_TIMESTAMP = struct.Struct('<d')
+_EXPIRES_AT_OFFSET = 24
+HEADER_SIZE = 64
+# State, key length, value length, key hash, expiration time, last access time, followed by the key and the value
+_SLOT = struct.Struct('<BxHIQdd')
+_SLOT_EXPIRES_AT_OFFSET = 16
+_SLOT_ACCESSED_OFFSET = 24
+_EMPTY, _USED, _DELETED = 0, 1, 2
+_NO_EXPIRY = math.inf
+
+# The number of slots a key may be stored in, starting from its home slot
+PROBE_LIMIT = 16
+
+# Record locks are taken on offsets far beyond the end of the file, which POSIX allows
+_INIT_LOCK = 1 << 40
+_STRIPE_LOCKS = _INIT_LOCK + 1
+_NAMED_LOCKS = 1 << 41
+NAMED_LOCK_SLOTS = 1 << 16
+
+_CLEAR_CHUNK = 1 << 20
+
+def key_hash(key: bytes) -> int:
+    """A hash of `key` that every process agrees on, unlike the randomized `hash()`."""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+def _encode(value) -> bytes:
+    return encode(value).encode()
+
+def default_path(key: str) -> str:
+    """Returns the file backing the cache `key`: in /dev/shm when available, so it never touches the disk."""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'cacheify-' + re.sub(r'[^\w.-]', '_', key) + '.cache')
+
+_range_locks = weakref.WeakSet()
+
+def _reset_thread_locks() -> None:
+    # A forked child only has the thread that forked, so locks held by the parent's other threads must be dropped
+    for lock in list(_range_locks):
+        lock._thread_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_thread_locks)
+
+class _RangeLock:
+    """
+    Locks one byte of a file across processes, with a POSIX record lock, and across the threads of
+    the process, since record locks are held by processes. A process that dies releases its record locks.
+    """
+
+    def __init__(self, fd: int, offset: int):
+        self._fd = fd
+        self._offset = offset
+        self._thread_lock = threading.Lock()
+        _range_locks.add(self)
+
+    def acquire(self, blocking: bool=True, timeout: float=-1) -> bool:
+        deadline = time.monotonic() + timeout if timeout >= 0 else None
+        if not self._thread_lock.acquire(blocking, timeout):
+            return False
+        try:
+            if blocking and deadline is None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._offset)
+                return True
+            while True:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, self._offset)
+                    return True
+                except OSError:
+                    if not blocking or time.monotonic() >= deadline:
+                        self._thread_lock.release()
+                        return False
+                    time.sleep(0.001)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._offset)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class _LockFile:
+    """
+    A file locked with `_RangeLock`s, opened once per process. Record locks belong to the process, not to a file
+    descriptor, and closing any descriptor of the file releases all of them. So every cache of the process
+    using the file shares one descriptor, one memory map and one `_RangeLock` per offset, which also serializes
+    the threads of different caches, and the file is closed with the last of them. See `_open_lock_file`.
+    """
+
+    def __init__(self, identity: Tuple[int, int], fd: int):
+        self.identity = identity
+        self.fd = fd
+        self.mm: Optional[mmap.mmap] = None
+        self._fds = [fd]  # Also descriptors opened through other links to the file, see `_open_lock_file`
+        self._users = 1
+        self._locks: Dict[int, _RangeLock] = {}
+        self._guard = threading.Lock()
+
+    def lock(self, offset: int) -> _RangeLock:
+        with self._guard:
+            lock = self._locks.get(offset)
+            if lock is None:
+                lock = self._locks[offset] = _RangeLock(self.fd, offset)
+            return lock
+
+    def map(self, size: int) -> mmap.mmap:
+        with self._guard:
+            if self.mm is None:
+                self.mm = mmap.mmap(self.fd, size)
+            return self.mm
+
+    def close(self) -> None:
+        """Releases the file for one cache, and closes it once no cache of the process uses it."""
+        with _lock_files_guard:
+            self._users -= 1
+            if self._users:
+                return
+            del _lock_files[self.identity]
+        if self.mm is not None:
+            self.mm.close()
+        for fd in self._fds:
+            os.close(fd)
+
+_lock_files: Dict[Tuple[int, int], _LockFile] = {}
+_lock_files_guard = threading.Lock()
+
+def _open_lock_file(path: str) -> _LockFile:
+    """Opens `path`, creating it if needed, or returns the `_LockFile` of the process that already has it open."""
+    with _lock_files_guard:
+        try:
+            stat = os.stat(path)
+            lock_file = _lock_files.get((stat.st_dev, stat.st_ino))
+        except FileNotFoundError:
+            lock_file = None
+        if lock_file is None:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            stat = os.fstat(fd)
+            identity = (stat.st_dev, stat.st_ino)
+            lock_file = _lock_files.get(identity)
+            if lock_file is None:
+                lock_file = _lock_files[identity] = _LockFile(identity, fd)
+                return lock_file
+            lock_file._fds.append(fd)  # Another link to an open file: closing it now would release the locks
+        lock_file._users += 1
+        return lock_file
+
+class SharedMemoryCache(Cacheable):
+    """
+    SharedMemoryCache is a cache shared by every process of the host that opens the same file, such as
+    the workers of a prefork server. The file, in /dev/shm by default, is mapped in memory and holds a hash
+    table of fixed-size slots, so entries are read and written in place without any server round trip.
+
+    The slots are split in `stripes` regions, each guarded by a lock held across threads and processes.
+    A key is stored in one of the `PROBE_LIMIT` slots following its home slot; once they are all taken,
+    the least recently used of them is evicted, an approximation of LRU over the whole cache. Expired
+    entries are reclaimed when their slots are visited. Entries whose key and encoded value do not fit
+    in `slot_size - 32` bytes are not cached.
+
+    The geometry is fixed when the file is created: processes opening an existing file must pass the same
+    `slots`, `slot_size` and `stripes`. The file is kept after `close()`, so later processes find the cache warm.
+
+    Args:
+        key (str): The name of the cache, which determines the default file.
+        path (Optional[str]): The file backing the cache. Defaults to `default_path(key)`.
+        slots (int): The maximum number of entries, rounded up to a multiple of `stripes`.
+        slot_size (int): The size of a slot in bytes, including its 32 bytes header.
+        stripes (int): The number of lock stripes.
+        serializer (Union[str, Serializer, CacheCodec, None]): Stores entries as encoded bytes,
+            see `cacheify.cache.serializers`. If None, entries are stored as JSON.
+    """
+
+    def __init__(self, *, key: str='cache', path: Optional[str]=None, slots: int=16384, slot_size: int=1024,
+                 stripes: int=64, serializer: Union[str, Serializer, CacheCodec, None]=None, **kwargs):
+        if fcntl is None:
+            raise OSError('SharedMemoryCache requires a POSIX system')
+        if slots <= 0 or stripes <= 0:
+            raise ValueError('slots and stripes must be positive integers')
+        if slot_size <= _SLOT.size:
+            raise ValueError(f'slot_size must be larger than the {_SLOT.size} bytes slot header')
+        self._key = key
+        self.path = path or default_path(key)
+        self._stripes = stripes
+        self._per_stripe = -(-slots // stripes)
+        self._slots = self._per_stripe * stripes
+        self._slot_size = slot_size
+        self._capacity = slot_size - _SLOT.size
+        self._probe_limit = min(PROBE_LIMIT, self._per_stripe)
+        self._codec = get_codec(serializer)
+        self._encode, self._decode = (self._codec.encode, self._codec.decode) if self._codec else (_encode, decode)
+        self._eviction_listener: Optional[Callable[[int], None]] = None
+        self._file = _open_lock_file(self.path)
+        self._fd = self._file.fd
+        try:
+            self._mm = self._file.map(self._open_file())
+        except BaseException:
+            self._file.close()
+            raise
+        self._locks = [self._file.lock(_STRIPE_LOCKS + stripe) for stripe in range(stripes)]
+
+    def _open_file(self) -> int:
+        size = HEADER_SIZE + self._slots * self._slot_size
+        with self._file.lock(_INIT_LOCK):
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, 1, self._slots, self._slot_size, self._stripes, _NO_EXPIRY), 0)
+                return size
+            magic, version, slots, slot_size, stripes, _ = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+        if magic != _MAGIC or version != 1:
+            raise ValueError(f'{self.path} is not a cacheify shared memory cache')
+        if (slots, slot_size, stripes) != (self._slots, self._slot_size, self._stripes):
+            raise ValueError(
+                f'{self.path} was created with slots={slots}, slot_size={slot_size} and stripes={stripes}, '
+                f'not slots={self._slots}, slot_size={self._slot_size} and stripes={self._stripes}'
+            )
+        return size
+
+    @property
+    def key(self):
+        return self._key
+
+    def close(self) -> None:
+        """
+        Unmaps the file, once every cache of the process using it is closed. The entries stay in the file for the
+        other processes.
+        """
+        self._file.close()
+
+    def lock(self, name=None, auto_release_time=None):
+        """
+        Returns a lock on `name`, or on the whole cache when `name` is None, held across threads and processes.
+        Names are hashed over `NAMED_LOCK_SLOTS` locks, so distinct names may rarely share one.
+        `auto_release_time` is ignored since the lock of a process is released when it dies.
+        """
+        return self._file.lock(_NAMED_LOCKS + key_hash(repr(name).encode()) % NAMED_LOCK_SLOTS)
+
+    def _set_eviction_listener(self, listener: Optional[Callable[[int], None]]) -> None:
+        """Calls `listener` with 1 for every entry this process evicted to make room for another one."""
+        self._eviction_listener = listener
+
+    @contextmanager
+    def _locked(self, stripes: Iterable[int]):
+        # Stripes are always locked in ascending order, so two callers cannot deadlock
+        locks = [self._locks[stripe] for stripe in sorted(stripes)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _all_stripes(self):
+        return self._locked(range(self._stripes))
+
+    def _locate(self, key: str) -> Tuple[bytes, int, int]:
+        key_bytes = key.encode()
+        h = key_hash(key_bytes)
+        return key_bytes, h, h % self._stripes
+
+    def _check_expiry(self) -> None:
+        if _TIMESTAMP.unpack_from(self._mm, _EXPIRES_AT_OFFSET)[0] <= time.time():
+            self.clear()
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self._slot_size
+
+    def _find(self, key_bytes: bytes, h: int, stripe: int, now: float) -> Tuple[int, int, int]:
+        """
+        Probes the slots of a key. Returns the slot holding it, or -1, the first free slot, or -1,
+        and the least recently used slot, the victim when there is no free one.
+        """
+        mm, per_stripe = self._mm, self._per_stripe
+        base, home = stripe * per_stripe, (h // self._stripes) % per_stripe
+        free, victim, oldest = -1, -1, math.inf
+        for i in range(self._probe_limit):
+            slot = base + (home + i) % per_stripe
+            offset = HEADER_SIZE + slot * self._slot_size
+            state, key_length, _, slot_hash, expires_at, accessed = _SLOT.unpack_from(mm, offset)
+            if state == _EMPTY:
+                return -1, (slot if free < 0 else free), victim
+            if state == _USED and expires_at <= now:
+                mm[offset] = _DELETED  # Reclaims the expired entry
+                state = _DELETED
+            if state == _DELETED:
+                if free < 0:
+                    free = slot
+            elif slot_hash == h and key_length == len(key_bytes) and mm[offset + _SLOT.size:offset + _SLOT.size + key_length] == key_bytes:
+                return slot, free, victim
+            elif accessed < oldest:
+                victim, oldest = slot, accessed
+        return -1, free, victim
+
+    def _delete(self, slot: int) -> None:
+        # A deleted slot followed by an empty one ends no probe sequence, so it can be emptied too
+        base = slot - slot % self._per_stripe
+        following = base + (slot - base + 1) % self._per_stripe
+        self._mm[self._offset(slot)] = _EMPTY if self._mm[self._offset(following)] == _EMPTY else _DELETED
+
+    def _payload(self, slot: int, now: float) -> bytes:
+        offset = self._offset(slot)
+        _, key_length, value_length, _, _, _ = _SLOT.unpack_from(self._mm, offset)
+        _TIMESTAMP.pack_into(self._mm, offset + _SLOT_ACCESSED_OFFSET, now)
+        start = offset + _SLOT.size + key_length
+        return self._mm[start:start + value_length]
+
+    def _read(self, key: str, remove: bool=False) -> Optional[bytes]:
+        key_bytes, h, stripe = self._locate(key)
+        with self._locks[stripe]:
+            now = time.time()
+            slot = self._find(key_bytes, h, stripe, now)[0]
+            if slot < 0:
+                return None
+            payload = self._payload(slot, now)
+            if remove:
+                self._delete(slot)
+            return payload
+
+    def _write(self, key_bytes: bytes, h: int, stripe: int, payload: bytes, ttl: Optional[float]) -> int:
+        """Writes an entry while its stripe is locked. Returns the number of entries evicted."""
+        now = time.time()
+        found, free, victim = self._find(key_bytes, h, stripe, now)
+        if len(key_bytes) + len(payload) > self._capacity:
+            if found >= 0:
+                self._delete(found)  # Too large to be cached: drop the previous value, as an eviction would
+            return 0
+        slot = found if found >= 0 else free if free >= 0 else victim
+        offset = self._offset(slot)
+        mm = self._mm
+        mm[offset] = _DELETED  # A reader never sees a half-written entry, even if this process dies meanwhile
+        start = offset + _SLOT.size
+        mm[start:start + len(key_bytes)] = key_bytes
+        mm[start + len(key_bytes):start + len(key_bytes) + len(payload)] = payload
+        _SLOT.pack_into(mm, offset, _USED, len(key_bytes), len(payload), h, now + ttl if ttl else _NO_EXPIRY, now)
+        return 1 if found < 0 and free < 0 else 0
+
+    def _store(self, key: str, payload: bytes, ttl: Optional[float]) -> None:
+        self._check_expiry()
+        key_bytes, h, stripe = self._locate(key)
+        with self._locks[stripe]:
+            evicted = self._write(key_bytes, h, stripe, payload, ttl)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    def get(self, key):
+        self._check_expiry()
+        return self._decode(self._read(key))
+
+    def set(self, key, value, ttl=None, tags=None):
+        if tags:
+            raise NotImplementedError('SharedMemoryCache does not support tags')
+        self._store(key, self._encode(value), ttl)
+
+    def pop(self, key):
+        self._check_expiry()
+        payload = self._read(key, remove=True)
+        if payload is None:
+            raise KeyError(key)
+        return self._decode(payload)
+
+    def get_bytes(self, key):
+        self._check_expiry()
+        return self._read(key)
+
+    def set_bytes(self, key, value, ttl=None):
+        self._store(key, value if type(value) is bytes else bytes(value), ttl)
+
+    def get_many(self, keys, default=MISSING):
+        self._check_expiry()
+        located = [self._locate(key) for key in keys]
+        with self._locked({stripe for _, _, stripe in located}):
+            now = time.time()
+            payloads = []
+            for key_bytes, h, stripe in located:
+                slot = self._find(key_bytes, h, stripe, now)[0]
+                payloads.append(MISSING if slot < 0 else self._payload(slot, now))
+        return [default if payload is MISSING else self._decode(payload) for payload in payloads]
+
+    def set_many(self, mapping, ttl=None):
+        self._check_expiry()
+        entries = [(*self._locate(key), self._encode(value), per_key_ttl(ttl, key)) for key, value in mapping.items()]
+        with self._locked({entry[2] for entry in entries}):
+            evicted = sum(self._write(*entry) for entry in entries)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    def _update(self, key, update):
+        # The stripe lock is shared by every process, so the update is atomic across them
+        self._check_expiry()
+        key_bytes, h, stripe = self._locate(key)
+        with self._locks[stripe]:
+            now = time.time()
+            slot = self._find(key_bytes, h, stripe, now)[0]
+            if slot < 0:
+                payload, ttl, result = update(MISSING, None)
+            else:
+                expires_at = _SLOT.unpack_from(self._mm, self._offset(slot))[4]
+                payload, ttl, result = update(self._payload(slot, now), None if expires_at == _NO_EXPIRY else expires_at - now)
+            evicted = 0 if payload is MISSING else self._write(key_bytes, h, stripe, payload, ttl)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+        return result
+
+    def delete_many(self, keys):
+        self._check_expiry()
+        located = [self._locate(key) for key in keys]
+        deleted = 0
+        with self._locked({stripe for _, _, stripe in located}):
+            now = time.time()
+            for key_bytes, h, stripe in located:
+                slot = self._find(key_bytes, h, stripe, now)[0]
+                if slot >= 0:
+                    self._delete(slot)
+                    deleted += 1
+        return deleted
+
+    def _entries(self, start: int, stop: int, now: float) -> Iterator[Tuple[str, bytes]]:
+        mm = self._mm
+        for slot in range(start, stop):
+            offset = HEADER_SIZE + slot * self._slot_size
+            state, key_length, value_length, _, expires_at, _ = _SLOT.unpack_from(mm, offset)
+            if state == _USED and expires_at > now:
+                start_key = offset + _SLOT.size
+                yield mm[start_key:start_key + key_length].decode(), mm[start_key + key_length:start_key + key_length + value_length]
+
+    def keys(self):
+        """
+        This is an O(slots) operation, so performance may degrade with larger caches.
+        Avoid using this method in performance-critical code.
+        """
+        return [key for key, _ in self._all_entries()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def items(self):
+        return [(key, self._decode(payload)) for key, payload in self._all_entries()]
+
+    def _all_entries(self) -> List[Tuple[str, bytes]]:
+        self._check_expiry()
+        with self._all_stripes():
+            return list(self._entries(0, self._slots, time.time()))
+
+    def scan_keys(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [key for key, _ in items]
+
+    def scan_items(self, cursor=0, count=1000):
+        cursor, items = self._scan(cursor, count)
+        return cursor, [(key, self._decode(payload)) for key, payload in items]
+
+    def _scan(self, cursor, count):
+        # The cursor is a slot index. Entries are never moved, so one present during the whole iteration
+        # is returned exactly once. Only the lock of the stripe being scanned is held.
+        self._check_expiry()
+        page = []
+        while cursor < self._slots and len(page) < count:
+            stripe = cursor // self._per_stripe
+            stop = min((stripe + 1) * self._per_stripe, cursor + max(count - len(page), 1))
+            with self._locks[stripe]:
+                page.extend(self._entries(cursor, stop, time.time()))
+            cursor = stop
+        return (0 if cursor >= self._slots else cursor), page
+
+    def _export_entries(self):
+        self._check_expiry()
+        cache_expires_at = _TIMESTAMP.unpack_from(self._mm, _EXPIRES_AT_OFFSET)[0]
+        mm = self._mm
+        for stripe in range(self._stripes):
+            with self._locks[stripe]:
+                now, page = time.time(), []
+                for slot in range(stripe * self._per_stripe, (stripe + 1) * self._per_stripe):
+                    offset = HEADER_SIZE + slot * self._slot_size
+                    state, key_length, value_length, _, expires_at, _ = _SLOT.unpack_from(mm, offset)
+                    if state == _USED and expires_at > now:
+                        start = offset + _SLOT.size
+                        expires_at = min(expires_at, cache_expires_at)
+                        page.append(payload_entry(
+                            mm[start:start + key_length].decode(), mm[start + key_length:start + key_length + value_length],
+                            None if expires_at == _NO_EXPIRY else expires_at
+                        ))
+            yield from page
+
+    def _import_entries(self, entries):
+        self._check_expiry()
+        now = time.time()
+        encode = self._codec.encode if self._codec else None
+        rows = [
+            (*self._locate(entry.key), entry_payload(entry, encode), entry.ttl(now))
+            for entry in entries if entry.expires_at is None or entry.expires_at > now
+        ]
+        with self._locked({row[2] for row in rows}):
+            evicted = sum(self._write(*row) for row in rows)
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    def expire(self, ttl, key=None, **kwargs):
+        """
+        Expires a single entry after `ttl` seconds, or the whole cache when `key` is None.
+        """
+        self._check_expiry()
+        if key is None:
+            if ttl <= 0:
+                self.clear()
+            else:
+                _TIMESTAMP.pack_into(self._mm, _EXPIRES_AT_OFFSET, time.time() + ttl)
+            return True
+        key_bytes, h, stripe = self._locate(key)
+        with self._locks[stripe]:
+            now = time.time()
+            slot = self._find(key_bytes, h, stripe, now)[0]
+            if slot < 0:
+                return False
+            if ttl <= 0:
+                self._delete(slot)
+            else:
+                _TIMESTAMP.pack_into(self._mm, self._offset(slot) + _SLOT_EXPIRES_AT_OFFSET, now + ttl)
+            return True
+
+    def clear(self):
+        with self._all_stripes():
+            zeros = bytes(_CLEAR_CHUNK)
+            for start in range(HEADER_SIZE, len(self._mm), _CLEAR_CHUNK):
+                stop = min(start + _CLEAR_CHUNK, len(self._mm))
+                self._mm[start:stop] = zeros[:stop - start]
+            _TIMESTAMP.pack_into(self._mm, _EXPIRES_AT_OFFSET, _NO_EXPIRY)
+
+    def __iter__(self):
+        """
+        Streams the cache keys with `iter_keys`.
+        """
+        return self.iter_keys()
+
+    def __len__(self):
+        self._check_expiry()
+        with self._all_stripes():
+            now = time.time()
+            return sum(1 for _ in self._entries(0, self._slots, now))
@@ -0,0 +1,167 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+from cachetools import Cache
+
+_MASK64 = (1 << 64) - 1
+# Odd 64-bit multipliers, one per sketch row
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+# Maps every counter value to its half, so a whole row is aged with one `bytearray.translate`
+_HALVE = bytes(value >> 1 for value in range(256))
+
+class CountMinSketch:
+    """
+    CountMinSketch estimates how often keys were seen using a few rows of small counters, each row
+    indexed by a different hash of the key. The estimate is the smallest of the key's counters, so it
+    can only overestimate, when keys collide in every row. Counters saturate at 15 and are all halved
+    once `sample_size` keys have been added, so the estimates favor recent activity.
+
+    Args:
+        width (int): The number of counters per row, rounded up to a power of two.
+        sample_size (Optional[int]): The number of additions between two halvings. Defaults to 10 × width.
+    """
+
+    def __init__(self, width: int, sample_size: Optional[int]=None):
+        bits = max(4, (max(width, 1) - 1).bit_length())
+        self.width = 1 << bits
+        self._shift = 64 - bits  # Indexes are the top bits of the multiplied hash
+        self.sample_size = sample_size or 10 * self.width
+        self._rows = [bytearray(self.width) for _ in _SEEDS]
+        self._additions = 0
+
+    def add(self, key: Hashable) -> None:
+        h, shift = hash(key) & _MASK64, self._shift
+        for row, seed in zip(self._rows, _SEEDS):
+            index = ((h * seed) & _MASK64) >> shift
+            if row[index] < 15:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._rows = [row.translate(_HALVE) for row in self._rows]
+            self._additions //= 2
+
+    def frequency(self, key: Hashable) -> int:
+        h, shift = hash(key) & _MASK64, self._shift
+        return min(row[((h * seed) & _MASK64) >> shift] for row, seed in zip(self._rows, _SEEDS))
+
+class TinyLFUCache(Cache):
+    """
+    A `cachetools` cache implementing the W-TinyLFU eviction policy, as in Caffeine.
+
+    New entries go to a small LRU window, whose overflow moves to the main area. Once the cache is full,
+    the oldest window entry competes with the main area's next victim: a `CountMinSketch` of recent
+    accesses, misses included, keeps the candidate only if it was used more often than the victim, so
+    entries seen once cannot flush popular ones. The main area is a segmented LRU: entries start on
+    probation and are promoted to the protected segment when accessed again.
+
+    Args:
+        maxsize (float): The capacity, in units of `getsizeof`.
+        getsizeof (Optional[Callable]): Returns the size of a value. Every value has size 1 by default.
+        window (float): The share of `maxsize` given to the window.
+        protected (float): The share of the main area given to the protected segment.
+        sketch_width (Optional[int]): The number of counters per sketch row. Defaults to 4 × `maxsize`, up to 2^20,
+            or to 2^16 when sizes are weighted by `getsizeof` or the cache is unbounded. The counters are aged
+            after 10 × `maxsize` accesses in the first case, and 10 × `sketch_width` otherwise.
+    """
+
+    def __init__(self, maxsize: float, getsizeof: Optional[Callable]=None, window: float=0.01, protected: float=0.8,
+                 sketch_width: Optional[int]=None):
+        Cache.__init__(self, maxsize, getsizeof)
+        sample_size = None
+        if sketch_width is None:
+            if getsizeof is None and maxsize != math.inf:
+                sketch_width, sample_size = min(4 * int(maxsize), 1 << 20), 10 * int(maxsize)
+            else:
+                sketch_width = 1 << 16
+        self._sketch = CountMinSketch(sketch_width, sample_size)
+        self._window_max = max(1, maxsize * window)
+        self._protected_max = (maxsize - self._window_max) * protected
+        # Key -> size, in LRU order
+        self._window: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._probation: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._protected: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._window_size = 0
+        self._protected_size = 0
+
+    def __getitem__(self, key, cache_getitem=Cache.__getitem__):
+        value = cache_getitem(self, key)
+        self._sketch.add(key)
+        if key in self:  # __missing__ may not store item
+            self._touch(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        self._sketch.add(key)  # Misses count too, so a key requested often gets admitted once it is stored
+        return default
+
+    def __setitem__(self, key, value, cache_setitem=Cache.__setitem__):
+        cache_setitem(self, key, value)
+        self._sketch.add(key)
+        size = self.getsizeof(value)
+        if key in self._window:
+            self._window_size += size - self._window[key]
+            self._window[key] = size
+            self._window.move_to_end(key)
+        elif key in self._probation:
+            self._probation[key] = size
+            self._touch(key)
+        elif key in self._protected:
+            self._protected_size += size - self._protected[key]
+            self._protected[key] = size
+            self._protected.move_to_end(key)
+        else:
+            self._window[key] = size
+            self._window_size += size
+            while self._window_size > self._window_max and len(self._window) > 1:
+                moved, moved_size = self._window.popitem(last=False)
+                self._window_size -= moved_size
+                self._probation[moved] = moved_size
+
+    def __delitem__(self, key, cache_delitem=Cache.__delitem__):
+        cache_delitem(self, key)
+        if key in self._window:
+            self._window_size -= self._window.pop(key)
+        elif key in self._protected:
+            self._protected_size -= self._protected.pop(key)
+        else:
+            del self._probation[key]
+
+    def _touch(self, key) -> None:
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        else:
+            size = self._probation.pop(key)
+            self._protected[key] = size
+            self._protected_size += size
+            # Demote the least recently used protected entries back to probation
+            while self._protected_size > self._protected_max and len(self._protected) > 1:
+                demoted, demoted_size = self._protected.popitem(last=False)
+                self._protected_size -= demoted_size
+                self._probation[demoted] = demoted_size
+
+    def popitem(self):
+        """Remove and return the `(key, value)` pair chosen by the W-TinyLFU policy."""
+        main = self._probation or self._protected
+        if self._window:
+            candidate = next(iter(self._window))
+            victim = next(iter(main), None)
+            if victim is not None and self._sketch.frequency(candidate) > self._sketch.frequency(victim):
+                size = self._window.pop(candidate)
+                self._window_size -= size
+                self._probation[candidate] = size
+                key = victim
+            else:
+                key = candidate
+        else:
+            try:
+                key = next(iter(main))
+            except StopIteration:
+                raise KeyError('%s is empty' % type(self).__name__) from None
+        # Cache.__getitem__ does not count the eviction as an access
+        value = Cache.__getitem__(self, key)
+        del self[key]
+        return (key, value)
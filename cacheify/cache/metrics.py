@@ -0,0 +1,315 @@
+"""
+Metrics of the cache operations.
+
+`instrument(cache)` records, for every operation of a cache: call counts, errors and a latency
+histogram, hit and miss counts for the reads, the time spent waiting for the cache's locks (the
+lock stripes of a LocalCache, the semaphore and Redlock of a RedisCache), the size of the serialized
+payloads, and the number of entries evicted by a bounded cache. `CacheMetrics.stats()` returns a
+snapshot, and the exporters of `cacheify.cache.exporters` publish them to Prometheus, StatsD or OpenTelemetry.
+
+Instrumentation replaces the methods of the cache instance with timed wrappers, and `uninstrument`
+puts the class methods back, so caches that are not instrumented run exactly the same code as before.
+"""
+import bisect
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .cacheable import MISSING
+
+# Latency buckets in seconds, from 1 microsecond to 10 seconds
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Payload size buckets in bytes, from 64 bytes to 16 MiB
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+OPERATIONS = (
+    'get', 'set', 'pop', 'get_bytes', 'set_bytes', 'get_many', 'set_many', 'delete_many',
+    'keys', 'values', 'items', 'scan_keys', 'scan_items', 'expire', 'clear',
+)
+
+class Histogram:
+    """
+    A histogram with fixed bucket upper bounds. Not thread-safe; `CacheMetrics` serializes the updates.
+    """
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # The last bucket counts values above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the count, the sum, and the cumulative count of every bucket as `(upper bound, count)` pairs."""
+        buckets, total = [], 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+class CacheMetrics:
+    """
+    CacheMetrics holds the counters and histograms of one cache. It is thread-safe.
+
+    Args:
+        name (str): The name of the cache, used as a label by the exporters.
+        latency_buckets (Iterable[float]): The upper bounds, in seconds, of the latency histograms.
+        size_buckets (Iterable[float]): The upper bounds, in bytes, of the payload size histogram.
+    """
+
+    def __init__(self, name: str, latency_buckets: Iterable[float]=LATENCY_BUCKETS, size_buckets: Iterable[float]=SIZE_BUCKETS):
+        self.name = name
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies: Dict[str, Histogram] = {}
+            self._errors: Dict[str, int] = {}
+            self._hits = self._misses = self._evictions = 0
+            self._refresh_queue = 0
+            self._lock_wait = Histogram(self.latency_buckets)
+            self._payload_sizes = Histogram(self.size_buckets)
+
+    def observe(self, operation: str, seconds: float, error: bool=False, hits: int=0, misses: int=0) -> None:
+        """Records a call of `operation` that took `seconds`, and the hits and misses of a read."""
+        with self._lock:
+            histogram = self._latencies.get(operation)
+            if histogram is None:
+                histogram = self._latencies[operation] = Histogram(self.latency_buckets)
+                self._errors[operation] = 0
+            histogram.observe(seconds)
+            if error:
+                self._errors[operation] += 1
+            self._hits += hits
+            self._misses += misses
+
+    def record_lookups(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+
+    def record_evictions(self, count: int) -> None:
+        with self._lock:
+            self._evictions += count
+
+    def record_refresh_queue(self, depth: int) -> None:
+        """Records the number of background refreshes queued or running, see `cacheify.cache.refresh`."""
+        with self._lock:
+            self._refresh_queue = depth
+
+    def observe_lock_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._lock_wait.observe(seconds)
+
+    def observe_payload(self, size: int) -> None:
+        with self._lock:
+            self._payload_sizes.observe(size)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the metrics: the hit, miss and eviction counts, the hit ratio, the refresh
+        queue depth, and the histograms of every operation (with its error count), of the lock waits and
+        of the payload sizes.
+        """
+        with self._lock:
+            operations = {
+                operation: {**histogram.snapshot(), 'errors': self._errors[operation]}
+                for operation, histogram in self._latencies.items()
+            }
+            hits, misses, evictions, refresh_queue = self._hits, self._misses, self._evictions, self._refresh_queue
+            lock_wait, payload_sizes = self._lock_wait.snapshot(), self._payload_sizes.snapshot()
+        return {
+            'name': self.name,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': evictions,
+            'refresh_queue': refresh_queue,
+            'operations': operations,
+            'lock_wait': lock_wait,
+            'payload_bytes': payload_sizes,
+        }
+
+class _TimedLock:
+    """Wraps a lock, a semaphore or a Redlock and reports how long every acquisition waited."""
+
+    def __init__(self, lock, observe: Callable[[float], None]):
+        self._lock = lock
+        self._observe = observe
+
+    def acquire(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._lock.acquire(*args, **kwargs)
+        finally:
+            self._observe(time.perf_counter() - started)
+
+    def release(self, *args, **kwargs):
+        return self._lock.release(*args, **kwargs)
+
+    def __enter__(self):
+        started = time.perf_counter()
+        try:
+            return self._lock.__enter__()
+        finally:
+            self._observe(time.perf_counter() - started)
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        try:
+            return await self._lock.__aenter__()
+        finally:
+            self._observe(time.perf_counter() - started)
+
+    async def __aexit__(self, *exc_info):
+        return await self._lock.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._lock, name)
+
+def _lookup_outcome(operation: str, result, args: tuple, kwargs: dict) -> Tuple[int, int]:
+    """Returns the `(hits, misses)` of a read, `(0, 0)` for other operations."""
+    if operation in ('get', 'get_bytes'):
+        return (0, 1) if result is None else (1, 0)
+    if operation == 'pop':
+        return 1, 0
+    if operation == 'get_many':
+        default = kwargs.get('default', args[1] if len(args) > 1 else MISSING)
+        misses = sum(1 for value in result if value is default)
+        return len(result) - misses, misses
+    return 0, 0
+
+def _timed(metrics: CacheMetrics, operation: str, method: Callable) -> Callable:
+    # KeyError is how `pop` reports a miss, not a failure
+    def finish(started: float, result=None, error: Optional[BaseException]=None, args: tuple=(), kwargs: dict={}):
+        elapsed = time.perf_counter() - started
+        if error is None:
+            hits, misses = _lookup_outcome(operation, result, args, kwargs)
+            metrics.observe(operation, elapsed, False, hits, misses)
+        elif operation == 'pop' and isinstance(error, KeyError):
+            metrics.observe(operation, elapsed, False, 0, 1)
+        else:
+            metrics.observe(operation, elapsed, True)
+
+    if inspect.iscoroutinefunction(method):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+            except BaseException as error:
+                finish(started, error=error)
+                raise
+            finish(started, result, args=args, kwargs=kwargs)
+            return result
+    else:
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException as error:
+                finish(started, error=error)
+                raise
+            finish(started, result, args=args, kwargs=kwargs)
+            return result
+    timed.__wrapped__ = method
+    timed.__name__ = operation
+    timed.__doc__ = method.__doc__
+    timed._instrumented = True
+    return timed
+
+def _timed_lock_factory(lock: Callable, metrics: CacheMetrics) -> Callable:
+    def timed_lock(*args, **kwargs):
+        return _TimedLock(lock(*args, **kwargs), metrics.observe_lock_wait)
+    timed_lock.__wrapped__ = lock
+    timed_lock._instrumented = True
+    return timed_lock
+
+def _measured_encoder(encode: Callable, metrics: CacheMetrics) -> Callable:
+    def measured_encode(value):
+        payload = encode(value)
+        if isinstance(payload, (str, bytes)):
+            metrics.observe_payload(len(payload))
+        return payload
+    measured_encode.__wrapped__ = encode
+    return measured_encode
+
+def _lock_owners(cache) -> List[Any]:
+    # AsyncLocalCache keeps its locks in the LocalCache it wraps
+    inner = getattr(cache, '_cache', None)
+    return [owner for owner in (cache, inner) if owner is not None and (hasattr(owner, '_semaphore') or hasattr(owner, '_locks'))]
+
+def instrument(cache, metrics: Optional[CacheMetrics]=None, exporters: Iterable[Any]=(),
+               operations: Iterable[str]=OPERATIONS) -> CacheMetrics:
+    """
+    Starts recording the metrics of `cache`, a `Cacheable` or an `AsyncCacheable`, and returns them.
+
+    Args:
+        cache: The cache to instrument.
+        metrics (Optional[CacheMetrics]): Where to record the metrics. Defaults to new metrics named after `cache.key`.
+        exporters (Iterable[MetricsExporter]): Exporters publishing the metrics, see `cacheify.cache.exporters`.
+        operations (Iterable[str]): The methods to time.
+
+    Returns:
+        CacheMetrics: The metrics, also available as `cache.metrics`.
+    """
+    if getattr(cache, 'metrics', None) is not None:
+        raise ValueError(f'The cache {cache.key!r} is already instrumented')
+    metrics = metrics if metrics is not None else CacheMetrics(str(cache.key))
+    for operation in operations:
+        method = getattr(cache, operation, None)
+        if method is not None:
+            setattr(cache, operation, _timed(metrics, operation, method))
+    lock = getattr(cache, 'lock', None)
+    if lock is not None:
+        cache.lock = _timed_lock_factory(lock, metrics)
+    for owner in _lock_owners(cache):
+        if hasattr(owner, '_semaphore'):
+            owner._semaphore = _TimedLock(owner._semaphore, metrics.observe_lock_wait)
+        if hasattr(owner, '_locks'):  # The lock stripes of a LocalCache
+            owner._locks = [_TimedLock(lock, metrics.observe_lock_wait) for lock in owner._locks]
+    for owner in (cache, getattr(cache, '_cache', None)):
+        if callable(getattr(owner, '_encode', None)):
+            owner._encode = _measured_encoder(owner._encode, metrics)
+            break
+    set_eviction_listener = getattr(cache, '_set_eviction_listener', None)
+    if set_eviction_listener is not None:
+        set_eviction_listener(metrics.record_evictions)
+    for exporter in exporters:
+        exporter.add(metrics)
+    cache.metrics = metrics
+    return metrics
+
+def uninstrument(cache) -> None:
+    """Stops recording the metrics of `cache`, restoring its original methods."""
+    if getattr(cache, 'metrics', None) is None:
+        return
+    for name, value in list(vars(cache).items()):
+        if getattr(value, '_instrumented', False):
+            delattr(cache, name)
+    for owner in _lock_owners(cache):
+        if isinstance(getattr(owner, '_semaphore', None), _TimedLock):
+            owner._semaphore = owner._semaphore._lock
+        if hasattr(owner, '_locks'):
+            owner._locks = [lock._lock if isinstance(lock, _TimedLock) else lock for lock in owner._locks]
+    for owner in (cache, getattr(cache, '_cache', None)):
+        encode = getattr(owner, '_encode', None)
+        if hasattr(encode, '__wrapped__'):
+            owner._encode = encode.__wrapped__
+    set_eviction_listener = getattr(cache, '_set_eviction_listener', None)
+    if set_eviction_listener is not None:
+        set_eviction_listener(None)
+    cache.metrics = None
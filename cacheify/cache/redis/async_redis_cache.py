@@ -0,0 +1,162 @@
+import weakref
+from typing import Callable, Dict, Optional, Union
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from cacheify.cache.async_cacheable import AsyncCacheable
+from cacheify.cache.cacheable import MISSING, per_key_ttl
+from cacheify.cache.serializers import CacheCodec, Serializer, get_codec
+from .connector import AsyncRedisConnector, binary_client
+from .encoding import batches, decode, decode_key, encode, to_millis
+from .scripts import build_scripts, check_limits
+
+class AsyncRedisCache(AsyncCacheable):
+    """
+    AsyncRedisCache is the `redis.asyncio` counterpart of RedisCache and shares its storage layout,
+    so both can operate on the same cache. Every operation is a single atomic command or Lua script;
+    there is no client-side locking.
+
+    Args:
+        key (str): The name of the cache and of its Redis hash.
+        client (Optional[Redis]): The asyncio client to use. Defaults to the AsyncRedisConnector client of the running loop.
+        reap_limit (int): The maximum number of expired entries removed on every write.
+        serializer (Union[str, Serializer, CacheCodec, None]): Encodes the entries as header-framed bytes,
+            see `cacheify.cache.serializers`. Requires a client created with `decode_responses=False`.
+        hash_tag (bool): Name the Redis keys `{<key>}` and `{<key>}:expires`, as RedisCache does on a cluster.
+            Required with a Redis Cluster client, so that both keys share a slot.
+        max_entries (Optional[int]): The maximum number of entries kept in the cache. Unbounded if None.
+        max_bytes (Optional[int]): The maximum total size of the entries, in bytes. Unbounded if None.
+        eviction (str): The eviction policy used once a limit is exceeded: 'lru' or 'lfu'. See RedisCache.
+    """
+
+    def __init__(self, *, key: str='cache', client: Optional[Redis]=None, reap_limit: int=100,
+                 serializer: Union[str, Serializer, CacheCodec, None]=None, hash_tag: bool=False,
+                 max_entries: Optional[int]=None, max_bytes: Optional[int]=None, eviction: str='lru', **kwargs):
+        self._key = key
+        self._client = client
+        self.reap_limit = reap_limit
+        name = f'{{{key}}}' if hash_tag else key
+        bounded = check_limits(max_entries, max_bytes)
+        self._keys = [name, f'{name}:expires', f'{name}:versions'] + ([f'{name}:usage', f'{name}:stats'] if bounded else [])
+        self.max_entries, self.max_bytes, self.eviction = max_entries, max_bytes, eviction
+        self._sources = build_scripts(max_entries, max_bytes, eviction)
+        self._scripts: Dict[str, AsyncScript] = {}
+        self._binary_clients = weakref.WeakKeyDictionary()  # client -> client that does not decode responses
+        self._codec = get_codec(serializer)
+        self._encode, self._decode = (self._codec.encode, self._codec.decode) if self._codec else (encode, decode)
+        self._eviction_listener: Optional[Callable[[int], None]] = None
+
+    @property
+    def key(self):
+        return self._key
+
+    def lock(self, name=None, auto_release_time=None):
+        """
+        Returns a Redis lock shared by every process using this cache, usable with `async with`.
+        It is released automatically after `auto_release_time` seconds (10 by default).
+        """
+        return self._redis.lock(
+            f'{self._keys[0]}:lock' if name is None else f'{self._keys[0]}:lock:{name}',
+            timeout=auto_release_time or 10
+        )
+
+    @property
+    def _redis(self) -> Redis:
+        return self._client if self._client is not None else AsyncRedisConnector()
+
+    @property
+    def _binary_redis(self) -> Redis:
+        """The client of the running loop, or a sibling client that does not decode responses, used by `get_bytes`."""
+        client = self._redis
+        binary = self._binary_clients.get(client)
+        if binary is None:
+            binary = self._binary_clients[client] = binary_client(client)
+        return binary
+
+    async def _run(self, script: str, *args, client: Optional[Redis]=None):
+        client = client or self._redis
+        if not self._scripts:
+            self._scripts = {name: client.register_script(source) for name, source in self._sources.items()}
+        return await self._scripts[script](keys=self._keys, args=args, client=client)
+
+    def _set_eviction_listener(self, listener: Optional[Callable[[int], None]]) -> None:
+        """Calls `listener` with the number of entries evicted by each write that evicted some."""
+        self._eviction_listener = listener
+
+    def _report_evictions(self, evicted: int) -> None:
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    async def get(self, key):
+        return self._decode(await self._run('get', key))
+
+    async def set(self, key, value, ttl=None):
+        self._report_evictions(await self._run('set', key, self._encode(value), to_millis(ttl), self.reap_limit))
+
+    async def pop(self, key):
+        result = await self._run('pop', key)
+        if not result[0]:
+            raise KeyError(key)
+        return self._decode(result[1])
+
+    async def get_bytes(self, key):
+        return await self._run('get', key, client=self._binary_redis)
+
+    async def set_bytes(self, key, value, ttl=None):
+        payload = value if isinstance(value, (bytes, memoryview)) else memoryview(value)
+        self._report_evictions(await self._run('set', key, payload, to_millis(ttl), self.reap_limit))
+
+    async def get_many(self, keys, default=MISSING):
+        payloads = []
+        for batch in batches(list(keys)):
+            payloads.extend(await self._run('get_many', *batch))
+        return [default if payload is None else self._decode(payload) for payload in payloads]
+
+    async def set_many(self, mapping, ttl=None):
+        entries = [(key, self._encode(value), to_millis(per_key_ttl(ttl, key))) for key, value in mapping.items()]
+        for batch in batches(entries):
+            self._report_evictions(await self._run('set_many', self.reap_limit, *(arg for entry in batch for arg in entry)))
+
+    async def delete_many(self, keys):
+        deleted = 0
+        for batch in batches(list(keys)):
+            deleted += await self._run('delete_many', *batch)
+        return deleted
+
+    async def keys(self):
+        await self._run('reap')
+        return [decode_key(key) for key in await self._redis.hkeys(self._keys[0])]
+
+    async def values(self):
+        return [value for _, value in await self.items()]
+
+    async def items(self):
+        await self._run('reap')
+        entries = await self._redis.hgetall(self._keys[0])
+        return [(decode_key(key), self._decode(value)) for key, value in entries.items()]
+
+    async def scan_keys(self, cursor=0, count=1000):
+        cursor, page = await self._run('scan', cursor, count, 0)
+        return int(cursor), [decode_key(field) for field in page]
+
+    async def scan_items(self, cursor=0, count=1000):
+        cursor, page = await self._run('scan', cursor, count, 1)
+        return int(cursor), [(decode_key(field), self._decode(value)) for field, value in zip(page[::2], page[1::2])]
+
+    async def expire(self, ttl, key=None, **kwargs):
+        """
+        Expires a single entry after `ttl` seconds, or the whole cache when `key` is None.
+        """
+        if key is not None:
+            return bool(await self._run('expire', key, to_millis(ttl)))
+        pipeline = self._redis.pipeline()
+        for name in self._keys:
+            pipeline.expire(name, ttl)
+        return (await pipeline.execute())[0]
+
+    async def clear(self):
+        # UNLINK returns at once, Redis frees the memory of the entries in a background thread
+        await self._redis.unlink(*self._keys)
+
+    async def size(self):
+        await self._run('reap')
+        return await self._redis.hlen(self._keys[0])
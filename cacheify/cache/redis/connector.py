@@ -1,34 +1,244 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
 import redis
-from utils import get_env_var
-from cacheify.cache.singleton import Singleton
-
-class RedisConnector(metaclass=Singleton):
-    """
-    RedisConnector is a singleton class that manages the connection to a Redis database.
-    It initializes a connection pool and provides a Redis connection instance.
-    """
-
-    def __new__(cls, *args, **kwargs):
-        # Check if an instance already exists
-        if not hasattr(cls, '_instance'):
-            # Create a new instance and initialize connection pool
-            cls._instance = super(RedisConnector, cls).__new__(cls, *args, **kwargs)
-            cls._instance._initialize_connection()
-
-        # Return the Redis connection instead of the instance
-        return cls._instance._conn
-
-    def _initialize_connection(self) -> None:
-        # Initialize the connection pool and create Redis connection
-        url_connection = get_env_var('REDIS_URL', 'redis://localhost:6379/0')
-        decode_responses = get_env_var("REDIS_DECODE_RESPONSES", False, bool)
-        self._pool = redis.ConnectionPool.from_url(
-            url_connection,
-            decode_responses=decode_responses
-        )
-        # Set up the connection attribute
-        self._conn = redis.StrictRedis(connection_pool=self._pool)
-
-    @property
-    def conn(self) -> redis.StrictRedis:
-        return self._conn
\ No newline at end of file
+import redis.asyncio
+import redis.cluster
+from redis.backoff import EqualJitterBackoff
+from redis.retry import Retry
+from cacheify.utils import get_env_var
+
+# Pool settings: constructor argument -> (environment variable, type, default)
+POOL_SETTINGS = {
+    'url': ('REDIS_URL', str, 'redis://localhost:6379/0'),
+    'cluster': ('REDIS_CLUSTER', bool, False),
+    'decode_responses': ('REDIS_DECODE_RESPONSES', bool, False),
+    'max_connections': ('REDIS_MAX_CONNECTIONS', int, None),
+    'blocking': ('REDIS_POOL_BLOCKING', bool, False),
+    'pool_timeout': ('REDIS_POOL_TIMEOUT', float, 20.0),
+    'socket_timeout': ('REDIS_SOCKET_TIMEOUT', float, None),
+    'socket_connect_timeout': ('REDIS_SOCKET_CONNECT_TIMEOUT', float, None),
+    'socket_keepalive': ('REDIS_SOCKET_KEEPALIVE', bool, False),
+    'health_check_interval': ('REDIS_HEALTH_CHECK_INTERVAL', int, 0),
+    'retries': ('REDIS_RETRIES', int, None),
+    'retry_backoff_base': ('REDIS_RETRY_BACKOFF_BASE', float, 0.008),
+    'retry_backoff_cap': ('REDIS_RETRY_BACKOFF_CAP', float, 0.512),
+}
+
+# Used by blocking pools when no `max_connections` is configured, like redis-py's BlockingConnectionPool
+DEFAULT_BLOCKING_MAX_CONNECTIONS = 50
+
+def resolve_pool_settings(**overrides) -> Dict[str, Any]:
+    """
+    Resolves the pool settings: arguments that are not None take precedence over
+    the environment variables listed in `POOL_SETTINGS`, which take precedence over the defaults.
+    """
+    unknown = set(overrides) - set(POOL_SETTINGS)
+    if unknown:
+        raise TypeError(f'Unknown Redis pool settings: {sorted(unknown)}')
+    settings = {}
+    for name, (env_var, var_type, default) in POOL_SETTINGS.items():
+        value = overrides.get(name)
+        settings[name] = value if value is not None else get_env_var(env_var, default, var_type)
+    if settings['blocking'] and settings['max_connections'] is None:
+        settings['max_connections'] = DEFAULT_BLOCKING_MAX_CONNECTIONS
+    return settings
+
+def _connection_kwargs(settings: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = {
+        'decode_responses': settings['decode_responses'],
+        'socket_timeout': settings['socket_timeout'],
+        'socket_connect_timeout': settings['socket_connect_timeout'],
+        'socket_keepalive': settings['socket_keepalive'],
+        'health_check_interval': settings['health_check_interval'],
+        'max_connections': settings['max_connections'],
+    }
+    if settings['retries'] is not None:
+        kwargs['retry'] = Retry(EqualJitterBackoff(settings['retry_backoff_cap'], settings['retry_backoff_base']), settings['retries'])
+        kwargs['retry_on_error'] = [redis.ConnectionError, redis.TimeoutError]
+    if settings['blocking']:
+        kwargs['timeout'] = settings['pool_timeout']
+    return kwargs
+
+def redact_url(url: str) -> str:
+    """Hides the password of a Redis URL, so it can be logged or exported with the pool stats."""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = f'{parts.username or ""}:***@{parts.hostname}' + (f':{parts.port}' if parts.port else '')
+    return urlunsplit(parts._replace(netloc=netloc))
+
+class _PoolStatsMixin:
+    """
+    Records how long callers wait to get a connection from the pool. For a blocking pool
+    this includes the time spent waiting for a connection to be released.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._acquisitions = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._acquisitions += 1
+            self._wait_seconds_total += waited
+            self._wait_seconds_max = max(self._wait_seconds_max, waited)
+        return connection
+
+    def _connection_counts(self) -> tuple:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of connections in use and available, the pool limit, and how many
+        times a connection was acquired along with the total, mean and maximum wait in seconds.
+        """
+        in_use, available = self._connection_counts()
+        with self._stats_lock:
+            acquisitions, total, longest = self._acquisitions, self._wait_seconds_total, self._wait_seconds_max
+        return {
+            'max_connections': self.max_connections,
+            'in_use': in_use,
+            'available': available,
+            'acquisitions': acquisitions,
+            'wait_seconds_total': total,
+            'wait_seconds_mean': total / acquisitions if acquisitions else 0.0,
+            'wait_seconds_max': longest,
+        }
+
+class StatsConnectionPool(_PoolStatsMixin, redis.ConnectionPool):
+    """A `redis.ConnectionPool` exposing `stats()`. It opens a new connection when none is available."""
+
+    def _connection_counts(self) -> tuple:
+        return len(self._in_use_connections), len(self._available_connections)
+
+class StatsBlockingConnectionPool(_PoolStatsMixin, redis.BlockingConnectionPool):
+    """
+    A `redis.BlockingConnectionPool` exposing `stats()`. Once `max_connections` are open,
+    callers wait up to `timeout` seconds for one to be released instead of opening more.
+    """
+
+    def _connection_counts(self) -> tuple:
+        available = sum(1 for connection in list(self.pool.queue) if connection is not None)
+        return len(self._connections) - available, available
+
+class RedisConnector:
+    """
+    RedisConnector provides a shared `redis.StrictRedis` connection for a Redis URL.
+    Each distinct combination of URL and pool settings gets its own connection pool, created on first use
+    and reused by every later call, so `RedisConnector()` returns the same client across the process.
+
+    Settings are taken from the arguments, then from the environment variables listed in `POOL_SETTINGS`
+    (`REDIS_URL`, `REDIS_MAX_CONNECTIONS`, `REDIS_POOL_BLOCKING`, ...), then from the defaults.
+
+    Args:
+        url (Optional[str]): The Redis URL. Defaults to `REDIS_URL`, or redis://localhost:6379/0.
+        decode_responses (Optional[bool]): Whether responses are decoded to `str`.
+        max_connections (Optional[int]): The maximum number of connections of the pool.
+        blocking (Optional[bool]): Use a `BlockingConnectionPool`, which waits for a free connection
+                                   instead of opening more than `max_connections` (50 by default).
+        pool_timeout (Optional[float]): How long a blocking pool waits for a free connection, in seconds.
+        socket_timeout (Optional[float]): The timeout of socket operations, in seconds.
+        socket_connect_timeout (Optional[float]): The timeout of new connections, in seconds.
+        socket_keepalive (Optional[bool]): Enables TCP keepalive on the connections.
+        health_check_interval (Optional[int]): Idle connections are pinged before reuse after this many seconds.
+        retries (Optional[int]): How many times commands are retried on connection errors and timeouts,
+                                 with exponential backoff and jitter. Defaults to redis-py's behavior.
+        retry_backoff_base (Optional[float]): The first backoff delay, in seconds.
+        retry_backoff_cap (Optional[float]): The maximum backoff delay, in seconds.
+        cluster (Optional[bool]): Connect to a Redis Cluster through the node at `url`, returning a `RedisCluster`.
+                                  It keeps one pool per node; `blocking` and `pool_timeout` do not apply.
+    """
+    _clients: Dict[tuple, redis.StrictRedis] = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, url: Optional[str]=None, **options) -> redis.StrictRedis:
+        settings = resolve_pool_settings(url=url, **options)
+        key = tuple(sorted(settings.items()))
+        client = cls._clients.get(key)
+        if client is None:
+            with cls._lock:
+                client = cls._clients.get(key)
+                if client is None:
+                    client = cls._clients[key] = cls._connect(settings)
+        return client
+
+    @staticmethod
+    def _connect(settings: Dict[str, Any]):
+        kwargs = _connection_kwargs(settings)
+        if settings['cluster']:
+            kwargs.pop('timeout', None)
+            return redis.cluster.RedisCluster.from_url(settings['url'], **kwargs)
+        pool_class = StatsBlockingConnectionPool if settings['blocking'] else StatsConnectionPool
+        return redis.StrictRedis(connection_pool=pool_class.from_url(settings['url'], **kwargs))
+
+    @classmethod
+    def stats(cls) -> List[Dict[str, Any]]:
+        """
+        Returns the stats of every pool created by the connector, see `StatsConnectionPool.stats`,
+        along with its URL (password redacted) and whether it is a blocking pool.
+        """
+        with cls._lock:
+            clients = [(key, client) for key, client in cls._clients.items() if not dict(key)['cluster']]
+        return [
+            {'url': redact_url(dict(key)['url']), 'blocking': dict(key)['blocking'], **client.connection_pool.stats()}
+            for key, client in clients
+        ]
+
+def connection_kwargs(client) -> Dict[str, Any]:
+    """Returns the connection settings of a client, a `RedisCluster` included."""
+    pool = getattr(client, 'connection_pool', None)
+    return pool.connection_kwargs if pool is not None else client.get_connection_kwargs()
+
+def binary_client(client):
+    """
+    Returns `client` if it leaves responses as bytes, or else a client with the same connection settings
+    that does not decode them. Works with both `redis.Redis` and `redis.asyncio.Redis` clients.
+    """
+    if not connection_kwargs(client).get('decode_responses'):
+        return client
+    pool = getattr(client, 'connection_pool', None)
+    if pool is None:
+        raise ValueError('Raw bytes access on a Redis Cluster requires a client created with decode_responses=False')
+    kwargs = {**pool.connection_kwargs, 'decode_responses': False}
+    if hasattr(pool, 'timeout'):
+        kwargs['timeout'] = pool.timeout  # A blocking pool
+    binary_pool = type(pool)(connection_class=pool.connection_class, max_connections=pool.max_connections, **kwargs)
+    return type(client)(connection_pool=binary_pool)
+
+class AsyncRedisConnector:
+    """
+    AsyncRedisConnector provides the `redis.asyncio.Redis` connection of the running event loop.
+    asyncio connections are bound to the loop that opened them, so one client is kept per loop
+    and set of arguments, and released together with the loop. It accepts the same arguments
+    and environment variables as RedisConnector; pool stats are only available for synchronous pools.
+    """
+    _clients = weakref.WeakKeyDictionary()  # loop -> {arguments: client}
+
+    def __new__(cls, url: Optional[str]=None, **options) -> redis.asyncio.Redis:
+        loop = asyncio.get_running_loop()
+        clients = cls._clients.get(loop)
+        if clients is None:
+            clients = cls._clients[loop] = {}
+        key = (url, tuple(sorted(options.items())))
+        client = clients.get(key)
+        if client is None:
+            settings = resolve_pool_settings(url=url, **options)
+            kwargs = _connection_kwargs(settings)
+            if settings['cluster']:
+                kwargs.pop('timeout', None)
+                client = redis.asyncio.RedisCluster.from_url(settings['url'], **kwargs)
+            else:
+                pool_class = redis.asyncio.BlockingConnectionPool if settings['blocking'] else redis.asyncio.ConnectionPool
+                client = redis.asyncio.Redis(connection_pool=pool_class.from_url(settings['url'], **kwargs))
+            clients[key] = client
+        return client
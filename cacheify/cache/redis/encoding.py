@@ -0,0 +1,37 @@
+import json
+import math
+import re
+from typing import Any, Iterator, Optional
+from cacheify.cache.serializers import CacheCodec
+
+# Bulk operations are split in batches to stay well below Lua's limit on unpacked arguments
+BATCH_SIZE = 1000
+
+# Reads values written through a codec too, so switching a cache back to plain JSON keeps existing entries readable
+_DEFAULT_CODEC = CacheCodec()
+
+def encode(value: Any) -> str:
+    return json.dumps(value)
+
+def decode(payload: Optional[Any]) -> Any:
+    return _DEFAULT_CODEC.decode(payload)
+
+def decode_key(key) -> str:
+    return key.decode() if isinstance(key, bytes) else key
+
+def escape_pattern(text: str) -> str:
+    """Escapes the glob characters of `text` for the `MATCH` option of the SCAN commands."""
+    return re.sub(r'([*?\[\]\\])', r'\\\1', text)
+
+def to_millis(ttl: Optional[float]) -> int:
+    """
+    Converts a TTL in seconds to the milliseconds expected by the Lua scripts, 0 meaning no expiration.
+    It is rounded away from zero, so a TTL below a millisecond still expires, and a negative one expires at once.
+    """
+    if not ttl:
+        return 0
+    return math.ceil(ttl * 1000) if ttl > 0 else math.floor(ttl * 1000)
+
+def batches(items: list, size: int=BATCH_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
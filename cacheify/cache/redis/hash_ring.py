@@ -0,0 +1,70 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+class HashRing:
+    """
+    HashRing is a ketama consistent-hash ring. Every node is placed on a 32-bit ring at `replicas`
+    points derived from MD5 digests of its name, and a key belongs to the first node point at or after
+    the key's own hash. Adding or removing one of N nodes therefore only moves about 1/N of the keys,
+    and node names, not their order, decide the placement, so every process builds the same ring.
+
+    Args:
+        nodes (Iterable[str]): The names of the nodes.
+        replicas (int): The number of points per node. More points spread the keys more evenly.
+    """
+
+    def __init__(self, nodes: Iterable[str]=(), replicas: int=160):
+        if replicas < 4:
+            raise ValueError('replicas must be at least 4')
+        self.replicas = replicas
+        self._nodes: Dict[str, List[int]] = {}
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _digest(value: str) -> bytes:
+        return hashlib.md5(value.encode()).digest()
+
+    def _node_points(self, node: str) -> List[int]:
+        # Each MD5 digest yields four 32-bit points, as in the original ketama implementation
+        points = []
+        for i in range(self.replicas // 4):
+            digest = self._digest(f'{node}-{i}')
+            points.extend(int.from_bytes(digest[j:j + 4], 'little') for j in range(0, 16, 4))
+        return points
+
+    def _rebuild(self) -> None:
+        ring: List[Tuple[int, str]] = sorted((point, node) for node, points in self._nodes.items() for point in points)
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def add_node(self, node: str) -> None:
+        if node in self._nodes:
+            raise ValueError(f"Node '{node}' is already in the ring")
+        self._nodes[node] = self._node_points(node)
+        self._rebuild()
+
+    def remove_node(self, node: str) -> None:
+        del self._nodes[node]
+        self._rebuild()
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def get_node(self, key: str) -> str:
+        """Returns the node owning `key`."""
+        if not self._points:
+            raise LookupError('The hash ring has no nodes')
+        point = int.from_bytes(self._digest(key)[:4], 'little')
+        index = bisect.bisect_left(self._points, point)
+        return self._owners[index if index < len(self._owners) else 0]
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
@@ -0,0 +1,48 @@
+from itertools import islice
+from typing import Iterable, Optional
+from redis import Redis
+from .connector import binary_client
+
+def copy_keys(source: Redis, target: Redis, match: Optional[str]=None, keys: Optional[Iterable]=None,
+              count: int=1000, replace: bool=True) -> int:
+    """
+    Copies Redis keys from one server to another with DUMP and RESTORE, which transfer values in their
+    serialized form whatever their type, keeping their remaining TTL. Keys are read and written
+    `count` at a time, with one pipeline per batch on each side, so memory stays bounded.
+    The source must run the same or an older Redis version than the target.
+
+    Args:
+        source (Redis): The server to copy from.
+        target (Redis): The server to copy to.
+        match (Optional[str]): A glob-style pattern selecting the keys to copy with `SCAN`, e.g. the keys of
+            every cache with `'*'`. Ignored if `keys` is given.
+        keys (Optional[Iterable]): The names of the keys to copy. Keys missing from the source are skipped.
+        count (int): The number of keys per batch, and the `COUNT` hint of `SCAN`. Defaults to 1000.
+        replace (bool): Whether to replace keys that already exist on the target. If False, copying a key
+            that exists raises a `ResponseError`. Defaults to True.
+    Returns:
+        int: The number of keys copied.
+    """
+    source = binary_client(source)  # DUMP payloads are binary
+    names = iter(keys) if keys is not None else source.scan_iter(match=match, count=count)
+    copied = 0
+    while True:
+        batch = list(islice(names, count))
+        if not batch:
+            return copied
+        pipe = source.pipeline(transaction=False)
+        for name in batch:
+            pipe.dump(name)
+            pipe.pttl(name)
+        results = pipe.execute()
+        pipe = target.pipeline(transaction=False)
+        restored = 0
+        for name, payload, ttl in zip(batch, results[::2], results[1::2]):
+            # A key can vanish between DUMP and PTTL, or expire before it is restored
+            if payload is None or ttl == -2 or ttl == 0:
+                continue
+            pipe.restore(name, max(ttl, 0), payload, replace=replace)
+            restored += 1
+        if restored:
+            pipe.execute()
+        copied += restored
@@ -1,131 +1,703 @@
 import threading
-from typing import Union, List
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterator, Optional, Sequence, Union, List
 from redis import Redis
-from pottery import Redlock, RedisDict
-from cacheify.cache.cacheable import Cacheable
-from .connector import RedisConnector
+from redis.cluster import RedisCluster
+from redis.exceptions import RedisError, ResponseError
+from redis.sentinel import Sentinel
+from pottery import Redlock
+from cacheify.cache.cacheable import MISSING, Cacheable, Version, per_key_ttl
+from cacheify.cache.serializers import CacheCodec, Serializer, get_codec
+from cacheify.cache.snapshot import entry_payload, payload_entry
+from .connector import RedisConnector, binary_client, connection_kwargs
+from .encoding import batches, decode, decode_key, encode, escape_pattern, to_millis
+from .migration import copy_keys
+from .replicas import ReplicaRouter
+from .scripts import build_scripts, check_limits
+
+CONSISTENCY_MODES = ('atomic', 'optimistic', 'redlock')
 
 class RedisCache(Cacheable):
-    def __init__(self, *, key: str='cache', masters: Union[Redis, list, None]=None, auto_release_time: float=10, **kwargs):
+    """
+    RedisCache stores its entries in a Redis hash named after `key`, with a companion sorted set
+    `<key>:expires` indexing per-entry expiration times. Entries are JSON encoded. A third hash,
+    `<key>:versions`, numbers the entries read with `get_with_version` for `compare_and_set`.
+
+    The `consistency` mode controls how operations are made safe under concurrency:
+        - 'atomic' (default): no client-side locking. Every operation is a single Lua script
+          or command, which Redis executes atomically.
+        - 'optimistic': lock-free pipelined reads, writes use MULTI transactions, with WATCH and
+          a retry on conflict for read-modify-write operations.
+        - 'redlock': every operation runs under a process-wide semaphore and a Redlock.
+    Regardless of the mode, `lock()` provides a Redlock for explicit multi-key critical sections.
+
+    With `max_entries` or `max_bytes`, writes evict entries once the cache exceeds a limit, expired
+    entries first, then according to the `eviction` policy. The bookkeeping runs inside the Lua scripts,
+    in `<key>:usage` and `<key>:stats`, so bounded caches do not support the 'optimistic' mode. The size of an
+    entry is the length of its key plus the length of its serialized value. Every client writing to a bounded
+    cache must use the same limits; entries written without them are never evicted.
+
+    With a `RedisCluster` client, the hash and its sorted set are named `{<key>}` and `{<key>}:expires`:
+    the hash tag keeps them in one slot, so the Lua scripts stay atomic. Only the 'atomic' mode is
+    supported on a cluster, and `lock()` returns a redis-py lock instead of a Redlock.
+
+    Entries written with `tags` are also listed in one sorted set per tag, `<key>:tag:<generation>:<tag>`, which
+    sheds the members of expired entries and expires with its last entry, see `scripts`. Overwriting a tagged entry without
+    tags leaves it in its previous tag sets, so invalidating them still deletes it. Extending the TTL of a tagged
+    entry with `expire` does not extend its tag sets: set the entry again with its tags instead.
+
+    Reads (`get`, `get_many`, `get_bytes` and the scans) can be served by replicas whose replication lag
+    is at most `max_staleness` seconds, using read-only scripts that leave expired entries for the master
+    to reap. Other operations, including `keys`, `items` and `len`, always run on the master.
+
+    Args:
+        key (str): The name of the cache and of its Redis hash.
+        masters (Union[Redis, list, None]): The Redis masters used for Redlock. Data is stored in the first one.
+        auto_release_time (float): The time in seconds after which the Redlock is released automatically.
+        reap_limit (int): The maximum number of expired entries removed on every write.
+        consistency (str): The consistency mode: 'atomic', 'optimistic' or 'redlock'.
+        serializer (Union[str, Serializer, CacheCodec, None]): Encodes the entries as header-framed bytes,
+            see `cacheify.cache.serializers`. Requires a client created with `decode_responses=False`.
+            If None, entries are stored as plain JSON strings.
+        hash_tag (Optional[bool]): Whether to name the Redis keys with a `{<key>}` hash tag. Defaults to True
+            for a `RedisCluster` client and False otherwise.
+        replicas (Union[Sequence[Redis], ReplicaRouter, None]): Replicas serving reads, or a `ReplicaRouter`.
+        max_staleness (float): The maximum replication lag, in seconds, of a replica serving reads.
+        sentinel (Optional[Sentinel]): Discovers the master, and the replicas unless `replicas` is given,
+            of the `service_name` service. Ignored if `masters` is given.
+        service_name (str): The name of the Sentinel service.
+        max_entries (Optional[int]): The maximum number of entries kept in the cache. Unbounded if None.
+        max_bytes (Optional[int]): The maximum total size of the entries, in bytes. Unbounded if None.
+        eviction (str): The eviction policy used once a limit is exceeded: 'lru' or 'lfu'.
+    """
+
+    def __init__(self, *, key: str='cache', masters: Union[Redis, list, None]=None, auto_release_time: float=10, reap_limit: int=100,
+                 consistency: str='atomic', serializer: Union[str, Serializer, CacheCodec, None]=None,
+                 hash_tag: Optional[bool]=None, replicas: Union[Sequence[Redis], ReplicaRouter, None]=None,
+                 max_staleness: float=1.0, sentinel: Optional[Sentinel]=None, service_name: str='mymaster',
+                 max_entries: Optional[int]=None, max_bytes: Optional[int]=None, eviction: str='lru', **kwargs):
+        if consistency not in CONSISTENCY_MODES:
+            raise ValueError(f"Invalid consistency mode '{consistency}'. Expected one of {CONSISTENCY_MODES}")
+        bounded = check_limits(max_entries, max_bytes)
+        if bounded and consistency == 'optimistic':
+            raise ValueError("Bounded caches do not support the 'optimistic' consistency mode")
+        if sentinel is not None and masters is None:
+            masters = [sentinel.master_for(service_name)]
+            if replicas is None:
+                replicas = [sentinel.slave_for(service_name)]
         self._key = key
+        self.consistency = consistency
         self.masters = self._normalize_masters(masters)
         self.auto_release_time = auto_release_time
-        self._cache = RedisDict(redis=self.masters[0], key=key)
+        self.reap_limit = reap_limit
+        self._redis = self.masters[0]
+        self.cluster = isinstance(self._redis, RedisCluster)
+        if self.cluster and consistency != 'atomic':
+            raise ValueError("Redis Cluster only supports the 'atomic' consistency mode")
+        name = f'{{{key}}}' if (self.cluster if hash_tag is None else hash_tag) else key
+        self._keys = [name, f'{name}:expires', f'{name}:versions'] + ([f'{name}:usage', f'{name}:stats'] if bounded else [])
+        self.max_entries, self.max_bytes, self.eviction = max_entries, max_bytes, eviction
+        sources = build_scripts(max_entries, max_bytes, eviction)
+        self._scripts = {name: self._redis.register_script(source) for name, source in sources.items()}
+        self._codec = get_codec(serializer)
+        self._encode, self._decode = (self._codec.encode, self._codec.decode) if self._codec else (encode, decode)
+        if self._codec and connection_kwargs(self._redis).get('decode_responses'):
+            raise ValueError('Serializers store binary values and require a Redis client with decode_responses=False')
+        if replicas is not None and not isinstance(replicas, ReplicaRouter):
+            replicas = ReplicaRouter(replicas, max_staleness)
+        self._replicas: Optional[ReplicaRouter] = replicas
+        self._binary_clients: Dict[int, Redis] = {}  # id(client) -> client that does not decode responses
         self._semaphore = threading.Semaphore(1)  # A binary semaphore to allow one thread at a time
+        self._eviction_listener: Optional[Callable[[int], None]] = None
+        self._generation_key = f'{name}:generation'
+        self._generation: Optional[int] = None  # The generation of the tag sets, read on the first tag operation
+        self._reclaim_lock = threading.Lock()
+        self._reclaim_requested = False
+        self._reclaimer: Optional[threading.Thread] = None
 
-    def _normalize_masters(self, masters: Union[Redis, list, None]=None) -> List[Redis]:
+    def _normalize_masters(self, masters: Union[Redis, RedisCluster, list, None]=None) -> List[Redis]:
         if isinstance(masters, list):
             return masters
-        elif isinstance(masters, Redis):
+        elif isinstance(masters, (Redis, RedisCluster)):
             return [masters]
         else:
             return [RedisConnector()]
 
     @property
     def redlock(self) -> Redlock:
-        """A property to get a new Redlock instance."""
-        return Redlock(key=self._key, masters=self.masters, auto_release_time=self.auto_release_time)
-    
+        """A property to get a new Redlock instance on the whole cache."""
+        return self.lock()
+
+    def lock(self, name: Optional[str]=None, auto_release_time: Optional[float]=None) -> Redlock:
+        """
+        Returns a Redlock for an explicit critical section, e.g. a read-modify-write spanning several keys.
+        On a cluster, returns a redis-py lock stored in the cache's slot.
+
+        Args:
+            name (Optional[str]): The name of the resource to lock. If None, the whole cache is locked.
+            auto_release_time (Optional[float]): Overrides the cache's `auto_release_time` for this lock.
+        """
+        if self.cluster:
+            return self._redis.lock(
+                f'{self._keys[0]}:lock' if name is None else f'{self._keys[0]}:lock:{name}',
+                timeout=auto_release_time or self.auto_release_time
+            )
+        return Redlock(
+            key=self._keys[0] if name is None else f'{self._keys[0]}:lock:{name}',
+            masters=self.masters,
+            auto_release_time=auto_release_time or self.auto_release_time
+        )
+
+    @contextmanager
+    def _guard(self, redlock: Optional[Redlock]=None) -> Iterator[None]:
+        """Serializes the operation with the semaphore and a Redlock when running in 'redlock' mode."""
+        if self.consistency != 'redlock':
+            yield
+            return
+        with self._semaphore:
+            with (redlock or self.redlock):
+                yield
+
     @property
     def key(self):
         return self._key
 
+    def _binary(self, client: Redis) -> Redis:
+        """Returns `client`, or a sibling client that does not decode responses, used by `get_bytes`."""
+        binary = self._binary_clients.get(id(client))
+        if binary is None:
+            binary = self._binary_clients[id(client)] = binary_client(client)
+        return binary
+
+    def _replica(self) -> Optional[Redis]:
+        """The replica serving the next read, or None to read from the master."""
+        return self._replicas.get_replica() if self._replicas is not None else None
+
+    def _run(self, script: str, *args, client: Optional[Redis]=None, keys: Sequence[str]=()):
+        return self._scripts[script](keys=self._keys + list(keys) if keys else self._keys, args=args, client=client)
+
+    def _run_tagged(self, script: str, tags: list, *args):
+        """Runs a tag script on the tag sets of the current generation, and again if `clear` bumped it meanwhile."""
+        while True:
+            generation = self._generation
+            if generation is None:
+                generation = self._generation = int(self._redis.get(self._generation_key) or 0)
+            tag_sets = [f'{self._keys[0]}:tag:{generation}:{tag}' for tag in tags]
+            try:
+                return self._run(script, *args, generation, keys=[self._generation_key] + tag_sets)
+            except ResponseError as error:
+                if not str(error).startswith('STALEGEN'):
+                    raise
+                self._generation = None
+
+    @staticmethod
+    def _server_millis(client) -> int:
+        seconds, microseconds = client.time()
+        return seconds * 1000 + microseconds // 1000
+
+    def _watched_entry(self, pipe, key):
+        """Reads an entry inside a WATCH block. Returns `(value, expired, now)`."""
+        value = pipe.hget(self._keys[0], key)
+        expires_at = pipe.zscore(self._keys[1], key)
+        now = self._server_millis(pipe)
+        return value, expires_at is not None and expires_at <= now, now
+
+    def _get_optimistic(self, key, client: Optional[Redis]=None):
+        pipe = (client or self._redis).pipeline(transaction=False)
+        pipe.hget(self._keys[0], key)
+        pipe.zscore(self._keys[1], key)
+        pipe.time()
+        value, expires_at, (seconds, microseconds) = pipe.execute()
+        if expires_at is not None and expires_at <= seconds * 1000 + microseconds // 1000:
+            return None
+        return value
+
+    def _set_optimistic(self, key, payload, ttl) -> None:
+        ttl_millis = to_millis(ttl)
+        expires_at = self._server_millis(self._redis) + ttl_millis if ttl_millis else None
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(self._keys[0], key, payload)
+        pipe.hdel(self._keys[2], f'v:{key}')
+        if expires_at is None:
+            pipe.zrem(self._keys[1], key)
+        else:
+            pipe.zadd(self._keys[1], {key: expires_at})
+        pipe.execute()
+
+    def _pop_optimistic(self, key):
+        def pop(pipe):
+            value, expired, _ = self._watched_entry(pipe, key)
+            if value is None:
+                return [0]
+            pipe.multi()
+            pipe.hdel(self._keys[0], key)
+            pipe.zrem(self._keys[1], key)
+            pipe.hdel(self._keys[2], f'v:{key}')
+            return [0] if expired else [1, value]
+        return self._redis.transaction(pop, *self._keys, value_from_callable=True)
+
+    def _expire_optimistic(self, key, ttl_millis: int) -> int:
+        def expire(pipe):
+            value, expired, now = self._watched_entry(pipe, key)
+            if value is None or expired:
+                return 0
+            pipe.multi()
+            if ttl_millis > 0:
+                pipe.zadd(self._keys[1], {key: now + ttl_millis})
+            else:
+                pipe.hdel(self._keys[0], key)
+                pipe.zrem(self._keys[1], key)
+                pipe.hdel(self._keys[2], f'v:{key}')
+            return 1
+        return self._redis.transaction(expire, *self._keys, value_from_callable=True)
+
+    def _get_many_optimistic(self, keys: list, client: Optional[Redis]=None) -> list:
+        pipe = (client or self._redis).pipeline(transaction=False)
+        pipe.hmget(self._keys[0], keys)
+        pipe.zmscore(self._keys[1], keys)
+        pipe.time()
+        values, deadlines, (seconds, microseconds) = pipe.execute()
+        now = seconds * 1000 + microseconds // 1000
+        return [
+            None if expires_at is not None and expires_at <= now else value
+            for value, expires_at in zip(values, deadlines)
+        ]
+
+    def _set_many_optimistic(self, entries: list) -> None:
+        now = self._server_millis(self._redis) if any(ttl_millis for _, _, ttl_millis in entries) else 0
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(self._keys[0], mapping={key: payload for key, payload, _ in entries})
+        pipe.hdel(self._keys[2], *(f'v:{key}' for key, _, _ in entries))
+        for key, _, ttl_millis in entries:
+            if ttl_millis:
+                pipe.zadd(self._keys[1], {key: now + ttl_millis})
+            else:
+                pipe.zrem(self._keys[1], key)
+        pipe.execute()
+
+    def _delete_many_optimistic(self, keys: list) -> int:
+        def delete(pipe):
+            values = pipe.hmget(self._keys[0], keys)
+            deadlines = pipe.zmscore(self._keys[1], keys)
+            now = self._server_millis(pipe)
+            pipe.multi()
+            pipe.hdel(self._keys[0], *keys)
+            pipe.zrem(self._keys[1], *keys)
+            pipe.hdel(self._keys[2], *(f'v:{key}' for key in keys))
+            return sum(
+                value is not None and (expires_at is None or expires_at > now)
+                for value, expires_at in zip(values, deadlines)
+            )
+        return self._redis.transaction(delete, *self._keys, value_from_callable=True)
+
+    def _scan_optimistic(self, cursor: int, count: int, client: Redis) -> tuple:
+        cursor, entries = client.hscan(self._keys[0], cursor, count=count)
+        if not entries:
+            return cursor, []
+        pipe = client.pipeline(transaction=False)
+        pipe.zmscore(self._keys[1], list(entries))
+        pipe.time()
+        deadlines, (seconds, microseconds) = pipe.execute()
+        now = seconds * 1000 + microseconds // 1000
+        return cursor, [
+            (field, value) for (field, value), expires_at in zip(entries.items(), deadlines)
+            if expires_at is None or expires_at > now
+        ]
+
+    def _scan(self, cursor: int, count: int, values: bool) -> tuple:
+        """Reads one HSCAN page of live entries. It takes no lock, whatever the consistency mode."""
+        client = self._replica() or self._redis
+        if self.consistency == 'optimistic':
+            return self._scan_optimistic(cursor, count, client)
+        cursor, page = self._run('scan', cursor, count, int(values), client=client)
+        if values:
+            return int(cursor), list(zip(page[::2], page[1::2]))
+        return int(cursor), [(field, None) for field in page]
+
+    def _reap(self) -> int:
+        return self._run('reap')
+
+    def _get_payload(self, key, binary: bool=False):
+        replica = self._replica()
+        client = replica or self._redis
+        if binary:
+            client = self._binary(client)
+        with self._guard():
+            if self.consistency == 'optimistic':
+                return self._get_optimistic(key, client)
+            # Replicas are read-only, so expired entries are skipped there instead of being deleted
+            return self._run('get_ro' if replica else 'get', key, client=client)
+
     def get(self, key):
-        self._semaphore.acquire()  # Acquire semaphore to ensure thread safety
-        try:
-            with self.redlock:
-                return self._cache.get(key)
-        finally:
-            self._semaphore.release()  # Release semaphore so that other threads can proceed
-
-    def set(self, key, value, ttl=None):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                self._cache[key] = value
-                self._cache.redis.expire(self._cache.key, ttl) if ttl else None
-        finally:
-            self._semaphore.release()
+        return self._decode(self._get_payload(key))
+
+    def _set_eviction_listener(self, listener: Optional[Callable[[int], None]]) -> None:
+        """Calls `listener` with the number of entries evicted by each write that evicted some."""
+        self._eviction_listener = listener
+
+    def _report_evictions(self, evicted: int) -> None:
+        if evicted and self._eviction_listener is not None:
+            self._eviction_listener(evicted)
+
+    def _set_payload(self, key, payload, ttl) -> None:
+        with self._guard():
+            if self.consistency == 'optimistic':
+                self._set_optimistic(key, payload, ttl)
+            else:
+                self._report_evictions(self._run('set', key, payload, to_millis(ttl), self.reap_limit))
+
+    def set(self, key, value, ttl=None, tags=None):
+        """
+        With `tags`, the entry and its tag sets are written by a single Lua script whatever the consistency mode.
+        """
+        if not tags:
+            self._set_payload(key, self._encode(value), ttl)
+            return
+        with self._guard():
+            self._report_evictions(self._run_tagged('set_tagged', list(tags), key, self._encode(value), to_millis(ttl), self.reap_limit))
+
+    def invalidate_tags(self, tags):
+        """Deletes the tagged entries and their tag sets in a single Lua script whatever the consistency mode."""
+        tags = list(tags)
+        if not tags:
+            return 0
+        with self._guard():
+            return self._run_tagged('invalidate_tags', tags)
+
+    def invalidate_prefix(self, prefix, count=1000):
+        """
+        Selects the matching keys on the master with `HSCAN MATCH`, so the other entries are not transferred,
+        and deletes each page with `delete_many`.
+        """
+        pattern = escape_pattern(prefix) + '*'
+        deleted = cursor = 0
+        while True:
+            cursor, entries = self._redis.hscan(self._keys[0], cursor, match=pattern, count=count)
+            if entries:
+                deleted += self.delete_many(list(entries))
+            if not cursor:
+                return deleted
+
+    def preload_scripts(self) -> None:
+        """
+        Loads the Lua scripts of the cache into the script cache of the master and of the replicas, e.g. when a worker
+        starts, so that no operation pays for the `NOSCRIPT` reply and the retry with the script source that follow a
+        restart or a `SCRIPT FLUSH`. Scripts run with `EVALSHA` either way.
+        """
+        clients = [self._redis] + (list(self._replicas.replicas) if self._replicas is not None else [])
+        for client in clients:
+            for script in self._scripts.values():
+                client.script_load(script.script)
+
+    def get_or_set(self, key, value, ttl=None):
+        """Returns the cached value or stores `value`, in a single Lua script whatever the consistency mode."""
+        with self._guard():
+            result = self._run('get_or_set', key, self._encode(value), to_millis(ttl), self.reap_limit)
+        if not result[0]:
+            return self._decode(result[1])
+        self._report_evictions(result[1])
+        return value
+
+    def add(self, key, value, ttl=None):
+        """Stores `value` if the key is not cached, in a single Lua script whatever the consistency mode."""
+        return self.compare_and_set(key, value, None, ttl)
+
+    def get_with_version(self, key):
+        """
+        Reads the entry on the master, since a replica could return an outdated version. The version is a number
+        Redis keeps per entry and drops on every write, so it changes even if the entry is rewritten with the
+        same value, and `compare_and_set` only sends that number back.
+        """
+        with self._guard():
+            result = self._run('get_versioned', key)
+        return (None, None) if result is None else (self._decode(result[0]), Version(result[1]))
+
+    def compare_and_set(self, key, value, version, ttl=None):
+        """Stores `value` if the entry still has `version`, in a single Lua script whatever the consistency mode."""
+        return self._compare_and_set(key, self._encode(value), version, to_millis(ttl))
+
+    def _compare_and_set(self, key, payload, version, ttl_millis) -> bool:
+        args = (key, payload, ttl_millis, self.reap_limit) + (() if version is None else (version.token,))
+        with self._guard():
+            result = self._run('compare_and_set', *args)
+        if not result[0]:
+            return False
+        self._report_evictions(result[1])
+        return True
+
+    def incr(self, key, delta=1, ttl=None):
+        """
+        Increments the counter with `HINCRBY` in a single Lua script whatever the consistency mode. New counters
+        are stored as plain JSON integers, even with a serializer, which reads them back as such. A counter the
+        serializer encoded, stored with `set` for instance, is decoded, incremented and encoded again instead,
+        with `compare_and_set` retried until no other write comes in between.
+        """
+        while True:
+            try:
+                with self._guard():
+                    value, evicted = self._run('incr', key, delta, to_millis(ttl), self.reap_limit)
+            except ResponseError as error:
+                if 'not an integer' not in str(error):
+                    raise
+                if self._codec is None:
+                    raise TypeError(f'The entry {key!r} is not an integer') from error
+                value = self._incr_encoded(key, delta)
+                if value is None:
+                    continue  # The entry was deleted meanwhile, so `HINCRBY` can create it
+                return value
+            self._report_evictions(evicted)
+            return value
+
+    def _incr_encoded(self, key, delta) -> Optional[int]:
+        """Increments a counter encoded by the serializer, keeping its TTL. Returns None if the key is not cached."""
+        while True:
+            current, version = self.get_with_version(key)
+            if version is None:
+                return None
+            if isinstance(current, bool) or not isinstance(current, int):
+                raise TypeError(f'The entry {key!r} is not an integer')
+            value = current + delta
+            if self._compare_and_set(key, self._encode(value), version, 'keep'):
+                return value
 
     def pop(self, key):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                return self._cache.pop(key)
-        finally:
-            self._semaphore.release()
-
-    def _balance_release_time(self, cache_size: int) -> int:
-        # extra_time =  size * base_time_per_item + overhead_time
-        extra_time = (cache_size * 0.001) + 0.5
-        return self.auto_release_time + extra_time
+        with self._guard():
+            if self.consistency == 'optimistic':
+                result = self._pop_optimistic(key)
+            else:
+                result = self._run('pop', key)
+        if not result[0]:
+            raise KeyError(key)
+        return self._decode(result[1])
+
+    def get_bytes(self, key):
+        """Returns the payload as received from Redis, even if the client is configured to decode responses."""
+        return self._get_payload(key, binary=True)
+
+    def set_bytes(self, key, value, ttl=None):
+        # redis-py writes bytes and memoryviews to the socket without copying them
+        self._set_payload(key, value if isinstance(value, (bytes, memoryview)) else memoryview(value), ttl)
+
+    def get_many(self, keys, default=MISSING):
+        """
+        Gets several values with one round trip per batch of 1000 keys:
+        a single Lua script, or a pipeline in 'optimistic' mode.
+        """
+        payloads = []
+        replica = self._replica()
+        client = replica or self._redis
+        with self._guard():
+            for batch in batches(list(keys)):
+                if self.consistency == 'optimistic':
+                    payloads.extend(self._get_many_optimistic(batch, client))
+                else:
+                    payloads.extend(self._run('get_many_ro' if replica else 'get_many', *batch, client=client))
+        return [default if payload is None else self._decode(payload) for payload in payloads]
+
+    def _ttls(self, keys):
+        # One pipeline reads whether the entries exist, their deadlines, and the TTL set by `expire` on the whole cache
+        pipe = (self._replica() or self._redis).pipeline(transaction=False)
+        for key in keys:
+            pipe.hexists(self._keys[0], key)
+        for batch in batches(keys):
+            pipe.zmscore(self._keys[1], batch)
+        pipe.pttl(self._keys[0])
+        pipe.time()
+        results = pipe.execute()
+        exists, deadlines = results[:len(keys)], [deadline for batch in results[len(keys):-2] for deadline in batch]
+        cache_ttl, (seconds, microseconds) = results[-2:]
+        now = seconds * 1000 + microseconds // 1000
+        ttls = []
+        for found, expires_at in zip(exists, deadlines):
+            if cache_ttl > 0:
+                expires_at = now + cache_ttl if expires_at is None else min(expires_at, now + cache_ttl)
+            if not found or expires_at is not None and expires_at <= now:
+                ttls.append(MISSING)
+            else:
+                ttls.append(None if expires_at is None else (expires_at - now) / 1000)
+        return ttls
+
+    def set_many(self, mapping, ttl=None):
+        """
+        Sets several values with one round trip per batch of 1000 entries:
+        a single Lua script, or a MULTI transaction in 'optimistic' mode.
+        """
+        self._set_entries([(key, self._encode(value), to_millis(per_key_ttl(ttl, key))) for key, value in mapping.items()])
+
+    def _set_entries(self, entries: list) -> None:
+        """Writes `(key, payload, ttl_millis)` entries, see `set_many`."""
+        with self._guard():
+            for batch in batches(entries):
+                if self.consistency == 'optimistic':
+                    self._set_many_optimistic(batch)
+                else:
+                    self._report_evictions(self._run('set_many', self.reap_limit, *(arg for entry in batch for arg in entry)))
+
+    def delete_many(self, keys):
+        deleted = 0
+        with self._guard():
+            for batch in batches(list(keys)):
+                if self.consistency == 'optimistic':
+                    deleted += self._delete_many_optimistic(batch)
+                else:
+                    deleted += self._run('delete_many', *batch)
+        return deleted
 
     def keys(self):
         """
-        This is an O(n) operation, so performance may degrade with larger caches.
-        The Redlock's `auto_release_time` is adjusted based on cache size to balance performance and consistency.
-        Avoid using this method in performance-critical code.
+        This is an O(n) operation that loads every key at once, so performance may degrade with larger caches.
+        Use `iter_keys` to stream the keys in bounded memory instead.
         """
-        self._semaphore.acquire()
-        try:
-            redlock = self.redlock
-            redlock.auto_release_time = self._balance_release_time(len(self._cache))
-            with redlock:
-                return self._cache.keys()
-        finally:
-            self._semaphore.release()
+        with self._guard():
+            self._reap()
+            keys = self._redis.hkeys(self._keys[0])
+        return [decode_key(key) for key in keys]
+
+    def scan_keys(self, cursor=0, count=1000):
+        cursor, page = self._scan(cursor, count, values=False)
+        return cursor, [decode_key(field) for field, _ in page]
+
+    def scan_items(self, cursor=0, count=1000):
+        cursor, page = self._scan(cursor, count, values=True)
+        return cursor, [(decode_key(field), self._decode(value)) for field, value in page]
 
     def values(self):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                return self._cache.values()
-        finally:
-            self._semaphore.release()
+        return [value for _, value in self.items()]
 
     def items(self):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                return self._cache.items()
-        finally:
-            self._semaphore.release()
+        with self._guard():
+            self._reap()
+            entries = self._redis.hgetall(self._keys[0])
+        return [(decode_key(key), self._decode(value)) for key, value in entries.items()]
+
+    def _export_entries(self):
+        # Pages are read with HSCAN on the master, converting server deadlines to local Unix timestamps
+        client = self._binary(self._redis)
+        cache_ttl = client.pttl(self._keys[0])  # Set by `expire` on the whole cache
+        cursor = 0
+        while True:
+            cursor, entries = client.hscan(self._keys[0], cursor, count=1000)
+            if entries:
+                pipe = client.pipeline(transaction=False)
+                pipe.zmscore(self._keys[1], list(entries))
+                pipe.time()
+                deadlines, (seconds, microseconds) = pipe.execute()
+                now, local_now = seconds * 1000 + microseconds // 1000, time.time()
+                cache_deadline = now + cache_ttl if cache_ttl > 0 else None
+                for (field, payload), expires_at in zip(entries.items(), deadlines):
+                    if cache_deadline is not None:
+                        expires_at = cache_deadline if expires_at is None else min(expires_at, cache_deadline)
+                    if expires_at is not None and expires_at <= now:
+                        continue
+                    yield payload_entry(decode_key(field), payload, None if expires_at is None else local_now + (expires_at - now) / 1000)
+            if not cursor:
+                return
+
+    def _import_entries(self, entries):
+        # Without a serializer, JSON values are stored as they are, which is how `set` encodes them
+        now = time.time()
+        encode = self._codec.encode if self._codec else None
+        rows = []
+        for entry in entries:
+            ttl = entry.ttl(now)
+            if ttl is not None and ttl <= 0:
+                continue
+            rows.append((entry.key, entry_payload(entry, encode), to_millis(ttl)))
+        self._set_entries(rows)
+
+    def copy_from(self, source: Redis, replace: bool=True) -> int:
+        """
+        Copies this cache from another Redis server, e.g. a peer that is already warm, with pipelined DUMP and
+        RESTORE commands that transfer the serialized Redis keys of the cache as they are, with their remaining TTL.
+        The peer must run the same or an older Redis version. The copy is not atomic: entries written to
+        the peer meanwhile may be missing from the hash or from the sorted set. Tags are not copied: the tag sets
+        and the generation key stay on the peer, so `invalidate_tags` does not find the copied entries here.
+
+        Args:
+            source (Redis): A client of the peer server, which holds the cache under the same key.
+            replace (bool): Whether to replace the cache if it already exists on this server. Defaults to True.
+        Returns:
+            int: The number of Redis keys copied, 0 if the peer does not hold the cache.
+        """
+        with self._guard():
+            return copy_keys(source, self._redis, keys=self._keys, replace=replace)
 
     def expire(self, ttl, key=None, **kwargs):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                return self._cache.redis.expire(key or self._cache.key, ttl)
-        finally:
-            self._semaphore.release()
+        """
+        Expires a single entry after `ttl` seconds, or the whole cache when `key` is None.
+        """
+        with self._guard():
+            if key is None:
+                pipeline = self._redis.pipeline()
+                for name in self._keys:
+                    pipeline.expire(name, ttl)
+                return pipeline.execute()[0]
+            elif self.consistency == 'optimistic':
+                return bool(self._expire_optimistic(key, to_millis(ttl)))
+            return bool(self._run('expire', key, to_millis(ttl)))
 
     def clear(self):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                self._cache.clear()
-        finally:
-            self._semaphore.release()
+        """
+        Clears the cache in constant time, however many entries it holds: its keys are unlinked, and Redis frees
+        their memory in a background thread. The tag sets belong to a generation of the cache, which is bumped,
+        so they become unreachable at once; a background thread then deletes them, see `reclaim`.
+        """
+        with self._guard():
+            self._generation = self._run('clear', keys=[self._generation_key])
+        if self._generation:
+            self._schedule_reclaim()
+
+    def reclaim(self, count: int=1000, pause: float=0.01) -> int:
+        """
+        Deletes the tag sets of the generations before the current one, which `clear` leaves behind. They are
+        found with SCAN, `count` keys at a time, pausing `pause` seconds between batches so that the server
+        keeps its latency for other clients. Runs in a background thread after every `clear` of a tagged cache.
+
+        Returns:
+            int: The number of tag sets deleted.
+        """
+        prefix = f'{self._keys[0]}:tag:'
+        current = int(self._redis.get(self._generation_key) or 0)
+        names = self._redis.scan_iter(match=escape_pattern(prefix) + '*', count=count)
+        deleted = 0
+        while True:
+            batch = list(islice(names, count))
+            if not batch:
+                return deleted
+            generations = (decode_key(name)[len(prefix):].split(':', 1)[0] for name in batch)
+            old = [name for name, generation in zip(batch, generations) if generation.isdigit() and int(generation) < current]
+            if old:
+                deleted += self._redis.unlink(*old)
+            time.sleep(pause)
+
+    def _schedule_reclaim(self) -> None:
+        with self._reclaim_lock:
+            self._reclaim_requested = True
+            if self._reclaimer is None:
+                self._reclaimer = threading.Thread(target=self._reclaim_in_background, name='cacheify-reclaim', daemon=True)
+                self._reclaimer.start()
+
+    def _reclaim_in_background(self) -> None:
+        while True:
+            with self._reclaim_lock:
+                if not self._reclaim_requested:
+                    self._reclaimer = None
+                    return
+                self._reclaim_requested = False
+            try:
+                self.reclaim()
+            except RedisError:
+                pass  # The tag sets left behind are reclaimed after the next `clear`
 
     def __iter__(self):
         """
-        Returns an iterator over the cache. 
-        This performs an O(n) Redis operation, which can be slow and is 
-        not recommended if performance is critical.
+        Streams the cache keys with `iter_keys`, one HSCAN page at a time.
         """
-        self._semaphore.acquire()
-        try:
-            redlock = self.redlock
-            redlock.auto_release_time = self._balance_release_time(len(self._cache))
-            with redlock:
-                return iter(self._cache)
-        finally:
-            self._semaphore.release()
+        return self.iter_keys()
 
     def __len__(self):
-        self._semaphore.acquire()
-        try:
-            with self.redlock:
-                return len(self._cache)
-        finally:
-            self._semaphore.release()
+        with self._guard():
+            self._reap()
+            return self._redis.hlen(self._keys[0])
@@ -0,0 +1,66 @@
+import itertools
+import threading
+import time
+from typing import Callable, Optional, Sequence
+from redis import Redis
+from redis.exceptions import RedisError
+
+def replication_lag(client: Redis) -> Optional[float]:
+    """
+    Estimates how many seconds a replica may lag behind its master from `INFO replication`.
+    Returns 0 for a master, and None when the replica is disconnected or the lag cannot be determined.
+    """
+    try:
+        info = client.info('replication')
+    except RedisError:
+        return None
+    if info.get('role') != 'slave':
+        return 0.0
+    if info.get('master_link_status') != 'up':
+        return None
+    lag = info.get('master_last_io_seconds_ago')
+    return None if lag is None or lag < 0 else float(lag)
+
+class ReplicaRouter:
+    """
+    ReplicaRouter picks the replica serving the next read. Replicas whose replication lag exceeds
+    `max_staleness` seconds, or cannot be measured, are skipped, and reads fall back to the master
+    when no replica qualifies. Lags are measured at most every `check_interval` seconds.
+
+    Args:
+        replicas (Sequence[Redis]): The replica clients.
+        max_staleness (float): The maximum tolerated replication lag, in seconds.
+        check_interval (float): How long a lag measurement is trusted, in seconds.
+        lag_probe (Callable[[Redis], Optional[float]]): Measures the lag of a replica. Defaults to `replication_lag`.
+    """
+
+    def __init__(self, replicas: Sequence[Redis], max_staleness: float=1.0, check_interval: float=1.0,
+                 lag_probe: Callable[[Redis], Optional[float]]=replication_lag):
+        self.replicas = list(replicas)
+        self.max_staleness = max_staleness
+        self.check_interval = check_interval
+        self._lag_probe = lag_probe
+        self._lock = threading.Lock()
+        self._checked_at = -float('inf')
+        self._round_robin = itertools.cycle(())
+
+    def _refresh(self) -> None:
+        eligible = []
+        for replica in self.replicas:
+            lag = self._lag_probe(replica)
+            if lag is not None and lag <= self.max_staleness:
+                eligible.append(replica)
+        self._round_robin = itertools.cycle(eligible)
+
+    def get_replica(self) -> Optional[Redis]:
+        """Returns the replica for the next read, or None if reads should go to the master."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                # Only one thread measures the lags; the others keep using the previous measurement
+                due = now - self._checked_at >= self.check_interval
+                if due:
+                    self._checked_at = now
+            if due:
+                self._refresh()
+        return next(self._round_robin, None)
@@ -0,0 +1,514 @@
+"""
+Lua scripts used by RedisCache.
+
+Every cache is stored as three Redis keys:
+    - KEYS[1]: a hash holding the JSON encoded entries.
+    - KEYS[2]: a sorted set indexing the entries that have a TTL, scored by their expiration
+      time in milliseconds (server clock).
+    - KEYS[3]: a hash holding the version numbers of entries ('v:<field>'), the counter they are taken
+      from ('clock') and the time the hash was created ('epoch'), which prefixes the numbers. An entry is
+      numbered when `GET_VERSIONED` reads it, and every write or deletion drops its number, so a number
+      identifies one write of the entry for `COMPARE_AND_SET`, even across a `clear` that resets the counter.
+Expired entries are removed lazily when they are read and incrementally on every write,
+so a short TTL on one entry never affects the others.
+
+Caches bounded by `max_entries` or `max_bytes` use two more keys, see `build_scripts`:
+    - KEYS[4]: a sorted set ranking the entries for eviction, scored by a logical clock
+      bumped on every access ('lru') or by their number of accesses ('lfu').
+    - KEYS[5]: a hash holding the total size of the entries ('bytes'), the number of
+      evictions ('evictions') and the LRU clock ('clock').
+The size of an entry is the length of its field plus the length of its serialized value.
+Every script calls the bookkeeping hooks, which do nothing for unbounded caches.
+
+Tagged entries are also members of one sorted set per tag, `<key>:tag:<generation>:<tag>`, scored by the
+expiration time of the entry. The generation, stored in `<key>:generation`, is bumped by `clear`, which makes
+the tag sets of the previous generations unreachable at once. The tag scripts take the generation key and the
+tag sets after the cache keys in KEYS, and fail with a STALEGEN error if the client named the tag sets after
+an outdated generation. Writing to a tag set first drops the members whose entry expired or was deleted, and
+the set itself expires with its last entry, so tags do not outlive the entries they label. Members of entries
+deleted before they expire are dropped when the tag is invalidated.
+"""
+
+from typing import Dict, Optional
+
+EVICTION_POLICIES = ('lru', 'lfu')
+
+_UNBOUNDED_HOOKS = """
+local BOUNDED = false
+local function sizeof(field) return 0 end
+local function touch(field) end
+local function forget(field) unversion(field) end
+local function account(field, old_size) end
+local function evict(keep) return 0 end
+"""
+
+_BOUNDED_HOOKS = """
+local BOUNDED = true
+local MAX_ENTRIES, MAX_BYTES = %(max_entries)d, %(max_bytes)d
+
+local function sizeof(field)
+    local length = redis.call('HSTRLEN', KEYS[1], field)
+    if length == 0 and redis.call('HEXISTS', KEYS[1], field) == 0 then
+        return 0
+    end
+    return length + #field
+end
+
+local function touch(field)
+    %(touch)s
+end
+
+-- Called before an entry is deleted
+local function forget(field)
+    local size = sizeof(field)
+    if size > 0 then
+        redis.call('HINCRBY', KEYS[5], 'bytes', -size)
+    end
+    redis.call('ZREM', KEYS[4], field)
+    unversion(field)
+end
+
+-- Called after an entry is written, with its size before the write
+local function account(field, old_size)
+    redis.call('HINCRBY', KEYS[5], 'bytes', sizeof(field) - old_size)
+end
+
+local function over_limit()
+    if MAX_ENTRIES > 0 and redis.call('HLEN', KEYS[1]) > MAX_ENTRIES then
+        return true
+    end
+    return MAX_BYTES > 0 and tonumber(redis.call('HGET', KEYS[5], 'bytes') or 0) > MAX_BYTES
+end
+
+local function remove(field)
+    forget(field)
+    redis.call('HDEL', KEYS[1], field)
+    redis.call('ZREM', KEYS[2], field)
+end
+
+-- Evicts entries in policy order until the cache fits its limits, sparing `keep`
+-- unless it is larger than the limit or the only entry left
+local function evict(keep)
+    local evicted = 0
+    if keep and MAX_BYTES > 0 and sizeof(keep) > MAX_BYTES then
+        remove(keep)
+        evicted = 1
+    end
+    while over_limit() do
+        local candidates = redis.call('ZRANGE', KEYS[4], 0, 1)
+        local victim = candidates[1]
+        if victim == keep and candidates[2] then
+            victim = candidates[2]
+        end
+        if not victim then
+            break
+        end
+        remove(victim)
+        evicted = evicted + 1
+    end
+    if evicted > 0 then
+        redis.call('HINCRBY', KEYS[5], 'evictions', evicted)
+    end
+    return evicted
+end
+"""
+
+_TOUCH = {
+    'lru': "redis.call('ZADD', KEYS[4], redis.call('HINCRBY', KEYS[5], 'clock', 1), field)",
+    'lfu': "redis.call('ZINCRBY', KEYS[4], 1, field)",
+}
+
+_PRELUDE = """
+local function unversion(field)
+    redis.call('HDEL', KEYS[3], 'v:' .. field)
+end
+-- HOOKS
+local function now_ms()
+    local t = redis.call('TIME')
+    return tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+end
+
+local function is_expired(field, now)
+    local expires_at = redis.call('ZSCORE', KEYS[2], field)
+    return expires_at and tonumber(expires_at) <= now
+end
+
+-- A negative TTL sets a deadline in the past, so the entry is expired at once and reaped
+local function set_ttl(field, ttl, now)
+    if ttl ~= 0 then
+        redis.call('ZADD', KEYS[2], now + ttl, field)
+    else
+        redis.call('ZREM', KEYS[2], field)
+    end
+end
+
+-- A nil TTL keeps the current one
+local function store(field, value, ttl, now)
+    local old_size = sizeof(field)
+    redis.call('HSET', KEYS[1], field, value)
+    unversion(field)
+    account(field, old_size)
+    touch(field)
+    if ttl then
+        set_ttl(field, ttl, now)
+    end
+end
+
+local function reap(now, limit)
+    local expired
+    if limit > 0 then
+        expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, limit)
+    else
+        expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+    end
+    for _, field in ipairs(expired) do
+        forget(field)
+    end
+    for i = 1, #expired, 1000 do
+        local batch = {unpack(expired, i, math.min(i + 999, #expired))}
+        redis.call('HDEL', KEYS[1], unpack(batch))
+        redis.call('ZREM', KEYS[2], unpack(batch))
+    end
+    return #expired
+end
+"""
+
+# ARGV[1]: field
+GET = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value then
+    return nil
+end
+if is_expired(ARGV[1], now_ms()) then
+    forget(ARGV[1])
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return nil
+end
+touch(ARGV[1])
+return value
+"""
+
+# ARGV[1]: field. Returns nil when the entry is missing, otherwise {value, version}. The version is numbered on
+# first read from a counter shared by the cache, so it changes whenever the entry is rewritten, even with the same value.
+GET_VERSIONED = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value then
+    return nil
+end
+if is_expired(ARGV[1], now_ms()) then
+    forget(ARGV[1])
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return nil
+end
+touch(ARGV[1])
+local version = redis.call('HGET', KEYS[3], 'v:' .. ARGV[1])
+if not version then
+    if redis.call('HEXISTS', KEYS[3], 'epoch') == 0 then
+        local t = redis.call('TIME')
+        redis.call('HSET', KEYS[3], 'epoch', t[1] .. '.' .. t[2])
+    end
+    version = redis.call('HGET', KEYS[3], 'epoch') .. ':' .. redis.call('HINCRBY', KEYS[3], 'clock', 1)
+    redis.call('HSET', KEYS[3], 'v:' .. ARGV[1], version)
+end
+return {value, version}
+"""
+
+# ARGV[1]: field. The read-only variant of GET, for replicas: expired entries are skipped, not deleted.
+GET_RO = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value or is_expired(ARGV[1], now_ms()) then
+    return nil
+end
+return value
+"""
+
+# ARGV[1]: field, ARGV[2]: value, ARGV[3]: ttl in milliseconds (0 means no expiration, a negative TTL expires the entry),
+# ARGV[4]: maximum number of expired entries to reap. Returns the number of entries evicted.
+SET = """
+local now = now_ms()
+store(ARGV[1], ARGV[2], tonumber(ARGV[3]), now)
+reap(now, tonumber(ARGV[4]))
+return evict(ARGV[1])
+"""
+
+# ARGV[1]: field, ARGV[2]: value, ARGV[3]: ttl in milliseconds, ARGV[4]: maximum number of expired entries to reap,
+# ARGV[5]: the generation of the tag sets. Returns the number of entries evicted.
+SET_TAGGED = """
+local generation = BOUNDED and 6 or 4
+if (redis.call('GET', KEYS[generation]) or '0') ~= ARGV[5] then
+    return redis.error_reply('STALEGEN the cache was cleared')
+end
+redis.call('SET', KEYS[generation], '0', 'NX')  -- Tells `clear` that there are tag sets to reclaim
+local now = now_ms()
+local field = ARGV[1]
+store(field, ARGV[2], tonumber(ARGV[3]), now)
+for i = generation + 1, #KEYS do
+    local tag = KEYS[i]
+    for _, member in ipairs(redis.call('ZRANGEBYSCORE', tag, '-inf', now)) do
+        local expires_at = redis.call('ZSCORE', KEYS[2], member)
+        if redis.call('HEXISTS', KEYS[1], member) == 0 or (expires_at and tonumber(expires_at) <= now) then
+            redis.call('ZREM', tag, member)
+        else
+            redis.call('ZADD', tag, expires_at or '+inf', member)  -- The TTL of the entry was extended
+        end
+    end
+    redis.call('ZADD', tag, redis.call('ZSCORE', KEYS[2], field) or '+inf', field)
+    if redis.call('ZCOUNT', tag, '+inf', '+inf') > 0 then
+        redis.call('PERSIST', tag)
+    else
+        redis.call('PEXPIREAT', tag, redis.call('ZRANGE', tag, -1, -1, 'WITHSCORES')[2])
+    end
+end
+reap(now, tonumber(ARGV[4]))
+return evict(field)
+"""
+
+# ARGV[1]: the generation of the tag sets. Deletes the entries the tag sets list and the sets themselves.
+# Returns how many live entries were deleted.
+INVALIDATE_TAGS = """
+local generation = BOUNDED and 6 or 4
+if (redis.call('GET', KEYS[generation]) or '0') ~= ARGV[1] then
+    return redis.error_reply('STALEGEN the cache was cleared')
+end
+local now = now_ms()
+local deleted = 0
+for i = generation + 1, #KEYS do
+    for _, field in ipairs(redis.call('ZRANGE', KEYS[i], 0, -1)) do
+        if redis.call('HEXISTS', KEYS[1], field) == 1 then
+            if not is_expired(field, now) then
+                deleted = deleted + 1
+            end
+            forget(field)
+            redis.call('HDEL', KEYS[1], field)
+            redis.call('ZREM', KEYS[2], field)
+        end
+    end
+    redis.call('DEL', KEYS[i])
+end
+return deleted
+"""
+
+# ARGV[1]: field, ARGV[2]: value, ARGV[3]: ttl in milliseconds, ARGV[4]: maximum number of expired entries to reap.
+# Returns {0, cached value} when the entry exists, otherwise stores the value and returns {1, number of entries evicted}.
+GET_OR_SET = """
+local now = now_ms()
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current and not is_expired(ARGV[1], now) then
+    touch(ARGV[1])
+    return {0, current}
+end
+store(ARGV[1], ARGV[2], tonumber(ARGV[3]), now)
+reap(now, tonumber(ARGV[4]))
+return {1, evict(ARGV[1])}
+"""
+
+# ARGV[1]: field, ARGV[2]: value, ARGV[3]: ttl in milliseconds ('keep' keeps the current one),
+# ARGV[4]: maximum number of expired entries to reap, ARGV[5] (optional): the expected version, see GET_VERSIONED.
+# Stores the value only if the entry still has the expected version, or if there is no entry when no version
+# is expected. Returns {1, number of entries evicted} when stored, {0} otherwise.
+COMPARE_AND_SET = """
+local now = now_ms()
+local exists = redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 and not is_expired(ARGV[1], now)
+if ARGV[5] then
+    if not exists or redis.call('HGET', KEYS[3], 'v:' .. ARGV[1]) ~= ARGV[5] then
+        return {0}
+    end
+elseif exists then
+    return {0}
+end
+store(ARGV[1], ARGV[2], tonumber(ARGV[3]), now)
+reap(now, tonumber(ARGV[4]))
+return {1, evict(ARGV[1])}
+"""
+
+# ARGV[1]: field, ARGV[2]: increment, ARGV[3]: ttl in milliseconds of a new counter, ARGV[4]: maximum number
+# of expired entries to reap. Existing counters keep their TTL. Returns {new value, number of entries evicted}.
+# Fails without writing anything if the entry is not an integer.
+INCR = """
+local now = now_ms()
+local field = ARGV[1]
+local created = redis.call('HEXISTS', KEYS[1], field) == 0 or is_expired(field, now)
+local old_size = sizeof(field)
+if created then
+    redis.call('HSET', KEYS[1], field, '0')
+end
+local value = redis.call('HINCRBY', KEYS[1], field, ARGV[2])
+unversion(field)
+account(field, old_size)
+touch(field)
+if created then
+    set_ttl(field, tonumber(ARGV[3]), now)
+end
+reap(now, tonumber(ARGV[4]))
+return {value, evict(field)}
+"""
+
+# ARGV[1]: field. Returns {1, value} when the entry existed, {0} otherwise.
+POP = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value then
+    return {0}
+end
+local expired = is_expired(ARGV[1], now_ms())
+forget(ARGV[1])
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if expired then
+    return {0}
+end
+return {1, value}
+"""
+
+# ARGV[1]: field, ARGV[2]: ttl in milliseconds
+EXPIRE = """
+local now = now_ms()
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 or is_expired(ARGV[1], now) then
+    return 0
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('ZADD', KEYS[2], now + ttl, ARGV[1])
+else
+    forget(ARGV[1])
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# ARGV: the fields to read. Returns the values in the same order, with nil for missing entries.
+GET_MANY = """
+local now = now_ms()
+local values = redis.call('HMGET', KEYS[1], unpack(ARGV))
+for i, field in ipairs(ARGV) do
+    if values[i] then
+        if is_expired(field, now) then
+            forget(field)
+            redis.call('HDEL', KEYS[1], field)
+            redis.call('ZREM', KEYS[2], field)
+            values[i] = false
+        else
+            touch(field)
+        end
+    end
+end
+return values
+"""
+
+# ARGV: the fields to read. The read-only variant of GET_MANY, for replicas.
+GET_MANY_RO = """
+local now = now_ms()
+local values = redis.call('HMGET', KEYS[1], unpack(ARGV))
+for i, field in ipairs(ARGV) do
+    if values[i] and is_expired(field, now) then
+        values[i] = false
+    end
+end
+return values
+"""
+
+# ARGV[1]: maximum number of expired entries to reap,
+# followed by (field, value, ttl in milliseconds) triples. Returns the number of entries evicted.
+SET_MANY = """
+local now = now_ms()
+for i = 2, #ARGV, 3 do
+    store(ARGV[i], ARGV[i + 1], tonumber(ARGV[i + 2]), now)
+end
+reap(now, tonumber(ARGV[1]))
+return evict(nil)
+"""
+
+# ARGV: the fields to delete. Returns how many live entries were deleted.
+DELETE_MANY = """
+local now = now_ms()
+local deleted = 0
+for _, field in ipairs(ARGV) do
+    if redis.call('HEXISTS', KEYS[1], field) == 1 and not is_expired(field, now) then
+        deleted = deleted + 1
+    end
+    forget(field)
+end
+redis.call('HDEL', KEYS[1], unpack(ARGV))
+redis.call('ZREM', KEYS[2], unpack(ARGV))
+return deleted
+"""
+
+# ARGV[1]: HSCAN cursor, ARGV[2]: COUNT hint, ARGV[3]: '1' to return values.
+# Returns {next cursor, page}, where the page lists the live fields, each followed by its value if requested.
+# The script only reads, so a scan never contends with writers for anything but the server itself.
+SCAN = """
+local now = now_ms()
+local reply = redis.call('HSCAN', KEYS[1], ARGV[1], 'COUNT', ARGV[2])
+local entries, page = reply[2], {}
+for i = 1, #entries, 2 do
+    if not is_expired(entries[i], now) then
+        page[#page + 1] = entries[i]
+        if ARGV[3] == '1' then
+            page[#page + 1] = entries[i + 1]
+        end
+    end
+end
+return {reply[1], page}
+"""
+
+# The generation key follows the cache keys in KEYS. Unlinks the cache keys, which takes constant time since Redis
+# frees their memory in a background thread, and bumps the generation if tags were used. Returns the generation.
+CLEAR = """
+redis.call('UNLINK', unpack(KEYS, 1, #KEYS - 1))
+if redis.call('EXISTS', KEYS[#KEYS]) == 0 then
+    return 0
+end
+return redis.call('INCR', KEYS[#KEYS])
+"""
+
+# Removes every expired entry and returns how many were removed.
+REAP = """
+return reap(now_ms(), 0)
+"""
+
+_BODIES = {
+    'get': GET,
+    'get_versioned': GET_VERSIONED,
+    'get_ro': GET_RO,
+    'set': SET,
+    'set_tagged': SET_TAGGED,
+    'invalidate_tags': INVALIDATE_TAGS,
+    'get_or_set': GET_OR_SET,
+    'compare_and_set': COMPARE_AND_SET,
+    'incr': INCR,
+    'pop': POP,
+    'expire': EXPIRE,
+    'get_many': GET_MANY,
+    'get_many_ro': GET_MANY_RO,
+    'set_many': SET_MANY,
+    'delete_many': DELETE_MANY,
+    'scan': SCAN,
+    'clear': CLEAR,
+    'reap': REAP,
+}
+
+def check_limits(max_entries: Optional[int], max_bytes: Optional[int]) -> bool:
+    """Validates the limits of a cache and returns whether it is bounded."""
+    for name, limit in (('max_entries', max_entries), ('max_bytes', max_bytes)):
+        if limit is not None and limit <= 0:
+            raise ValueError(f'{name} must be a positive integer')
+    return max_entries is not None or max_bytes is not None
+
+def build_scripts(max_entries: Optional[int]=None, max_bytes: Optional[int]=None, eviction: str='lru') -> Dict[str, str]:
+    """
+    Returns the scripts of a cache bounded to `max_entries` entries and `max_bytes` bytes, evicting
+    entries according to the `eviction` policy ('lru' or 'lfu') once a limit is exceeded.
+    The scripts of an unbounded cache skip every bookkeeping step.
+    """
+    if eviction not in EVICTION_POLICIES:
+        raise ValueError(f"Invalid eviction policy '{eviction}'. Expected one of {EVICTION_POLICIES}")
+    if not check_limits(max_entries, max_bytes):
+        hooks = _UNBOUNDED_HOOKS
+    else:
+        hooks = _BOUNDED_HOOKS % {'max_entries': max_entries or 0, 'max_bytes': max_bytes or 0, 'touch': _TOUCH[eviction]}
+    prelude = _PRELUDE.replace('-- HOOKS', hooks)
+    return {name: prelude + body for name, body in _BODIES.items()}
+
+SCRIPTS = build_scripts()
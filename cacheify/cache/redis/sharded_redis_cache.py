@@ -0,0 +1,266 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, TypeVar, Union
+from redis import Redis
+from pottery import Redlock
+from cacheify.cache.cacheable import MISSING, Cacheable
+from .connector import RedisConnector
+from .hash_ring import HashRing
+from .redis_cache import RedisCache
+
+T = TypeVar('T')
+
+class ShardedRedisCache(Cacheable):
+    """
+    ShardedRedisCache spreads its entries over several independent Redis nodes. Each node holds a
+    `RedisCache` with the same `key`, and a ketama consistent-hash ring (`HashRing`) decides which node
+    owns each entry, so adding or removing one of N shards only remaps about 1/N of the keys.
+
+    Single-key operations go to the owning shard. Bulk operations are split per shard and run on the
+    shards in parallel, and whole-cache operations (`keys`, `clear`, `len`, ...) run on every shard.
+    `lock()` returns a Redlock using every shard as a master.
+
+    Args:
+        key (str): The name of the cache and of its Redis hash on every shard.
+        shards (Union[Mapping[str, Union[Redis, str]], Sequence[Union[Redis, str]]]): The shard clients or Redis URLs.
+            Placement depends on the shard names, so prefer a mapping of stable names to clients. With a sequence,
+            the shards are named after their `host:port/db`.
+        points_per_shard (int): The number of points per shard on the hash ring.
+        max_workers (Optional[int]): The number of threads running bulk operations. Defaults to the number of shards.
+        **kwargs: Passed to every shard `RedisCache`, e.g. `consistency`, `serializer` or `reap_limit`.
+    """
+
+    def __init__(self, *, key: str='cache', shards: Union[Mapping[str, Union[Redis, str]], Sequence[Union[Redis, str]]],
+                 points_per_shard: int=160, max_workers: Optional[int]=None, **kwargs):
+        if not shards:
+            raise ValueError('ShardedRedisCache needs at least one shard')
+        self._key = key
+        self.points_per_shard = points_per_shard
+        self.auto_release_time = kwargs.get('auto_release_time', 10)
+        self._shard_kwargs = kwargs
+        named = shards.items() if isinstance(shards, Mapping) else ((None, shard) for shard in shards)
+        caches = {}
+        for name, shard in named:
+            client = RedisConnector(url=shard) if isinstance(shard, str) else shard
+            name = name or self._client_name(client)
+            if name in caches:
+                raise ValueError(f"Duplicate shard '{name}'. Pass the shards as a mapping of unique names to clients")
+            caches[name] = RedisCache(key=key, masters=[client], **kwargs)
+        # The ring and the shards are swapped together, so operations always see a consistent topology
+        self._topology: Tuple[HashRing, Dict[str, RedisCache]] = (HashRing(caches, points_per_shard), caches)
+        self._topology_lock = threading.Lock()
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def _client_name(client: Redis) -> str:
+        kwargs = client.connection_pool.connection_kwargs
+        if 'path' in kwargs:
+            return f"{kwargs['path']}/{kwargs.get('db', 0)}"
+        return f"{kwargs.get('host', 'localhost')}:{kwargs.get('port', 6379)}/{kwargs.get('db', 0)}"
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def shards(self) -> Dict[str, RedisCache]:
+        """The shard caches by name."""
+        return dict(self._topology[1])
+
+    def get_shard(self, key: str) -> RedisCache:
+        """Returns the shard cache owning `key`."""
+        ring, caches = self._topology
+        return caches[ring.get_node(key)]
+
+    def add_shard(self, name: str, client: Union[Redis, str]) -> None:
+        """
+        Adds a shard to the ring. About 1/N of the keys now map to it; their entries are not migrated,
+        so they are cache misses until written again, and their old copies expire or get evicted on the old shards.
+        """
+        client = RedisConnector(url=client) if isinstance(client, str) else client
+        with self._topology_lock:
+            _, caches = self._topology
+            if name in caches:
+                raise ValueError(f"Duplicate shard '{name}'")
+            caches = {**caches, name: RedisCache(key=self._key, masters=[client], **self._shard_kwargs)}
+            self._topology = (HashRing(caches, self.points_per_shard), caches)
+
+    def remove_shard(self, name: str) -> RedisCache:
+        """Removes a shard from the ring and returns its cache. Its keys are remapped to the remaining shards."""
+        with self._topology_lock:
+            _, caches = self._topology
+            if len(caches) == 1:
+                raise ValueError('Cannot remove the last shard')
+            caches = dict(caches)
+            removed = caches.pop(name)
+            self._topology = (HashRing(caches, self.points_per_shard), caches)
+        return removed
+
+    def close(self) -> None:
+        """Shuts down the threads running bulk operations."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _fan_out(self, calls: Dict[str, Callable[[], T]]) -> Dict[str, T]:
+        """Runs one call per shard, in parallel when more than one shard is involved."""
+        if len(calls) <= 1:
+            return {name: call() for name, call in calls.items()}
+        if self._executor is None:
+            with self._topology_lock:
+                if self._executor is None:
+                    workers = self._max_workers or len(self._topology[1])
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cacheify-shard')
+        futures = {name: self._executor.submit(call) for name, call in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _on_every_shard(self, operation: Callable[[RedisCache], T]) -> List[T]:
+        caches = self._topology[1]
+        results = self._fan_out({name: (lambda cache=cache: operation(cache)) for name, cache in caches.items()})
+        return [results[name] for name in sorted(results)]
+
+    def _group(self, keys) -> Tuple[Dict[str, RedisCache], Dict[str, list]]:
+        ring, caches = self._topology
+        groups: Dict[str, list] = {}
+        for key in keys:
+            groups.setdefault(ring.get_node(key), []).append(key)
+        return caches, groups
+
+    def lock(self, name=None, auto_release_time=None):
+        """Returns a Redlock on `name`, or on the whole cache, using every shard as a Redlock master."""
+        return Redlock(
+            key=self._key if name is None else f'{self._key}:lock:{name}',
+            masters=[cache.masters[0] for cache in self._topology[1].values()],
+            auto_release_time=auto_release_time or self.auto_release_time
+        )
+
+    def get(self, key):
+        return self.get_shard(key).get(key)
+
+    def set(self, key, value, ttl=None, tags=None):
+        self.get_shard(key).set(key, value, ttl, tags)
+
+    def invalidate_tags(self, tags):
+        """Invalidates the tags on every shard, since the entries of a tag can live on any of them."""
+        tags = list(tags)
+        return sum(self._on_every_shard(lambda cache: cache.invalidate_tags(tags)))
+
+    def invalidate_prefix(self, prefix, count=1000):
+        return sum(self._on_every_shard(lambda cache: cache.invalidate_prefix(prefix, count)))
+
+    def pop(self, key):
+        return self.get_shard(key).pop(key)
+
+    def get_or_set(self, key, value, ttl=None):
+        return self.get_shard(key).get_or_set(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        return self.get_shard(key).add(key, value, ttl)
+
+    def get_with_version(self, key):
+        return self.get_shard(key).get_with_version(key)
+
+    def compare_and_set(self, key, value, version, ttl=None):
+        return self.get_shard(key).compare_and_set(key, value, version, ttl)
+
+    def incr(self, key, delta=1, ttl=None):
+        return self.get_shard(key).incr(key, delta, ttl)
+
+    def get_bytes(self, key):
+        return self.get_shard(key).get_bytes(key)
+
+    def set_bytes(self, key, value, ttl=None):
+        self.get_shard(key).set_bytes(key, value, ttl)
+
+    def get_many(self, keys, default=MISSING):
+        keys = list(keys)
+        caches, groups = self._group(keys)
+        results = self._fan_out({
+            name: (lambda cache=caches[name], batch=batch: dict(zip(batch, cache.get_many(batch, default))))
+            for name, batch in groups.items()
+        })
+        found = {}
+        for values in results.values():
+            found.update(values)
+        return [found[key] for key in keys]
+
+    def _ttls(self, keys):
+        caches, groups = self._group(keys)
+        results = self._fan_out({
+            name: (lambda cache=caches[name], batch=batch: dict(zip(batch, cache._ttls(batch))))
+            for name, batch in groups.items()
+        })
+        ttls = {}
+        for shard_ttls in results.values():
+            ttls.update(shard_ttls)
+        return [ttls[key] for key in keys]
+
+    def set_many(self, mapping, ttl=None):
+        caches, groups = self._group(mapping)
+        self._fan_out({
+            name: (lambda cache=caches[name], batch=batch: cache.set_many({key: mapping[key] for key in batch}, ttl))
+            for name, batch in groups.items()
+        })
+
+    def delete_many(self, keys):
+        caches, groups = self._group(set(keys))
+        results = self._fan_out({
+            name: (lambda cache=caches[name], batch=batch: cache.delete_many(batch))
+            for name, batch in groups.items()
+        })
+        return sum(results.values())
+
+    def keys(self):
+        return [key for keys in self._on_every_shard(lambda cache: cache.keys()) for key in keys]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def items(self):
+        return [item for items in self._on_every_shard(lambda cache: cache.items()) for item in items]
+
+    def _scan(self, cursor: int, count: int, scan: Callable[[RedisCache, int, int], tuple]) -> tuple:
+        # The cursor packs the shard index, in name order, with the HSCAN cursor of that shard
+        caches = self._topology[1]
+        names = sorted(caches)
+        shard_cursor, index = divmod(cursor, len(names))
+        shard_cursor, page = scan(caches[names[index]], shard_cursor, count)
+        if shard_cursor:
+            return shard_cursor * len(names) + index, page
+        return (index + 1 if index + 1 < len(names) else 0), page
+
+    def scan_keys(self, cursor=0, count=1000):
+        """
+        Pages through the shards one after the other. Cursors are only valid while the set of shards stays the same.
+        """
+        return self._scan(cursor, count, lambda cache, shard_cursor, count: cache.scan_keys(shard_cursor, count))
+
+    def scan_items(self, cursor=0, count=1000):
+        return self._scan(cursor, count, lambda cache, shard_cursor, count: cache.scan_items(shard_cursor, count))
+
+    def expire(self, ttl, key=None, **kwargs):
+        if key is not None:
+            return self.get_shard(key).expire(ttl, key, **kwargs)
+        return all(self._on_every_shard(lambda cache: cache.expire(ttl, **kwargs)))
+
+    def _export_entries(self):
+        caches = self._topology[1]
+        for name in sorted(caches):
+            yield from caches[name]._export_entries()
+
+    def _import_entries(self, entries):
+        ring, caches = self._topology
+        groups: Dict[str, list] = {}
+        for entry in entries:
+            groups.setdefault(ring.get_node(entry.key), []).append(entry)
+        self._fan_out({name: (lambda name=name, group=group: caches[name]._import_entries(group)) for name, group in groups.items()})
+
+    def clear(self):
+        self._on_every_shard(lambda cache: cache.clear())
+
+    def __iter__(self):
+        return self.iter_keys()
+
+    def __len__(self):
+        return sum(self._on_every_shard(len))
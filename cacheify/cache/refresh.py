@@ -0,0 +1,170 @@
+"""
+Background refreshes for stale-while-revalidate reads.
+
+Once an entry is past its soft TTL, `cached(..., stale_ttl=...)` keeps returning it and hands its
+recomputation to a refresher, which runs at most one refresh per key at a time on a bounded pool:
+`Refresher` uses threads, `AsyncRefresher` uses asyncio tasks. A refresh that fails leaves the stale
+entry in place, so it keeps being served until its hard TTL, and is retried by the next read.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from .metrics import CacheMetrics
+
+class _BaseRefresher:
+    """
+    The bookkeeping shared by the refreshers: the keys being refreshed, the counters, and the metrics.
+
+    Args:
+        workers (int): The maximum number of refreshes running at the same time.
+        max_pending (int): The maximum number of refreshes queued or running. Further refreshes are dropped
+            until the queue drains; the stale entries are still served meanwhile.
+        metrics (Optional[CacheMetrics]): Records the latency and errors of the refreshes, as the 'refresh'
+            operation, and the refresh queue depth.
+        on_error (Optional[Callable[[str, BaseException], None]]): Called with the key and the exception
+            of every refresh that fails.
+    """
+
+    def __init__(self, workers: int=4, max_pending: int=1000, metrics: Optional[CacheMetrics]=None,
+                 on_error: Optional[Callable[[str, BaseException], None]]=None):
+        if workers <= 0:
+            raise ValueError('workers must be a positive integer')
+        if max_pending <= 0:
+            raise ValueError('max_pending must be a positive integer')
+        self.workers = workers
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.on_error = on_error
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._refreshes = self._failures = self._dropped = 0
+
+    def _reserve(self, key: str) -> bool:
+        """Marks `key` as being refreshed. Returns False if it already is or the queue is full."""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            if len(self._in_flight) >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._in_flight.add(key)
+            depth = len(self._in_flight)
+        if self.metrics is not None:
+            self.metrics.record_refresh_queue(depth)
+        return True
+
+    def _finish(self, key: str, started: float, error: Optional[BaseException]) -> None:
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._in_flight.discard(key)
+            depth = len(self._in_flight)
+            self._refreshes += 1
+            self._failures += error is not None
+        if self.metrics is not None:
+            self.metrics.observe('refresh', seconds, error=error is not None)
+            self.metrics.record_refresh_queue(depth)
+        if error is not None and self.on_error is not None:
+            self.on_error(key, error)
+
+    @property
+    def pending(self) -> int:
+        """The number of refreshes queued or running."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of refreshes pending, completed, failed, and dropped because the queue was full."""
+        with self._lock:
+            return {
+                'pending': len(self._in_flight),
+                'refreshes': self._refreshes,
+                'failures': self._failures,
+                'dropped': self._dropped,
+            }
+
+class Refresher(_BaseRefresher):
+    """
+    Refresher runs refreshes on a pool of `workers` threads, started on the first refresh. See `_BaseRefresher`.
+    """
+
+    def __init__(self, workers: int=4, max_pending: int=1000, metrics: Optional[CacheMetrics]=None,
+                 on_error: Optional[Callable[[str, BaseException], None]]=None):
+        super().__init__(workers, max_pending, metrics, on_error)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, key: str, refresh: Callable[[], Any]) -> bool:
+        """
+        Schedules `refresh` unless `key` is already being refreshed or the queue is full.
+
+        Returns:
+            bool: True if the refresh was scheduled.
+        """
+        if not self._reserve(key):
+            return False
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cacheify-refresh')
+        self._executor.submit(self._run, key, refresh)
+        return True
+
+    def _run(self, key: str, refresh: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        try:
+            refresh()
+        except Exception as error:
+            self._finish(key, started, error)
+        else:
+            self._finish(key, started, None)
+
+    def close(self, wait: bool=True) -> None:
+        """Stops the worker threads, after the pending refreshes if `wait` is True."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+class AsyncRefresher(_BaseRefresher):
+    """
+    AsyncRefresher runs refreshes as tasks of the running event loop, at most `workers` at a time.
+    See `_BaseRefresher`.
+    """
+
+    def __init__(self, workers: int=4, max_pending: int=1000, metrics: Optional[CacheMetrics]=None,
+                 on_error: Optional[Callable[[str, BaseException], None]]=None):
+        super().__init__(workers, max_pending, metrics, on_error)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()  # Keeps the running tasks referenced
+
+    def submit(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Schedules the coroutine returned by `refresh` unless `key` is already being refreshed or the queue is full.
+        Must be called from the event loop.
+
+        Returns:
+            bool: True if the refresh was scheduled.
+        """
+        if not self._reserve(key):
+            return False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        task = asyncio.get_running_loop().create_task(self._run(key, refresh))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                await refresh()
+            except Exception as error:
+                self._finish(key, started, error)
+            else:
+                self._finish(key, started, None)
+
+    async def close(self) -> None:
+        """Waits for the pending refreshes."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
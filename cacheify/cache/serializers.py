@@ -0,0 +1,229 @@
+"""
+Serializers turn cached values into bytes and back.
+
+A `CacheCodec` combines a serializer with optional compression and prefixes every payload with a
+header byte identifying both, so a cache can read values written with another configuration while
+migrating from one codec to another:
+
+    bit 7     always set, which never happens for the first byte of a plain JSON document
+    bits 4-6  compression: 0 none, 1 zlib, 2 lz4, 3 zstd
+    bits 0-3  format: 1 JSON (json or orjson), 2 msgpack, 3 pickle
+
+Payloads without a header are read as plain JSON, the format written by the caches without a codec.
+"""
+import json
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Union
+
+HEADER_FLAG = 0x80
+
+class Serializer(ABC):
+    """Converts values to bytes and back. `format_id` identifies the wire format in the header byte."""
+    name: str
+    format_id: int
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        pass
+
+class JSONSerializer(Serializer):
+    name = 'json'
+    format_id = 1
+
+    def dumps(self, value):
+        return json.dumps(value, separators=(',', ':')).encode()
+
+    def loads(self, data):
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+class OrjsonSerializer(Serializer):
+    """A faster JSON serializer. It writes the same format as `JSONSerializer`, so both can read each other's data."""
+    name = 'orjson'
+    format_id = JSONSerializer.format_id
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError("The 'orjson' serializer requires the orjson package: pip install orjson")
+        self._orjson = orjson
+
+    def dumps(self, value):
+        return self._orjson.dumps(value)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+class MsgpackSerializer(Serializer):
+    name = 'msgpack'
+    format_id = 2
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("The 'msgpack' serializer requires the msgpack package: pip install msgpack")
+        self._msgpack = msgpack
+
+    def dumps(self, value):
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data):
+        return self._msgpack.unpackb(data, raw=False)
+
+class PickleSerializer(Serializer):
+    """
+    Serializes any picklable value. Unpickling data can execute arbitrary code, so only use it
+    with a backend that untrusted parties cannot write to. Caches configured with another
+    serializer refuse to read pickled payloads.
+    """
+    name = 'pickle'
+    format_id = 3
+
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+class Compressor(ABC):
+    name: str
+    compression_id: int
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+class ZlibCompressor(Compressor):
+    name = 'zlib'
+    compression_id = 1
+
+    def __init__(self, level: int=6):
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+class Lz4Compressor(Compressor):
+    name = 'lz4'
+    compression_id = 2
+
+    def __init__(self):
+        try:
+            import lz4.frame
+        except ImportError:
+            raise ImportError("The 'lz4' compression requires the lz4 package: pip install lz4")
+        self._lz4 = lz4.frame
+
+    def compress(self, data):
+        return self._lz4.compress(data)
+
+    def decompress(self, data):
+        return self._lz4.decompress(data)
+
+class ZstdCompressor(Compressor):
+    name = 'zstd'
+    compression_id = 3
+
+    def __init__(self, level: int=3):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("The 'zstd' compression requires the zstandard package: pip install zstandard")
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+SERIALIZERS = {cls.name: cls for cls in (JSONSerializer, OrjsonSerializer, MsgpackSerializer, PickleSerializer)}
+COMPRESSORS = {cls.name: cls for cls in (ZlibCompressor, Lz4Compressor, ZstdCompressor)}
+
+class CacheCodec:
+    """
+    Encodes values with a serializer, compresses payloads larger than `compress_threshold` bytes,
+    and frames the result with a header byte (see the module docstring).
+
+    Args:
+        serializer (Union[str, Serializer]): 'json', 'orjson', 'msgpack', 'pickle' or a Serializer instance.
+        compression (Union[str, Compressor, None]): 'zlib', 'lz4', 'zstd', a Compressor instance or None.
+        compress_threshold (int): Payloads smaller than this many bytes are stored uncompressed.
+    """
+
+    def __init__(self, serializer: Union[str, Serializer]='json', compression: Union[str, Compressor, None]=None,
+                 compress_threshold: int=1024):
+        self.serializer = _instantiate(serializer, SERIALIZERS, 'serializer')
+        self.compressor = _instantiate(compression, COMPRESSORS, 'compression') if compression is not None else None
+        self.compress_threshold = compress_threshold
+        # Decoders are created on demand, since their optional packages may not be installed
+        self._serializers: Dict[int, Serializer] = {self.serializer.format_id: self.serializer}
+        self._compressors: Dict[int, Compressor] = {self.compressor.compression_id: self.compressor} if self.compressor else {}
+
+    def encode(self, value: Any) -> bytes:
+        data = self.serializer.dumps(value)
+        compression_id = 0
+        if self.compressor is not None and len(data) >= self.compress_threshold:
+            data = self.compressor.compress(data)
+            compression_id = self.compressor.compression_id
+        return bytes((HEADER_FLAG | compression_id << 4 | self.serializer.format_id,)) + data
+
+    def decode(self, data: Union[bytes, str, None]) -> Any:
+        if data is None:
+            return None
+        if isinstance(data, str) or not data or not data[0] & HEADER_FLAG:
+            return json.loads(data)  # A plain JSON document written without a codec
+        header = data[0]
+        payload = memoryview(data)[1:]
+        compression_id = header >> 4 & 0x07
+        if compression_id:
+            payload = self._compressor(compression_id).decompress(payload)
+        return self._serializer(header & 0x0F).loads(payload)
+
+    def _serializer(self, format_id: int) -> Serializer:
+        serializer = self._serializers.get(format_id)
+        if serializer is None:
+            if format_id == PickleSerializer.format_id:
+                raise ValueError('Refusing to unpickle a cached value: the cache is not configured with the pickle serializer')
+            cls = next((cls for cls in (JSONSerializer, MsgpackSerializer) if cls.format_id == format_id), None)
+            if cls is None:
+                raise ValueError(f'Unknown serialization format {format_id}')
+            serializer = self._serializers[format_id] = cls()
+        return serializer
+
+    def _compressor(self, compression_id: int) -> Compressor:
+        compressor = self._compressors.get(compression_id)
+        if compressor is None:
+            cls = next((cls for cls in COMPRESSORS.values() if cls.compression_id == compression_id), None)
+            if cls is None:
+                raise ValueError(f'Unknown compression {compression_id}')
+            compressor = self._compressors[compression_id] = cls()
+        return compressor
+
+def _instantiate(value, registry: dict, kind: str):
+    if isinstance(value, str):
+        if value not in registry:
+            raise ValueError(f"Invalid {kind} '{value}'. Expected one of {tuple(registry)}")
+        return registry[value]()
+    return value
+
+def get_codec(serializer: Union[str, Serializer, CacheCodec, None]) -> Optional[CacheCodec]:
+    """Normalizes the `serializer` argument accepted by the caches."""
+    if serializer is None or isinstance(serializer, CacheCodec):
+        return serializer
+    return CacheCodec(serializer)
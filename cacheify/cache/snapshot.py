@@ -0,0 +1,133 @@
+"""
+Snapshots of cache contents, written by `Cacheable.dump` and read back by `Cacheable.load`, so that a new
+worker can start with the entries of a previous one instead of an empty cache.
+
+A snapshot is the `MAGIC` bytes followed by one record per entry: a `_RECORD` header holding the kind of
+the entry, its expiration time as a Unix timestamp (0 if it never expires) and the lengths of its key and
+data, then the UTF-8 key and the data. Expiration times are absolute, so entries keep their remaining TTL
+however long the snapshot waited, and entries that expired meanwhile are skipped on load. Records are
+streamed on both ends, and the snapshot is gzip compressed by default.
+
+An entry is either a `VALUE`, a JSON document that any cache can load whatever its serializer, or `RAW`,
+bytes stored as-is: payloads written with `set_bytes` or encoded by a serializer, which must be loaded
+by a cache using the same serializer.
+"""
+import gzip
+import json
+import os
+import struct
+import time
+from typing import Callable, IO, Iterable, Iterator, NamedTuple, Optional
+from .serializers import HEADER_FLAG
+
+MAGIC = b'CFYSNAP1'
+
+VALUE = 0
+RAW = 1
+
+_RECORD = struct.Struct('<BdII')  # kind, expires_at, key length, data length
+_GZIP_MAGIC = b'\x1f\x8b'
+
+class SnapshotEntry(NamedTuple):
+    key: str
+    kind: int
+    data: bytes
+    expires_at: Optional[float]  # Unix timestamp, None if the entry never expires
+
+    def ttl(self, now: float) -> Optional[float]:
+        """Returns the remaining time-to-live of the entry in seconds at `now`, or None if it never expires."""
+        return None if self.expires_at is None else self.expires_at - now
+
+def payload_entry(key: str, payload: bytes, expires_at: Optional[float]) -> SnapshotEntry:
+    """
+    Builds the entry of a payload stored as bytes. Plain JSON payloads become portable values,
+    payloads framed by a serializer, which start with a byte with `HEADER_FLAG` set, are kept raw.
+    """
+    kind = RAW if payload and payload[0] & HEADER_FLAG else VALUE
+    return SnapshotEntry(key, kind, bytes(payload), expires_at)
+
+def entry_payload(entry: SnapshotEntry, encode: Optional[Callable]=None) -> bytes:
+    """
+    Returns the payload to store for `entry`. Values are decoded and re-encoded with `encode` when given,
+    e.g. a serializer's, and stored as-is otherwise. Raw data, and values that are not valid JSON
+    such as text written with `set_bytes`, are always stored as-is.
+    """
+    if entry.kind == VALUE and encode is not None:
+        try:
+            return encode(json.loads(entry.data))
+        except ValueError:
+            pass
+    return entry.data
+
+def write_snapshot(path: str, entries: Iterable[SnapshotEntry], compress: bool=True) -> int:
+    """
+    Writes `entries` to the snapshot at `path`. The snapshot is written to a temporary file first,
+    then moved into place, so readers never see a partial snapshot.
+
+    Returns:
+        int: The number of entries written.
+    """
+    temporary = f'{path}.tmp'
+    written = 0
+    try:
+        with open(temporary, 'wb') as raw:
+            stream: IO[bytes] = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) if compress else raw
+            try:
+                stream.write(MAGIC)
+                for entry in entries:
+                    key = entry.key.encode()
+                    stream.write(_RECORD.pack(entry.kind, entry.expires_at or 0.0, len(key), len(entry.data)))
+                    stream.write(key)
+                    stream.write(entry.data)
+                    written += 1
+            finally:
+                if compress:
+                    stream.close()
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return written
+
+def read_snapshot(path: str) -> Iterator[SnapshotEntry]:
+    """Streams the entries of the snapshot at `path`, compressed or not, skipping those that have expired."""
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == _GZIP_MAGIC
+        raw.seek(0)
+        stream: IO[bytes] = gzip.GzipFile(fileobj=raw, mode='rb') if compressed else raw
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a cacheify snapshot')
+        while True:
+            header = stream.read(_RECORD.size)
+            if not header:
+                return
+            if len(header) < _RECORD.size:
+                raise ValueError(f'The snapshot {path} is truncated')
+            kind, expires_at, key_length, data_length = _RECORD.unpack(header)
+            key, data = stream.read(key_length), stream.read(data_length)
+            if len(data) < data_length:
+                raise ValueError(f'The snapshot {path} is truncated')
+            if expires_at and expires_at <= time.time():
+                continue
+            yield SnapshotEntry(key.decode(), kind, data, expires_at or None)
+
+def load_snapshot(path: str, load_batch: Callable[[list], None], batch_size: int=1000) -> int:
+    """
+    Reads the snapshot at `path` and passes its live entries to `load_batch`, `batch_size` entries at a time.
+
+    Returns:
+        int: The number of entries loaded.
+    """
+    loaded = 0
+    batch = []
+    for entry in read_snapshot(path):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            load_batch(batch)
+            loaded += len(batch)
+            batch = []
+    if batch:
+        load_batch(batch)
+        loaded += len(batch)
+    return loaded
@@ -0,0 +1,284 @@
+import json
+import logging
+import threading
+import uuid
+from typing import Optional
+from redis import Redis
+from cacheify.cache.cacheable import MISSING, Cacheable, per_key_ttl
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.redis.redis_cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+class TieredCache(Cacheable):
+    """
+    TieredCache is a near cache: a bounded in-process L1 (`LocalCache`) in front of a shared L2,
+    typically a `RedisCache`. Reads are served from L1 when possible; writes go to L2 first, then L1.
+
+    Every write is announced on the Redis channel `<l2 key>:invalidations`, so that the other nodes
+    drop the affected keys from their L1. Entries are only kept in L1 for `l1_ttl` seconds, which
+    also bounds how stale a node can get if it misses an invalidation message, and never longer than
+    the remaining TTL of their L2 entry. Values read from an L2 that does not report TTLs, such as
+    `SharedMemoryCache`, are not copied to L1.
+
+    Invalidations use pub/sub rather than `CLIENT TRACKING`: the L2 entries are fields of a single
+    Redis hash, and tracking works at the key level, so it would flush the whole L1 on every write.
+
+    Args:
+        key (str): The name of the cache, used for the default L2.
+        l2 (Optional[Cacheable]): The shared cache. Defaults to a `RedisCache` named `key`.
+        l1_max_entries (int): The maximum number of entries kept in L1.
+        l1_max_bytes (Optional[int]): The maximum total size of the L1 entries, see `LocalCache`.
+        l1_eviction (str): The eviction policy of L1, see `LocalCache`.
+        l1_ttl (float): The maximum time in seconds an entry stays in L1.
+        pubsub_client (Optional[Redis]): The client used for invalidation messages. Defaults to the L2 Redis master
+                                         when L2 is a `RedisCache`; without one, L1 is not invalidated across nodes.
+    """
+
+    def __init__(self, *, key: str='cache', l2: Optional[Cacheable]=None, l1_max_entries: int=10000, l1_ttl: float=60,
+                 pubsub_client: Optional[Redis]=None, l1_max_bytes: Optional[int]=None, l1_eviction: str='lru', **kwargs):
+        self.l2 = l2 if l2 is not None else RedisCache(key=key, **kwargs)
+        self.l1 = LocalCache(key=self.l2.key, max_entries=l1_max_entries, max_bytes=l1_max_bytes, eviction=l1_eviction)
+        self.l1_ttl = l1_ttl
+        self._node_id = uuid.uuid4().hex
+        self._channel = f'{self.l2.key}:invalidations'
+        self._stats_lock = threading.Lock()
+        self._l1_hits = self._l2_hits = self._misses = 0
+        if pubsub_client is None and isinstance(self.l2, RedisCache):
+            pubsub_client = self.l2.masters[0]
+        self._l2_ttls = type(self.l2)._ttls is not Cacheable._ttls
+        self._publisher = pubsub_client
+        self._listener = None
+        if pubsub_client is not None:
+            pubsub = pubsub_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self._channel: self._on_invalidation})
+            self._listener = pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+
+    @property
+    def key(self):
+        return self.l2.key
+
+    def _l1_ttl(self, ttl) -> float:
+        return min(ttl, self.l1_ttl) if ttl else self.l1_ttl
+
+    def _on_invalidation(self, message: dict) -> None:
+        # An exception would stop the listener thread, and L1 would never be invalidated again
+        try:
+            data = json.loads(message['data'])
+            if data['node'] == self._node_id:
+                return
+            if 'prefix' in data:
+                self.l1.invalidate_prefix(data['prefix'])
+            elif data['keys'] is None:
+                self.l1.clear()
+            else:
+                self.l1.delete_many(data['keys'])
+        except Exception:
+            logger.exception('Could not handle the invalidation message %r', message.get('data'))
+
+    def _l1_ttls(self, keys: list) -> dict:
+        """
+        Returns the L1 TTL of each key just read from L2, bounded by the remaining TTL of its L2 entry. Keys whose
+        entry expired or was deleted meanwhile are left out, and so is every key if L2 does not report TTLs.
+        """
+        if not self._l2_ttls:
+            return {}
+        return {
+            key: self._l1_ttl(ttl) for key, ttl in zip(keys, self.l2._ttls(keys))
+            if ttl is not MISSING and (ttl is None or ttl > 0)
+        }
+
+    def _invalidate(self, keys: Optional[list], **scope) -> None:
+        """
+        Tells the other nodes to drop `keys` from their L1, or everything when `keys` is None.
+        A `prefix` in `scope` narrows down the keys dropped when `keys` is None.
+        """
+        if self._publisher is not None:
+            self._publisher.publish(self._channel, json.dumps({'node': self._node_id, 'keys': keys, **scope}))
+
+    def _count(self, l1_hits: int=0, l2_hits: int=0, misses: int=0) -> None:
+        with self._stats_lock:
+            self._l1_hits += l1_hits
+            self._l2_hits += l2_hits
+            self._misses += misses
+
+    def stats(self) -> dict:
+        """
+        Returns the hit counters of each tier. Hit rates are relative to all lookups,
+        so `l1_hit_rate + l2_hit_rate` is the overall hit rate.
+        """
+        with self._stats_lock:
+            l1_hits, l2_hits, misses = self._l1_hits, self._l2_hits, self._misses
+        lookups = l1_hits + l2_hits + misses
+        return {
+            'l1_hits': l1_hits,
+            'l2_hits': l2_hits,
+            'misses': misses,
+            'l1_hit_rate': l1_hits / lookups if lookups else 0.0,
+            'l2_hit_rate': l2_hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Stops listening for invalidation messages."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def get(self, key):
+        value = self.get_many([key])[0]
+        return None if value is MISSING else value
+
+    def set(self, key, value, ttl=None, tags=None):
+        self.l2.set(key, value, ttl, tags)
+        self.l1.set(key, value, self._l1_ttl(ttl))
+        self._invalidate([key])
+
+    def invalidate_tags(self, tags):
+        """
+        Invalidates the tags in L2. The entries that L1 fetched from L2 come without their tags,
+        so the L1 of every node is cleared.
+        """
+        deleted = self.l2.invalidate_tags(tags)
+        self.l1.clear()
+        self._invalidate(None)
+        return deleted
+
+    def invalidate_prefix(self, prefix, count=1000):
+        deleted = self.l2.invalidate_prefix(prefix, count)
+        self.l1.invalidate_prefix(prefix, count)
+        self._invalidate(None, prefix=prefix)
+        return deleted
+
+    def pop(self, key):
+        self.l1.delete_many([key])
+        try:
+            return self.l2.pop(key)
+        finally:
+            self._invalidate([key])
+
+    def get_or_set(self, key, value, ttl=None):
+        # A value that was missing from L2 cannot be in the L1 of other nodes, so nothing is invalidated
+        value = self.l2.get_or_set(key, value, ttl)
+        # The entry may have been cached already, with less TTL left than `ttl`
+        l1_ttl = self._l1_ttls([key]).get(key)
+        if l1_ttl is not None:
+            self.l1.set(key, value, l1_ttl)
+        return value
+
+    def add(self, key, value, ttl=None):
+        return self._invalidate_if(self.l2.add(key, value, ttl), key)
+
+    def get_with_version(self, key):
+        """Reads the entry from L2, which holds the versions."""
+        return self.l2.get_with_version(key)
+
+    def compare_and_set(self, key, value, version, ttl=None):
+        return self._invalidate_if(self.l2.compare_and_set(key, value, version, ttl), key)
+
+    def incr(self, key, delta=1, ttl=None):
+        return self._invalidate_if(self.l2.incr(key, delta, ttl), key)
+
+    def _invalidate_if(self, result, key):
+        if result is not False:
+            self.l1.delete_many([key])
+            self._invalidate([key])
+        return result
+
+    def get_bytes(self, key):
+        value = self.l1.get_bytes(key)
+        if value is not None:
+            self._count(l1_hits=1)
+            return value
+        value = self.l2.get_bytes(key)
+        if value is None:
+            self._count(misses=1)
+        else:
+            ttl = self._l1_ttls([key]).get(key)
+            if ttl is not None:
+                self.l1.set_bytes(key, value, ttl)
+            self._count(l2_hits=1)
+        return value
+
+    def set_bytes(self, key, value, ttl=None):
+        self.l2.set_bytes(key, value, ttl)
+        self.l1.set_bytes(key, value, self._l1_ttl(ttl))
+        self._invalidate([key])
+
+    def get_many(self, keys, default=MISSING):
+        keys = list(keys)
+        values = self.l1.get_many(keys)
+        missing = [key for key, value in zip(keys, values) if value is MISSING]
+        if missing:
+            fetched = dict(zip(missing, self.l2.get_many(missing)))
+            found = {key: value for key, value in fetched.items() if value is not MISSING}
+            ttls = self._l1_ttls(list(found)) if found else {}
+            if ttls:
+                self.l1.set_many({key: found[key] for key in ttls}, ttls)
+            values = [fetched[key] if value is MISSING else value for key, value in zip(keys, values)]
+            self._count(l1_hits=len(keys) - len(missing), l2_hits=len(found), misses=len(missing) - len(found))
+        else:
+            self._count(l1_hits=len(keys))
+        return [default if value is MISSING else value for value in values]
+
+    def set_many(self, mapping, ttl=None):
+        self.l2.set_many(mapping, ttl)
+        self.l1.set_many(mapping, {key: self._l1_ttl(per_key_ttl(ttl, key)) for key in mapping})
+        self._invalidate(list(mapping))
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.l1.delete_many(keys)
+        deleted = self.l2.delete_many(keys)
+        self._invalidate(keys)
+        return deleted
+
+    def keys(self):
+        return self.l2.keys()
+
+    def values(self):
+        return self.l2.values()
+
+    def items(self):
+        return self.l2.items()
+
+    def scan_keys(self, cursor=0, count=1000):
+        return self.l2.scan_keys(cursor, count)
+
+    def scan_items(self, cursor=0, count=1000):
+        return self.l2.scan_items(cursor, count)
+
+    def expire(self, ttl, key=None, **kwargs):
+        result = self.l2.expire(ttl, key, **kwargs)
+        if key is None:
+            self.l1.expire(self._l1_ttl(ttl))
+        else:
+            self.l1.delete_many([key])
+        self._invalidate(None if key is None else [key])
+        return result
+
+    def _ttls(self, keys):
+        return self.l2._ttls(keys)
+
+    def _export_entries(self):
+        return self.l2._export_entries()
+
+    def _import_entries(self, entries):
+        # Loaded entries reach the L1 of each node on its next miss, like entries set by other nodes
+        self.l2._import_entries(entries)
+        keys = [entry.key for entry in entries]
+        self.l1.delete_many(keys)
+        self._invalidate(keys)
+
+    def lock(self, name=None, auto_release_time=None):
+        return self.l2.lock(name, auto_release_time)
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+        self._invalidate(None)
+
+    def __iter__(self):
+        return iter(self.l2)
+
+    def __len__(self):
+        return len(self.l2)
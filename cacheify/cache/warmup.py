@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Mapping, Optional, Union
+from .cacheable import MISSING, Cacheable
+from .json_types import JSONType
+
+def warm_up(cache: Cacheable, keys: Iterable[str], loader: Callable[[List[str]], Mapping[str, JSONType]], *,
+            ttl: Union[int, Mapping[str, int], None]=None, batch_size: int=100, workers: int=8,
+            snapshot: Optional[str]=None, skip_cached: bool=True) -> int:
+    """
+    Preloads `keys` into `cache` before a worker starts serving, so its first requests do not all miss.
+    Call it from the startup hook of the worker and mark the worker ready once it returns.
+
+    The keys are split in batches of `batch_size`, and `workers` threads run `loader` on the batches
+    in parallel, each storing the values it returns with `set_many`. With `snapshot`, entries are first
+    loaded from that snapshot file, if it exists, see `Cacheable.load`, so `loader` only runs for the keys
+    it did not hold.
+
+    Args:
+        cache (Cacheable): The cache to warm up.
+        keys (Iterable[str]): The keys to preload, e.g. the most requested ones.
+        loader (Callable[[List[str]], Mapping[str, JSONType]]): Returns the values of a batch of keys,
+            typically with a single database query. Keys missing from the returned mapping are not cached,
+            and returning None caches none of the batch.
+        ttl (Union[int, Mapping[str, int], None]): The TTL of the preloaded entries, see `Cacheable.set_many`.
+        batch_size (int): The number of keys passed to each `loader` call. Defaults to 100.
+        workers (int): The number of batches loaded in parallel. Defaults to 8.
+        snapshot (Optional[str]): The path of a snapshot written by `Cacheable.dump`, loaded first if it exists.
+        skip_cached (bool): Whether to skip the keys that are already cached. Defaults to True.
+    Returns:
+        int: The number of entries stored, including those loaded from the snapshot.
+
+    Raises:
+        Exception: The first exception raised by `loader`, once every batch has been attempted.
+    """
+    loaded = cache.load(snapshot) if snapshot is not None and os.path.exists(snapshot) else 0
+    keys = list(keys)
+    batches = [keys[start:start + batch_size] for start in range(0, len(keys), batch_size)]
+
+    def load_batch(batch: List[str]) -> int:
+        if skip_cached:
+            batch = [key for key, value in zip(batch, cache.get_many(batch)) if value is MISSING]
+            if not batch:
+                return 0
+        values = loader(batch) or {}
+        if values:
+            cache.set_many(values, ttl)
+        return len(values)
+
+    if not batches:
+        return loaded
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches)), thread_name_prefix='cacheify-warmup') as executor:
+        futures = [executor.submit(load_batch, batch) for batch in batches]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise errors[0]
+    return loaded + sum(future.result() for future in futures)
@@ -0,0 +1,177 @@
+import multiprocessing
+import threading
+import time
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.disk.disk_cache import DiskCache
+from cacheify.cache.tiered.tiered_cache import TieredCache
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.sqlite')
+
+@pytest.fixture
+def cache(path):
+    cache = DiskCache(path=path)
+    yield cache
+    cache.close()
+
+def test_set_and_get(cache: DiskCache):
+    cache.set('key1', {'a': [1, 2]})
+    assert cache.get('key1') == {'a': [1, 2]}
+    assert cache.get('missing') is None
+
+def test_set_with_ttl(cache: DiskCache):
+    cache.set('key_ttl', 'value', ttl=0.5)
+    assert cache.get('key_ttl') == 'value'
+    time.sleep(0.7)
+    assert cache.get('key_ttl') is None
+    assert len(cache) == 0
+    assert cache.compact() == 1
+
+def test_pop_and_overwrite(cache: DiskCache):
+    cache.set('key', 'value')
+    cache.set('key', 'new value')
+    assert len(cache) == 1
+    assert cache.pop('key') == 'new value'
+    with pytest.raises(KeyError):
+        cache.pop('key')
+
+def test_bytes(cache: DiskCache):
+    cache.set_bytes('key', bytearray(b'\x00\x01payload'))
+    assert cache.get_bytes('key') == b'\x00\x01payload'
+
+def test_bulk_operations(cache: DiskCache):
+    cache.set_many({f'key{i}': i for i in range(1200)})
+    assert cache.get_many(['key1', 'missing', 'key999']) == [1, MISSING, 999]
+    assert len(cache.get_many(f'key{i}' for i in range(1200))) == 1200
+    assert cache.delete_many(['key1', 'key2', 'missing']) == 2
+    assert len(cache) == 1198
+    assert sorted(cache.iter_keys(count=100)) == sorted(cache.keys())
+    assert dict(cache.items())['key50'] == 50
+
+def test_expire(cache: DiskCache):
+    cache.set('key', 'value')
+    assert cache.expire(0.5, key='key')
+    assert not cache.expire(1, key='missing')
+    cache.set('other', 'value')
+    assert cache.expire(0.5)
+    time.sleep(0.7)
+    assert cache.keys() == []
+
+def test_entries_survive_restarts(cache: DiskCache, path):
+    cache.set('key', 'value')
+    cache.close()
+    reopened = DiskCache(path=path)
+    assert reopened.get('key') == 'value'
+    reopened.close()
+
+def test_evicts_least_recently_used(path):
+    cache = DiskCache(path=path, max_entries=10)
+    cache.set_many({f'key{i}': i for i in range(10)})
+    cache.get('key0')
+    cache.set('key10', 10)
+    assert len(cache) == 10
+    assert cache.get('key0') == 0
+    assert cache.get('key1') is None
+    cache.close()
+
+def test_max_bytes(path):
+    cache = DiskCache(path=path, max_bytes=1000)
+    cache.set_many({f'key{i}': 'x' * 100 for i in range(20)})
+    assert 0 < len(cache) < 10
+    cache.set('large', 'x' * 2000)
+    assert cache.get('large') is None
+    cache.close()
+
+def test_concurrent_writers(cache: DiskCache):
+    def worker(offset):
+        for i in range(50):
+            cache.set(f'key{offset}:{i}', i)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 200
+
+def test_as_tiered_l2(path):
+    l2 = DiskCache(path=path)
+    cache = TieredCache(l2=l2, l1_max_entries=10)
+    cache.set('key', 'value')
+    assert l2.get('key') == 'value'
+    cache.l1.clear()
+    assert cache.get('key') == 'value'
+    assert cache.stats()['l2_hits'] == 1
+    assert l2._ttls(['key', 'missing']) == [None, MISSING]
+    cache.close()
+    l2.close()
+
+def test_atomic_operations(cache: DiskCache):
+    assert cache.get_or_set('key', 'value') == 'value'
+    assert not cache.add('key', 'other')
+    value, version = cache.get_with_version('key')
+    cache.set('key', 'changed')
+    assert not cache.compare_and_set('key', 'new', version)
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', 'new', version)
+    assert cache.incr('counter', ttl=0.5) == 1
+    assert cache.decr('counter', 3) == -2
+    time.sleep(0.6)
+    assert cache.get('counter') is None
+    with pytest.raises(TypeError):
+        cache.incr('key')
+
+def test_invalidate_tags_and_prefix(cache: DiskCache):
+    cache.set('user:1', 'a', tags=['team:1'])
+    cache.set('user:2', 'b', tags=['team:1', 'team:2'])
+    cache.set('user:3', 'c', ttl=0.2, tags=['team:2'])
+    cache.set('user:2', 'd')  # Overwriting without tags drops them
+    assert cache.invalidate_tags(['team:1']) == 1
+    time.sleep(0.3)
+    assert cache.compact() == 1
+    assert cache._connection().execute('SELECT COUNT(*) FROM tags').fetchone()[0] == 0
+    cache.set('user_4', 'e')
+    assert cache.invalidate_prefix('user:') == 1
+    assert cache.keys() == ['user_4']
+
+def _try_lock(path):
+    cache = DiskCache(path=path, compaction_interval=None)
+    acquired = cache.lock('counter').acquire(timeout=0.1)
+    raise SystemExit(1 if acquired else 0)
+
+def test_instances_on_one_path_share_locks(cache: DiskCache, path):
+    other = DiskCache(path=path)
+    counter = []
+
+    def increment(instance):
+        for _ in range(300):
+            with instance.lock('counter'):
+                value = len(counter)
+                time.sleep(0)  # Lets the other threads run
+                counter.append(value)
+
+    threads = [threading.Thread(target=increment, args=(instance,)) for instance in (cache, other) * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter == list(range(1200))
+    with cache.lock('counter'):
+        other.close()
+        process = multiprocessing.get_context('fork').Process(target=_try_lock, args=(path,))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+def test_clear_keeps_the_triggers(cache: DiskCache):
+    cache.set_many({f'key{i}': i for i in range(100)})
+    cache.set('tagged', 1, tags=['tag'])
+    cache.clear()
+    assert len(cache) == 0
+    cache.set_many({'a': 1, 'b': 2})
+    cache.set('tagged', 1, tags=['tag'])
+    cache.delete_many(['a', 'tagged'])
+    assert len(cache) == 1
+    assert cache._connection().execute('SELECT COUNT(*) FROM tags').fetchone()[0] == 0
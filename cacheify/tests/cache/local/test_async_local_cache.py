@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.local.async_local_cache import AsyncLocalCache
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def cache():
+    return AsyncLocalCache()
+
+async def test_set_and_get(cache: AsyncLocalCache):
+    await cache.set('key1', 'value1')
+    assert await cache.get('key1') == 'value1'
+
+async def test_set_with_ttl(cache: AsyncLocalCache):
+    await cache.set('key_ttl', 'value_ttl', ttl=1)
+    assert await cache.get('key_ttl') == 'value_ttl'
+    await asyncio.sleep(1.5)
+    assert await cache.get('key_ttl') is None
+
+async def test_pop(cache: AsyncLocalCache):
+    await cache.set('key2', {'a': 1})
+    assert await cache.pop('key2') == {'a': 1}
+    assert await cache.get('key2') is None
+
+async def test_bulk_operations(cache: AsyncLocalCache):
+    await cache.set_many({'key3': 'value3', 'key4': 'value4'})
+    assert await cache.get_many(['key4', 'missing', 'key3']) == ['value4', MISSING, 'value3']
+    assert await cache.delete_many(['key3', 'missing']) == 1
+    assert await cache.size() == 1
+
+async def test_iteration(cache: AsyncLocalCache):
+    await cache.set_many({'key5': 'value5', 'key6': 'value6'})
+    assert sorted([key async for key in cache]) == ['key5', 'key6']
+    assert sorted(await cache.items()) == [('key5', 'value5'), ('key6', 'value6')]
+
+async def test_clear(cache: AsyncLocalCache):
+    await cache.set('key7', 'value7')
+    await cache.clear()
+    assert await cache.size() == 0
+
+async def test_get_or_load_single_flight(cache: AsyncLocalCache):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'loaded'
+
+    results = await asyncio.gather(*(cache.get_or_load('key8', loader) for _ in range(10)))
+    assert results == ['loaded'] * 10
+    assert len(calls) == 1
+    assert await cache.get_or_load('key8', lambda: 'other') == 'loaded'
+
+async def test_set_bytes_and_get_bytes(cache: AsyncLocalCache):
+    await cache.set_bytes('blob', b'raw')
+    assert await cache.get_bytes('blob') == b'raw'
+
+async def test_iter_keys_and_items(cache: AsyncLocalCache):
+    await cache.set_many({f'key{i}': i for i in range(300)})
+    assert {key: value async for key, value in cache.iter_items(count=50)} == {f'key{i}': i for i in range(300)}
+    assert sorted([key async for key in cache]) == sorted(await cache.keys())
@@ -1,7 +1,9 @@
 import pytest
 import threading, time
 from collections.abc import Iterable
+from cacheify.cache.cacheable import MISSING
 from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.serializers import CacheCodec
 
 @pytest.fixture
 def cache():
@@ -49,7 +51,6 @@ def test_keys(cache: LocalCache):
     assert 'key5' in keys
     assert 'key6' in keys
 
-@pytest.mark.filterwarnings("ignore::pottery.exceptions.InefficientAccessWarning")
 def test_values(cache: LocalCache):
     cache.set('key7', 'value7')
     cache.set('key8', 'value8')
@@ -99,7 +100,6 @@ def test_items_empty_cache(cache: LocalCache):
     items = cache.items()
     assert len(items) == 0
 
-@pytest.mark.filterwarnings("ignore::pottery.exceptions.InefficientAccessWarning")
 def test_iter(cache: LocalCache):
     cache.set('key14', 'value14')
     cache.set('key15', 'value15')
@@ -126,4 +126,226 @@ def test_thread_safety(cache: LocalCache):
         thread.join()
 
     for i in range(100):
-        assert cache.get(f'key{i}') == f'value{i}'
\ No newline at end of file
+        assert cache.get(f'key{i}') == f'value{i}'
+
+def test_set_with_ttl_does_not_expire_other_entries(cache: LocalCache):
+    cache.set('key_short', 'value_short', ttl=1)
+    cache.set('key_long', 'value_long')
+    time.sleep(1.5)
+    assert cache.get('key_short') is None
+    assert cache.get('key_long') == 'value_long'
+    assert len(cache) == 1
+
+def test_expire_single_key(cache: LocalCache):
+    cache.set('key18', 'value18')
+    cache.set('key19', 'value19')
+    assert cache.expire(1, key='key18') is True
+    assert cache.expire(1, key='missing_key') is False
+    time.sleep(1.5)
+    assert cache.get('key18') is None
+    assert cache.get('key19') == 'value19'
+
+def test_max_entries_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2)
+    cache.set('key20', 'value20')
+    cache.set('key21', 'value21')
+    cache.get('key20')
+    cache.set('key22', 'value22')
+    assert cache.get('key21') is None
+    assert cache.get('key20') == 'value20'
+    assert cache.get('key22') == 'value22'
+
+def test_get_many_keeps_input_order(cache: LocalCache):
+    cache.delete_many(['bulk1', 'bulk2', 'bulk_missing'])
+    cache.set('bulk1', 'value1')
+    cache.set('bulk2', None)
+    assert cache.get_many(['bulk2', 'bulk_missing', 'bulk1']) == [None, MISSING, 'value1']
+    assert cache.get_many(['bulk_missing'], default='fallback') == ['fallback']
+    assert cache.get_many([]) == []
+
+def test_set_many_and_delete_many(cache: LocalCache):
+    cache.set_many({'bulk3': 'value3', 'bulk4': [1, 2]})
+    assert cache.get_many(['bulk3', 'bulk4']) == ['value3', [1, 2]]
+    assert cache.delete_many(['bulk3', 'bulk4', 'bulk_missing']) == 2
+    assert cache.get_many(['bulk3', 'bulk4']) == [MISSING, MISSING]
+
+def test_set_many_with_per_key_ttl(cache: LocalCache):
+    cache.set_many({'bulk5': 'value5', 'bulk6': 'value6'}, ttl={'bulk5': 1})
+    time.sleep(1.5)
+    assert cache.get_many(['bulk5', 'bulk6']) == [MISSING, 'value6']
+
+def test_serializer_copies_values():
+    cache = LocalCache(serializer=CacheCodec('pickle', compression='zlib', compress_threshold=0))
+    value = {'a': (1, 2), 'b': {3}}
+    cache.set('key', value)
+    assert cache.get('key') == value
+    assert cache.get('key') is not value
+    assert cache.get_many(['key', 'missing']) == [value, MISSING]
+    assert cache.items() == [('key', value)]
+
+def test_set_bytes_shares_the_stored_buffer(cache: LocalCache):
+    blob = b'<html>' + b'x' * 100000 + b'</html>'
+    cache.set_bytes('page', blob, ttl=60)
+    assert cache.get_bytes('page') is blob
+    assert cache.get_bytes('missing') is None
+    buffer = bytearray(b'proto')
+    cache.set_bytes('message', memoryview(buffer))
+    buffer[0:1] = b'P'
+    assert cache.get_bytes('message') == b'proto'
+
+def test_get_bytes_rejects_decoded_entries(cache: LocalCache):
+    cache.set('key', [1, 2])
+    with pytest.raises(TypeError):
+        cache.get_bytes('key')
+
+def test_iter_keys_and_items(cache: LocalCache):
+    cache.set_many({f'key{i}': [i] for i in range(2500)})
+    assert sorted(cache.iter_keys(count=100)) == sorted(f'key{i}' for i in range(2500))
+    assert dict(cache.iter_items(count=100)) == {f'key{i}': [i] for i in range(2500)}
+    assert sorted(cache) == sorted(cache.keys())
+
+def test_scan_is_resumable(cache: LocalCache):
+    cache.set_many({f'key{i}': i for i in range(2500)})
+    cursor, first_page = cache.scan_keys(count=100)
+    assert cursor and len(first_page) >= 100
+    rest = list(cache.iter_keys(count=100, cursor=cursor))
+    assert sorted(first_page + rest) == sorted(f'key{i}' for i in range(2500))
+
+def test_max_bytes_counts_encoded_size():
+    cache = LocalCache(max_bytes=1000, serializer=CacheCodec('json', compression='zlib'))
+    cache.set_many({f'key{i}': 'x' * 5000 for i in range(20)})
+    assert len(cache) == 20  # Each entry compresses to a few dozen bytes
+    cache = LocalCache(max_bytes=1000)
+    cache.set_many({f'key{i}': ['x' * 100] for i in range(20)})
+    assert 0 < len(cache) < 10
+
+def test_stripes_default():
+    assert LocalCache().stripes == LocalCache.DEFAULT_STRIPES
+    assert LocalCache(max_entries=10).stripes == 1
+    with pytest.raises(ValueError):
+        LocalCache(stripes=0)
+
+def test_whole_cache_operations_span_stripes():
+    cache = LocalCache(stripes=4)
+    cache.set_many({f'key{i}': i for i in range(100)})
+    assert len(cache) == 100
+    assert sorted(cache.keys()) == sorted(f'key{i}' for i in range(100))
+    assert cache.get_many(['key1', 'missing', 'key99']) == [1, MISSING, 99]
+    assert cache.delete_many([f'key{i}' for i in range(50)] + ['missing']) == 50
+    assert sorted(key for key, _ in cache.iter_items(count=10)) == sorted(f'key{i}' for i in range(50, 100))
+    cache.clear()
+    assert len(cache) == 0 and cache.keys() == []
+
+def test_striped_limits_are_split():
+    cache = LocalCache(max_entries=8, stripes=4)
+    cache.set_many({f'key{i}': i for i in range(100)})
+    assert len(cache) <= 8
+
+@pytest.mark.parametrize('max_entries, stripes', [(10, 4), (17, 8), (16, 16)])
+def test_striped_limits_are_not_exceeded(max_entries, stripes):
+    cache = LocalCache(max_entries=max_entries, stripes=stripes)
+    for i in range(200):
+        cache.set(f'key{i}', i)
+    assert len(cache) == max_entries
+
+def test_striped_byte_limit_is_not_exceeded():
+    # Every entry takes 9 bytes: shares of 136 / 16 rounded up would hold one entry in every stripe
+    cache = LocalCache(max_bytes=136, stripes=16)
+    for i in range(200):
+        cache.set(f'k{i:03d}', 'value')
+    assert sum(len(key) + len(value) for key, value in cache.items()) <= 136
+
+def test_stripes_cannot_exceed_limits():
+    with pytest.raises(ValueError):
+        LocalCache(max_entries=10, stripes=16)
+    with pytest.raises(ValueError):
+        LocalCache(max_bytes=10, stripes=16)
+
+def test_concurrent_access_across_stripes():
+    cache = LocalCache(stripes=8)
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(500):
+                key = f'key{offset}:{i}'
+                cache.set(key, i)
+                assert cache.get(key) == i
+                if i % 50 == 0:
+                    len(cache)
+        except AssertionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache) == 8 * 500
+
+def test_get_or_set_and_add(cache: LocalCache):
+    assert cache.get_or_set('key', {'a': 1}, ttl=60) == {'a': 1}
+    assert cache.get_or_set('key', 'other') == {'a': 1}
+    assert not cache.add('key', 'other')
+    assert cache.add('new', None)
+    assert cache.get_many(['new']) == [None]
+
+def test_compare_and_set(cache: LocalCache):
+    assert cache.get_with_version('key') == (None, None)
+    assert cache.compare_and_set('key', 1, None)
+    value, version = cache.get_with_version('key')
+    assert value == 1
+    cache.set('key', 2)
+    assert not cache.compare_and_set('key', value + 1, version)
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', value + 1, version)
+    assert cache.get('key') == 3
+
+def test_incr_and_decr(cache: LocalCache):
+    assert cache.incr('counter', ttl=0.5) == 1
+    assert cache.incr('counter', 5) == 6
+    assert cache.decr('counter', 2) == 4
+    time.sleep(0.6)  # Increments keep the TTL of the counter
+    assert cache.incr('counter') == 1
+    cache.set('text', 'a')
+    with pytest.raises(TypeError):
+        cache.incr('text')
+
+def test_concurrent_incr():
+    cache = LocalCache(serializer='json')
+
+    def worker():
+        for _ in range(500):
+            cache.incr('counter')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('counter') == 4000
+
+def test_invalidate_tags(cache: LocalCache):
+    cache.set('user:1', 'a', tags=['user:1', 'team:1'])
+    cache.set('user:2', 'b', tags=['user:2', 'team:1'])
+    cache.set('user:3', 'c', tags=['user:3'])
+    cache.set('other', 'd')
+    assert cache.invalidate_tags(['team:1']) == 2
+    assert sorted(cache.keys()) == ['other', 'user:3']
+    cache.set('user:3', 'e')  # Overwriting without tags drops them
+    assert cache.invalidate_tags(['user:3', 'unknown']) == 0
+    assert cache.get('user:3') == 'e'
+
+def test_invalidate_prefix(cache: LocalCache):
+    cache.set_many({f'user:{i}': i for i in range(50)})
+    cache.set('team:1', 'x')
+    assert cache.invalidate_prefix('user:', count=10) == 50
+    assert cache.keys() == ['team:1']
+
+def test_ttls(cache: LocalCache):
+    cache.set('short', 1, ttl=10)
+    cache.set('forever', 2)
+    assert cache._ttls(['short', 'forever', 'missing']) == [pytest.approx(10, abs=0.1), None, MISSING]
+    cache.expire(5)
+    assert cache._ttls(['short', 'forever']) == [pytest.approx(5, abs=0.1), pytest.approx(5, abs=0.1)]
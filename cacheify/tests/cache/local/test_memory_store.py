@@ -0,0 +1,203 @@
+import pytest
+from cacheify.cache.local.memory_store import SCAN_BUCKETS, MemoryStore
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+def test_invalid_eviction_policy():
+    with pytest.raises(ValueError, match='Invalid eviction policy'):
+        MemoryStore(eviction='random')
+
+def test_entry_expires(timer: FakeTimer):
+    store = MemoryStore(timer=timer)
+    store.set('a', 1, ttl=10)
+    store.set('b', 2)
+    timer.now = 10
+    assert store.get('a') is None
+    assert store.get('b') == 2
+
+def test_purge_skips_overwritten_entries(timer: FakeTimer):
+    store = MemoryStore(timer=timer)
+    store.set('a', 1, ttl=5)
+    store.set('a', 2)
+    timer.now = 6
+    assert store.purge() == 0
+    assert store.get('a') == 2
+
+def test_len_excludes_expired_entries(timer: FakeTimer):
+    store = MemoryStore(timer=timer)
+    store.set('a', 1, ttl=5)
+    store.set('b', 2, ttl=15)
+    timer.now = 10
+    assert len(store) == 1
+    assert store.keys() == ['b']
+
+def test_expire_all(timer: FakeTimer):
+    store = MemoryStore(timer=timer)
+    store.set('a', 1)
+    store.expire_all(5)
+    timer.now = 5
+    assert len(store) == 0
+
+def test_lfu_eviction():
+    store = MemoryStore(max_entries=2, eviction='lfu')
+    store.set('a', 1)
+    store.set('b', 2)
+    store.get('a')
+    store.get('a')
+    store.get('b')
+    store.set('c', 3)
+    assert 'a' in store
+    assert 'b' not in store
+
+def test_ttl_eviction_prefers_expired_entries(timer: FakeTimer):
+    store = MemoryStore(max_entries=2, eviction='ttl', timer=timer)
+    store.set('a', 1)
+    store.set('b', 2, ttl=5)
+    timer.now = 6
+    store.set('c', 3)
+    assert store.get('a') == 1
+    assert store.get('c') == 3
+
+def test_pop_missing_key_raises():
+    store = MemoryStore()
+    with pytest.raises(KeyError):
+        store.pop('a')
+    assert store.pop('a', None) is None
+
+def test_scan_pages_through_every_entry(timer: FakeTimer):
+    store = MemoryStore(timer=timer)
+    for i in range(5000):
+        store.set(f'key{i}', i, ttl=10 if i % 2 else None)
+    timer.now = 10
+    cursor, seen = 0, []
+    while True:
+        cursor, page = store.scan(cursor, count=100)
+        seen.extend(page)
+        if not cursor:
+            break
+    assert sorted(seen) == sorted((f'key{i}', i) for i in range(0, 5000, 2))
+
+def test_scan_tolerates_changes_between_pages():
+    store = MemoryStore()
+    for i in range(3000):
+        store.set(i, i)
+    cursor, page = store.scan(0, count=500)
+    seen = [key for key, _ in page]
+    for i in range(1000):
+        store.pop(i if i not in seen else 3000 + i, None)
+        store.set(10000 + i, i)
+    while cursor:
+        cursor, page = store.scan(cursor, count=500)
+        seen.extend(key for key, _ in page)
+    untouched = set(range(1000, 3000))
+    assert untouched <= set(seen)
+    assert len(seen) == len(set(seen))
+
+def test_scan_does_not_count_as_access():
+    store = MemoryStore(max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    store.scan(0)
+    store.get('b')
+    store.set('c', 3)
+    assert store.keys() == ['b', 'c']
+
+def test_scan_index_is_rebuilt():
+    store = MemoryStore(max_entries=10)
+    for i in range(20000):
+        store.set(i, i)
+    assert store._indexed <= 2 * len(store) + 4096
+    cursor, keys = 0, []
+    while True:
+        cursor, page = store.scan(cursor)
+        keys.extend(key for key, _ in page)
+        if not cursor:
+            break
+    assert sorted(keys) == list(range(19990, 20000))
+
+def test_expiry_heap_is_rebuilt(timer: FakeTimer):
+    store = MemoryStore(max_entries=10, timer=timer)
+    for i in range(20000):
+        store.set(i % 20, i, ttl=3600)
+    assert len(store._expiry_heap) <= 2 * len(store) + SCAN_BUCKETS
+    timer.now = 3600
+    assert len(store) == 0
+
+def test_max_bytes_evicts_least_recently_used():
+    store = MemoryStore(max_bytes=100)
+    for key in 'abcd':
+        store.set(key, 'x' * 29)  # 30 bytes with the key
+    assert store.keys() == ['b', 'c', 'd']
+    store.get('b')
+    store.set('e', 'y' * 29)
+    assert sorted(store.keys()) == ['b', 'd', 'e']
+
+def test_max_bytes_skips_entries_too_large():
+    store = MemoryStore(max_bytes=100)
+    store.set('a', 'small')
+    store.set('a', 'x' * 200)
+    assert store.get('a') is None
+    assert len(store) == 0
+
+def test_max_entries_and_max_bytes():
+    store = MemoryStore(max_entries=2, max_bytes=100)
+    for key in 'abc':
+        store.set(key, b'x' * 9)
+    assert store.keys() == ['b', 'c']
+    store.set('d', b'x' * 95)
+    assert store.keys() == ['d']
+
+def test_oversized_entry_does_not_evict():
+    store = MemoryStore(max_entries=2, max_bytes=100)
+    store.set('a', 'x')
+    store.set('b', 'y')
+    store.set('c', 'z' * 200)
+    assert store.keys() == ['a', 'b']
+
+def test_expire_keeps_entry_size():
+    store = MemoryStore(max_bytes=100)
+    store.set('a', 'x' * 49)
+    store.expire('a', 10)
+    store.set('b', 'y' * 49)
+    assert store.keys() == ['a', 'b']
+
+def test_tinylfu_eviction_resists_scans():
+    store = MemoryStore(max_entries=100, eviction='tinylfu')
+    for _ in range(3):
+        for key in range(90):
+            if store.get(key) is None:
+                store.set(key, key)
+    for key in range(1000, 1500):
+        store.set(key, key)
+    assert all(key in store for key in range(90))
+
+def test_pluggable_eviction_policy():
+    from cachetools import FIFOCache
+    store = MemoryStore(max_entries=2, eviction=FIFOCache)
+    store.set('a', 1)
+    store.set('b', 2)
+    store.get('a')
+    store.set('c', 3)
+    assert store.keys() == ['b', 'c']
+
+def test_invalid_max_bytes():
+    with pytest.raises(ValueError):
+        MemoryStore(max_bytes=0)
+
+def test_tag_index_stays_bounded():
+    now = [0.0]
+    store = MemoryStore(timer=lambda: now[0])
+    for i in range(20000):
+        store.set(i, i, ttl=1, tags=[f'tag{i}'])
+        now[0] += 0.01
+    assert len(store._entry_tags) < 2 * len(store) + SCAN_BUCKETS
+    assert store.invalidate_tags(['tag19999', 'tag0']) == 1
@@ -0,0 +1,148 @@
+import multiprocessing
+import threading
+import time
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.local.shared_cache import SharedMemoryCache
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'shared.cache')
+
+@pytest.fixture
+def cache(path):
+    cache = SharedMemoryCache(path=path, slots=1024, slot_size=256, stripes=8)
+    yield cache
+    cache.close()
+
+def test_set_and_get(cache: SharedMemoryCache):
+    cache.set('key1', {'a': [1, 2]})
+    assert cache.get('key1') == {'a': [1, 2]}
+    assert cache.get('missing') is None
+
+def test_set_with_ttl(cache: SharedMemoryCache):
+    cache.set('key_ttl', 'value', ttl=0.5)
+    assert cache.get('key_ttl') == 'value'
+    time.sleep(0.7)
+    assert cache.get('key_ttl') is None
+    assert 'key_ttl' not in cache.keys()
+
+def test_pop_and_overwrite(cache: SharedMemoryCache):
+    cache.set('key', 'value')
+    cache.set('key', 'new value')
+    assert len(cache) == 1
+    assert cache.pop('key') == 'new value'
+    with pytest.raises(KeyError):
+        cache.pop('key')
+
+def test_bytes(cache: SharedMemoryCache):
+    cache.set_bytes('key', bytearray(b'\x00\x01payload'))
+    assert cache.get_bytes('key') == b'\x00\x01payload'
+
+def test_bulk_operations(cache: SharedMemoryCache):
+    cache.set_many({f'key{i}': i for i in range(100)}, ttl={'key0': 0.5})
+    assert cache.get_many(['key1', 'missing', 'key99']) == [1, MISSING, 99]
+    assert cache.delete_many(['key1', 'key2', 'missing']) == 2
+    assert len(cache) == 98
+    assert sorted(cache.iter_keys(count=10)) == sorted(cache.keys())
+    assert dict(cache.items())['key50'] == 50
+
+def test_expire(cache: SharedMemoryCache):
+    cache.set('key', 'value')
+    assert cache.expire(0.5, key='key')
+    assert not cache.expire(1, key='missing')
+    cache.set('other', 'value')
+    assert cache.expire(0.5)
+    time.sleep(0.7)
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+def test_clear(cache: SharedMemoryCache):
+    cache.set_many({f'key{i}': i for i in range(10)})
+    cache.clear()
+    assert cache.keys() == []
+
+def test_eviction_keeps_recently_used(path):
+    cache = SharedMemoryCache(path=path, slots=16, slot_size=64, stripes=1)
+    cache.set('hot', 'value')
+    for i in range(100):
+        cache.set(f'key{i}', i)
+        cache.get('hot')
+    assert len(cache) == 16
+    assert cache.get('hot') == 'value'
+    cache.close()
+
+def test_oversized_entries_are_not_cached(cache: SharedMemoryCache):
+    cache.set('key', 'small')
+    cache.set('key', 'x' * 1000)
+    assert cache.get('key') is None
+
+def test_geometry_must_match(cache: SharedMemoryCache, path):
+    with pytest.raises(ValueError, match='slot_size'):
+        SharedMemoryCache(path=path, slots=1024, slot_size=512, stripes=8)
+
+def _writer(path, keys):
+    cache = SharedMemoryCache(path=path, slots=1024, slot_size=256, stripes=8)
+    for key in keys:
+        with cache.lock('counter'):
+            cache.set('counter', (cache.get('counter') or 0) + 1)
+        cache.set(key, key.upper())
+    cache.close()
+
+def test_shared_across_processes(cache: SharedMemoryCache, path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_writer, args=(path, [f'p{n}k{i}' for i in range(50)])) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert cache.get('counter') == 200
+    assert cache.get('p3k49') == 'P3K49'
+    assert len(cache) == 201
+
+def test_atomic_operations(cache: SharedMemoryCache):
+    assert cache.get_or_set('key', 'value') == 'value'
+    assert not cache.add('key', 'other')
+    value, version = cache.get_with_version('key')
+    cache.set('key', 'changed')
+    assert not cache.compare_and_set('key', 'new', version)
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', 'new', version)
+    assert cache.incr('counter', ttl=0.5) == 1
+    assert cache.decr('counter', 3) == -2
+    time.sleep(0.6)
+    assert cache.get('counter') is None
+
+def test_instances_on_one_file_exclude_each_other(cache: SharedMemoryCache, path):
+    other = SharedMemoryCache(path=path, slots=1024, slot_size=256, stripes=8)
+
+    def increment(instance):
+        for _ in range(300):
+            with instance.lock('counter'):
+                value = instance.get('counter') or 0
+                time.sleep(0)  # Lets the other threads run
+                instance.set('counter', value + 1)
+            instance.incr('hits')
+
+    threads = [threading.Thread(target=increment, args=(instance,)) for instance in (cache, other) * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('counter') == cache.get('hits') == 1200
+
+def _try_lock(path):
+    cache = SharedMemoryCache(path=path, slots=1024, slot_size=256, stripes=8)
+    acquired = cache.lock('name').acquire(timeout=0.1)
+    cache.close()
+    raise SystemExit(1 if acquired else 0)
+
+def test_closing_an_instance_keeps_the_locks_of_another(cache: SharedMemoryCache, path):
+    other = SharedMemoryCache(path=path, slots=1024, slot_size=256, stripes=8)
+    with cache.lock('name'):
+        other.close()
+        process = multiprocessing.get_context('fork').Process(target=_try_lock, args=(path,))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
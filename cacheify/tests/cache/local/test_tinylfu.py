@@ -0,0 +1,48 @@
+from cacheify.cache.local.tinylfu import CountMinSketch, TinyLFUCache
+
+def test_sketch_estimates_frequencies():
+    sketch = CountMinSketch(1024)
+    for _ in range(5):
+        sketch.add('hot')
+    sketch.add('cold')
+    assert sketch.frequency('hot') >= 5
+    assert sketch.frequency('cold') >= 1
+    assert sketch.frequency('hot') > sketch.frequency('unseen')
+
+def test_sketch_counters_saturate_and_age():
+    sketch = CountMinSketch(16, sample_size=40)
+    for _ in range(30):
+        sketch.add('hot')
+    assert sketch.frequency('hot') == 15
+    for i in range(10):
+        sketch.add(i)
+    assert sketch.frequency('hot') == 7
+
+def test_rejects_entries_seen_once():
+    cache = TinyLFUCache(100)
+    for key in range(90):
+        cache[key] = key
+        cache.get(key)
+    for key in range(1000, 2000):
+        cache[key] = key
+    assert all(key in cache for key in range(90))
+    assert len(cache) == 100
+
+def test_admits_frequently_requested_entries():
+    cache = TinyLFUCache(3)
+    for key in 'abc':
+        cache[key] = key
+    cache.get('a')
+    for _ in range(5):
+        cache.get('e')  # Misses are counted too
+    cache['e'] = 'e'
+    assert 'e' in cache and len(cache) == 3
+
+def test_weighted_sizes():
+    cache = TinyLFUCache(100, getsizeof=len)
+    cache['a'] = 'x' * 60
+    cache['b'] = 'x' * 30
+    cache['c'] = 'x' * 30
+    assert cache.currsize <= 100
+    del cache['c']
+    assert cache._window_size + cache._protected_size <= cache.currsize
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.redis.async_redis_cache import AsyncRedisCache
+from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.serializers import CacheCodec
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def cache():
+    return AsyncRedisCache(key='async_cache')
+
+async def test_set_and_get(cache: AsyncRedisCache):
+    await cache.set('key1', 'value1')
+    assert await cache.get('key1') == 'value1'
+
+async def test_set_with_ttl_does_not_expire_other_entries(cache: AsyncRedisCache):
+    await cache.clear()
+    await cache.set('key_short', 'value_short', ttl=1)
+    await cache.set('key_long', 'value_long')
+    await asyncio.sleep(1.5)
+    assert await cache.get('key_short') is None
+    assert await cache.get('key_long') == 'value_long'
+    assert await cache.size() == 1
+
+async def test_pop(cache: AsyncRedisCache):
+    await cache.set('key2', [1, 2])
+    assert await cache.pop('key2') == [1, 2]
+    with pytest.raises(KeyError):
+        await cache.pop('key2')
+
+async def test_bulk_operations(cache: AsyncRedisCache):
+    await cache.clear()
+    await cache.set_many({'key3': 'value3', 'key4': 'value4'}, ttl={'key3': 10})
+    assert await cache.get_many(['key4', 'missing', 'key3']) == ['value4', MISSING, 'value3']
+    assert await cache.delete_many(['key3', 'missing']) == 1
+    assert await cache.keys() == ['key4']
+
+async def test_expire_single_key(cache: AsyncRedisCache):
+    await cache.set('key5', 'value5')
+    assert await cache.expire(1, key='key5') is True
+    await asyncio.sleep(1.5)
+    assert await cache.get('key5') is None
+
+async def test_get_or_load_single_flight(cache: AsyncRedisCache):
+    await cache.delete_many(['key6'])
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {'loaded': True}
+
+    results = await asyncio.gather(*(cache.get_or_load('key6', loader) for _ in range(10)))
+    assert results == [{'loaded': True}] * 10
+    assert len(calls) == 1
+
+async def test_shares_storage_with_sync_cache(cache: AsyncRedisCache):
+    RedisCache(key='async_cache').set('key7', 'from_sync')
+    assert await cache.get('key7') == 'from_sync'
+
+async def test_serializer_shares_storage_with_redis_cache():
+    cache = AsyncRedisCache(key='async_serialized', serializer=CacheCodec('json', compression='zlib', compress_threshold=0))
+    await cache.set_many({'key1': {'a': 1}, 'key2': [1, 2]})
+    assert await cache.get_many(['key1', 'key2', 'missing']) == [{'a': 1}, [1, 2], MISSING]
+    assert RedisCache(key='async_serialized', serializer='json').get('key1') == {'a': 1}
+    await cache.clear()
+
+async def test_set_bytes_and_get_bytes(cache: AsyncRedisCache):
+    await cache.set_bytes('blob', b'\xff\x00raw')
+    assert await cache.get_bytes('blob') == b'\xff\x00raw'
+    assert await cache.get_bytes('missing') is None
+
+async def test_iter_keys_and_items():
+    cache = AsyncRedisCache(key='async_scanned')
+    await cache.clear()
+    await cache.set_many({f'key{i}': i for i in range(300)})
+    assert sorted({key async for key in cache.iter_keys(count=50)}) == sorted(f'key{i}' for i in range(300))
+    assert {key: value async for key, value in cache.iter_items(count=50)} == {f'key{i}': i for i in range(300)}
+    assert {key async for key in cache} == set(await cache.keys())
+    await cache.clear()
+
+async def test_max_entries_shares_bookkeeping_with_redis_cache():
+    cache = AsyncRedisCache(key='async_bounded', max_entries=2)
+    await cache.clear()
+    await cache.set_many({'a': 1, 'b': 2})
+    await cache.get('a')
+    RedisCache(key='async_bounded', max_entries=2).set('c', 3)
+    assert sorted(await cache.keys()) == ['a', 'c']
+    await cache.clear()
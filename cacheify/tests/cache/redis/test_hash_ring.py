@@ -0,0 +1,38 @@
+import pytest
+from cacheify.cache.redis.hash_ring import HashRing
+
+KEYS = [f'key{i}' for i in range(20000)]
+
+def test_keys_are_spread_evenly():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    counts = {}
+    for key in KEYS:
+        node = ring.get_node(key)
+        counts[node] = counts.get(node, 0) + 1
+    assert sorted(counts) == ['a', 'b', 'c', 'd']
+    assert max(counts.values()) < 1.25 * len(KEYS) / 4
+
+def test_placement_does_not_depend_on_node_order():
+    first, second = HashRing(['a', 'b', 'c']), HashRing(['c', 'a', 'b'])
+    assert all(first.get_node(key) == second.get_node(key) for key in KEYS)
+
+def test_adding_a_node_moves_about_one_nth_of_the_keys():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    before = {key: ring.get_node(key) for key in KEYS}
+    ring.add_node('e')
+    moved = [key for key in KEYS if ring.get_node(key) != before[key]]
+    assert all(ring.get_node(key) == 'e' for key in moved)
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    before = {key: ring.get_node(key) for key in KEYS}
+    ring.remove_node('b')
+    assert all(ring.get_node(key) == node for key, node in before.items() if node != 'b')
+    assert 'b' not in ring and len(ring) == 3
+
+def test_invalid_rings():
+    with pytest.raises(LookupError):
+        HashRing().get_node('key')
+    with pytest.raises(ValueError):
+        HashRing(['a', 'a'])
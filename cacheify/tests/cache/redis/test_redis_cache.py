@@ -1,11 +1,14 @@
 import pytest
 import threading, time
 from collections.abc import Iterable
+from redis import Redis
+from cacheify.cache.cacheable import MISSING
 from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.serializers import CacheCodec
 
-@pytest.fixture
-def cache() -> RedisCache:
-    return RedisCache()
+@pytest.fixture(params=['atomic', 'optimistic', 'redlock'])
+def cache(request) -> RedisCache:
+    return RedisCache(consistency=request.param)
 
 def test_set_and_get(cache: RedisCache):
     cache.set('key1', 'value1')
@@ -49,7 +52,16 @@ def test_keys(cache: RedisCache):
     assert 'key5' in keys
     assert 'key6' in keys
 
-@pytest.mark.filterwarnings("ignore::pottery.exceptions.InefficientAccessWarning")
+@pytest.mark.parametrize('read', [RedisCache.keys, RedisCache.items, len])
+def test_whole_cache_reads_take_the_redlock(read):
+    cache = RedisCache(consistency='redlock')
+    with cache.redlock:
+        reader = threading.Thread(target=read, args=(cache,))
+        reader.start()
+        reader.join(0.3)
+        assert reader.is_alive()
+    reader.join()
+
 def test_values(cache: RedisCache):
     cache.set('key7', 'value7')
     cache.set('key8', 'value8')
@@ -99,7 +111,6 @@ def test_items_empty_cache(cache: RedisCache):
     items = cache.items()
     assert len(items) == 0
 
-@pytest.mark.filterwarnings("ignore::pottery.exceptions.InefficientAccessWarning")
 def test_iter(cache: RedisCache):
     cache.set('key14', 'value14')
     cache.set('key15', 'value15')
@@ -126,4 +137,349 @@ def test_thread_safety(cache: RedisCache):
         thread.join()
 
     for i in range(100):
-        assert cache.get(f'key{i}') == f'value{i}'
\ No newline at end of file
+        assert cache.get(f'key{i}') == f'value{i}'
+
+def test_set_with_ttl_does_not_expire_other_entries(cache: RedisCache):
+    cache.clear()
+    cache.set('key_short', 'value_short', ttl=1)
+    cache.set('key_long', 'value_long')
+    time.sleep(1.5)
+    assert cache.get('key_short') is None
+    assert cache.get('key_long') == 'value_long'
+    assert len(cache) == 1
+
+def test_set_without_ttl_persists_overwritten_entry(cache: RedisCache):
+    cache.set('key18', 'value18', ttl=1)
+    cache.set('key18', 'new_value18')
+    time.sleep(1.5)
+    assert cache.get('key18') == 'new_value18'
+
+def test_sub_millisecond_and_negative_ttls_expire(cache: RedisCache):
+    cache.set('key_tiny', 'value', ttl=0.0004)
+    cache.set('key_negative', 'value', ttl=-1)
+    cache.set_many({'key_many': 'value'}, ttl=-1)
+    time.sleep(0.01)
+    assert cache.get('key_tiny') is None
+    assert cache.get('key_negative') is None
+    assert cache.get('key_many') is None
+
+def test_ttls(cache: RedisCache):
+    cache.clear()
+    cache.set('short', 1, ttl=10)
+    cache.set('forever', 2)
+    assert cache._ttls(['short', 'forever', 'missing']) == [pytest.approx(10, abs=0.5), None, MISSING]
+    cache.expire(5)
+    assert cache._ttls(['short', 'forever']) == [pytest.approx(5, abs=0.5), pytest.approx(5, abs=0.5)]
+    cache.clear()
+
+def test_expire_single_key(cache: RedisCache):
+    cache.set('key19', 'value19')
+    cache.set('key20', 'value20')
+    assert cache.expire(1, key='key19') is True
+    assert cache.expire(1, key='missing_key') is False
+    time.sleep(1.5)
+    assert cache.get('key19') is None
+    assert cache.get('key20') == 'value20'
+    assert 'key19' not in cache.keys()
+
+def test_pop_missing_key_raises(cache: RedisCache):
+    with pytest.raises(KeyError):
+        cache.pop('missing_key')
+
+def test_invalid_consistency_mode():
+    with pytest.raises(ValueError, match='Invalid consistency mode'):
+        RedisCache(consistency='eventual')
+
+def test_lock_critical_section(cache: RedisCache):
+    cache.set('key21', 1)
+    cache.set('key22', 2)
+    with cache.lock('transfer'):
+        first, second = cache.get('key21'), cache.get('key22')
+        cache.set('key21', first - 1)
+        cache.set('key22', second + 1)
+    assert cache.get('key21') == 0
+    assert cache.get('key22') == 3
+
+def test_get_many_keeps_input_order(cache: RedisCache):
+    cache.delete_many(['bulk1', 'bulk2', 'bulk_missing'])
+    cache.set('bulk1', 'value1')
+    cache.set('bulk2', None)
+    assert cache.get_many(['bulk2', 'bulk_missing', 'bulk1']) == [None, MISSING, 'value1']
+    assert cache.get_many(['bulk_missing'], default='fallback') == ['fallback']
+    assert cache.get_many([]) == []
+
+def test_set_many_and_delete_many(cache: RedisCache):
+    cache.set_many({'bulk3': 'value3', 'bulk4': [1, 2]})
+    assert cache.get_many(['bulk3', 'bulk4']) == ['value3', [1, 2]]
+    assert cache.delete_many(['bulk3', 'bulk4', 'bulk_missing']) == 2
+    assert cache.get_many(['bulk3', 'bulk4']) == [MISSING, MISSING]
+
+def test_set_many_with_per_key_ttl(cache: RedisCache):
+    cache.set_many({'bulk5': 'value5', 'bulk6': 'value6'}, ttl={'bulk5': 1})
+    time.sleep(1.5)
+    assert cache.get_many(['bulk5', 'bulk6']) == [MISSING, 'value6']
+
+@pytest.mark.parametrize('consistency', ['atomic', 'optimistic', 'redlock'])
+def test_serializer(consistency):
+    cache = RedisCache(key='serialized', consistency=consistency, serializer=CacheCodec('json', compression='zlib'))
+    large = {'text': 'x' * 20000}
+    cache.set_many({'small': [1, 2], 'large': large})
+    assert cache.get('large') == large
+    assert cache.get_many(['small', 'missing']) == [[1, 2], MISSING]
+    assert cache.pop('small') == [1, 2]
+    assert len(cache.masters[0].hget('serialized', 'large')) < 1000
+    cache.clear()
+
+def test_serializer_reads_plain_json():
+    RedisCache(key='serialized').set('legacy', {'a': 1})
+    assert RedisCache(key='serialized', serializer='json').get('legacy') == {'a': 1}
+    RedisCache(key='serialized').clear()
+
+def test_serializer_requires_binary_client():
+    client = Redis.from_url('redis://localhost:6379/0', decode_responses=True)
+    with pytest.raises(ValueError):
+        RedisCache(key='serialized', masters=[client], serializer='json')
+
+def test_set_bytes_and_get_bytes(cache: RedisCache):
+    blob = bytes(range(256)) * 100  # Not valid UTF-8
+    cache.set_bytes('blob', blob)
+    cache.set_bytes('view', memoryview(bytearray(b'proto')), ttl=1)
+    assert cache.get_bytes('blob') == blob
+    assert cache.get_bytes('view') == b'proto'
+    assert cache.get_bytes('missing') is None
+    time.sleep(1.5)
+    assert cache.get_bytes('view') is None
+    cache.delete_many(['blob'])  # Raw entries are not JSON, keep them out of the shared hash
+
+def test_get_bytes_with_decoding_client():
+    client = Redis.from_url('redis://localhost:6379/0', decode_responses=True)
+    cache = RedisCache(key='raw', masters=[client])
+    cache.set_bytes('blob', b'\xff\x00raw')
+    assert cache.get_bytes('blob') == b'\xff\x00raw'
+    cache.set('text', 'value')
+    assert cache.get('text') == 'value'
+    cache.clear()
+
+def test_iter_keys_and_items(cache: RedisCache):
+    scanned = RedisCache(key='scanned', consistency=cache.consistency)
+    scanned.clear()
+    scanned.set_many({f'key{i}': [i] for i in range(1500)})
+    scanned.set_many({'short1': 1, 'short2': 2}, ttl=1)
+    time.sleep(1.5)
+    assert sorted(set(scanned.iter_keys(count=100))) == sorted(f'key{i}' for i in range(1500))
+    assert dict(scanned.iter_items(count=100)) == {f'key{i}': [i] for i in range(1500)}
+    cursor, first_page = scanned.scan_keys(count=100)
+    assert cursor and first_page
+    rest = list(scanned.iter_keys(count=100, cursor=cursor))
+    assert set(first_page + rest) == set(scanned.keys())
+    assert set(scanned) == set(scanned.keys())
+    scanned.clear()
+
+@pytest.mark.parametrize('consistency', ['atomic', 'redlock'])
+def test_max_entries_evicts_least_recently_used(consistency):
+    cache = RedisCache(key='bounded', consistency=consistency, max_entries=3)
+    cache.clear()
+    cache.set_many({'a': 1, 'b': 2, 'c': 3})
+    cache.get('a')
+    cache.set('d', 4)
+    assert sorted(cache.keys()) == ['a', 'c', 'd']
+    assert cache.masters[0].hget('bounded:stats', 'evictions') == b'1'
+    cache.clear()
+
+def test_max_entries_evicts_least_frequently_used():
+    cache = RedisCache(key='bounded', max_entries=3, eviction='lfu')
+    cache.clear()
+    cache.set_many({'a': 1, 'b': 2, 'c': 3})
+    cache.get_many(['a', 'b'])
+    cache.set('d', 4)
+    cache.get('d')
+    cache.set('e', 5)  # The new entry is spared although it is the least used one
+    assert sorted(cache.keys()) == ['b', 'd', 'e']
+    cache.clear()
+
+def test_max_bytes_accounts_serialized_sizes():
+    cache = RedisCache(key='bounded', max_bytes=100)
+    cache.clear()
+    cache.set('a', 'x' * 40)  # 1 + 42 bytes
+    cache.set('b', 'y' * 40)
+    assert cache.masters[0].hget('bounded:stats', 'bytes') == b'86'
+    cache.set('c', 'z' * 40)
+    assert sorted(cache.keys()) == ['b', 'c']
+    cache.pop('b')
+    cache.set('short', 1, ttl=1)
+    time.sleep(1.5)
+    cache.set('d', 'w' * 200)  # Larger than the limit: evicted right away
+    assert cache.keys() == ['c']
+    assert cache.masters[0].hget('bounded:stats', 'bytes') == b'43'
+    cache.clear()
+
+def test_bounded_cache_rejects_optimistic_mode():
+    with pytest.raises(ValueError):
+        RedisCache(key='bounded', max_entries=10, consistency='optimistic')
+    with pytest.raises(ValueError):
+        RedisCache(key='bounded', max_bytes=0)
+
+def test_get_or_set_and_add(cache: RedisCache):
+    cache.clear()
+    assert cache.get_or_set('key', {'a': 1}, ttl=60) == {'a': 1}
+    assert cache.get_or_set('key', 'other') == {'a': 1}
+    assert not cache.add('key', 'other')
+    cache.set('short', 1, ttl=0.5)
+    time.sleep(0.6)
+    assert cache.add('short', 2)  # An expired entry counts as missing
+    assert cache.get('short') == 2
+
+def test_compare_and_set(cache: RedisCache):
+    cache.clear()
+    assert cache.get_with_version('key') == (None, None)
+    assert cache.compare_and_set('key', [1], None)
+    assert not cache.compare_and_set('key', [1], None)
+    value, version = cache.get_with_version('key')
+    cache.set('key', [2])
+    assert not cache.compare_and_set('key', value + [3], version)
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', value + [3], version)
+    assert cache.get('key') == [2, 3]
+
+def test_compare_and_set_detects_identical_overwrites(cache: RedisCache):
+    cache.clear()
+    cache.set('key', [1])
+    value, version = cache.get_with_version('key')
+    assert cache.get_with_version('key')[1].token == version.token  # Reads do not change the version
+    cache.set('key', [1])  # Same payload, but a new write
+    assert not cache.compare_and_set('key', value + [2], version)
+    cache.pop('key')
+    cache.set('key', [1])
+    assert not cache.compare_and_set('key', value + [2], version)
+    value, version = cache.get_with_version('key')
+    cache.delete_many(['key'])
+    assert not cache._redis.hexists(cache._keys[2], 'v:key')  # Deletions drop the version
+    assert not cache.compare_and_set('key', value + [2], version)
+    cache.clear()
+    cache.set('key', [1])
+    value, version = cache.get_with_version('key')
+    cache.clear()  # Resets the counter the versions are taken from
+    cache.set('key', [1])
+    cache.get_with_version('key')
+    assert not cache.compare_and_set('key', value + [2], version)
+
+def test_incr_and_decr(cache: RedisCache):
+    cache.clear()
+    assert cache.incr('counter', ttl=0.5) == 1
+    assert cache.incr('counter', 5) == 6
+    assert cache.decr('counter', 2) == 4
+    assert cache.get('counter') == 4
+    time.sleep(0.6)
+    assert cache.incr('counter') == 1
+    cache.set('text', 'a')
+    with pytest.raises(TypeError):
+        cache.incr('text')
+
+def test_concurrent_incr(cache: RedisCache):
+    cache.clear()
+
+    def worker():
+        for _ in range(50):
+            cache.incr('counter')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('counter') == 200
+
+def test_atomic_operations_with_serializer():
+    cache = RedisCache(key='test:codec', serializer=CacheCodec('json', compression='zlib'))
+    cache.clear()
+    assert cache.incr('counter', 2) == 2
+    assert cache.get('counter') == 2
+    value, version = cache.get_with_version('missing')
+    assert cache.compare_and_set('key', 'value', version)
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', value * 2, version)
+    assert cache.get('key') == 'valuevalue'
+    cache.clear()
+
+def test_incr_counter_encoded_by_serializer():
+    cache = RedisCache(key='test:codec', serializer=CacheCodec('json', compression='zlib'))
+    cache.clear()
+    cache.set('counter', 5, ttl=60)
+    assert cache.incr('counter', 2) == 7
+    assert cache.decr('counter') == 6
+    assert cache.get('counter') == 6
+    assert 0 < cache._ttls(['counter'])[0] <= 60  # The TTL of the counter is kept
+    cache.set('text', 'a')
+    with pytest.raises(TypeError):
+        cache.incr('text')
+
+    def worker():
+        for _ in range(25):
+            cache.incr('counter')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('counter') == 106
+    cache.clear()
+
+def test_atomic_operations_on_bounded_cache():
+    cache = RedisCache(key='bounded', max_entries=2)
+    cache.clear()
+    cache.preload_scripts()
+    assert cache.incr('a') == 1
+    assert cache.add('b', 'x' * 10)
+    assert cache.get_or_set('c', 3) == 3
+    assert sorted(cache.keys()) == ['b', 'c']
+    assert cache.masters[0].hget('bounded:stats', 'evictions') == b'1'
+    assert cache.masters[0].zcard('bounded:usage') == 2
+    cache.clear()
+
+def test_invalidate_tags(cache: RedisCache):
+    cache.clear()
+    cache.set('user:1', 'a', tags=['user:1', 'team:1'])
+    cache.set('user:2', 'b', ttl=60, tags=['user:2', 'team:1'])
+    cache.set('user:3', 'c', tags=['user:3'])
+    assert cache.invalidate_tags(['team:1', 'unknown']) == 2
+    assert cache.keys() == ['user:3']
+    assert not cache.masters[0].exists(f'cache:tag:{cache._generation}:team:1')
+
+def test_tag_sets_expire_with_their_entries(cache: RedisCache):
+    cache.clear()
+    client = cache.masters[0]
+    cache.set('short', 1, ttl=0.2, tags=['tag'])
+    tag_set = f'cache:tag:{cache._generation}:tag'
+    cache.set('long', 2, ttl=60, tags=['tag'])
+    assert 59000 < client.pttl(tag_set) <= 60000
+    time.sleep(0.3)
+    cache.set('other', 3, ttl=30, tags=['tag'])
+    assert client.zrange(tag_set, 0, -1) == [b'other', b'long']
+    cache.set('forever', 4, tags=['tag'])
+    assert client.pttl(tag_set) == -1
+    cache.clear()
+
+def test_invalidate_prefix(cache: RedisCache):
+    cache.clear()
+    cache.set_many({f'user:{i}': i for i in range(30)})
+    cache.set('user*', 'literal')
+    assert cache.invalidate_prefix('user:', count=10) == 30
+    assert cache.keys() == ['user*']
+    cache.clear()
+
+def test_clear_bumps_the_generation_of_tags(cache: RedisCache):
+    cache.clear()
+    other = RedisCache(key='cache')
+    other.set('a', 1, tags=['tag'])
+    old_tag_set = f'cache:tag:{other._generation}:tag'
+    cache.clear()
+    other.set('b', 2, tags=['tag'])  # Retried on the tag set of the new generation
+    assert other._generation == cache._generation
+    assert cache.invalidate_tags(['tag']) == 1
+    assert other.get('b') is None
+    deadline = time.monotonic() + 2
+    while cache.masters[0].exists(old_tag_set) and time.monotonic() < deadline:
+        time.sleep(0.02)  # Deleted by the background reclaim
+    assert not cache.masters[0].exists(old_tag_set)
+    assert cache.reclaim() == 0
@@ -0,0 +1,66 @@
+import time
+import fakeredis
+import pytest
+from redis.cluster import RedisCluster
+from redis.crc import key_slot
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.redis.replicas import ReplicaRouter, replication_lag
+
+class InfoStandIn:
+    """Answers `INFO replication` like a Redis node would, since fakeredis does not implement INFO."""
+
+    def __init__(self, info):
+        self._info = info
+
+    def info(self, section):
+        return self._info
+
+def make_client():
+    return fakeredis.FakeStrictRedis(server=fakeredis.FakeServer())
+
+def test_replication_lag():
+    assert replication_lag(InfoStandIn({'role': 'master'})) == 0
+    assert replication_lag(InfoStandIn({'role': 'slave', 'master_link_status': 'up', 'master_last_io_seconds_ago': 3})) == 3
+    assert replication_lag(InfoStandIn({'role': 'slave', 'master_link_status': 'down'})) is None
+    assert replication_lag(make_client()) is None  # INFO is not supported by fakeredis
+
+def test_reads_go_to_fresh_replicas():
+    master, replica = make_client(), make_client()
+    lags = {id(replica): 0.5}
+    router = ReplicaRouter([replica], max_staleness=1, check_interval=0, lag_probe=lambda client: lags[id(client)])
+    cache = RedisCache(key='replicated', masters=[master], replicas=router)
+    cache.set('key', 'from master')
+    # Populate the stand-in replica with a different value, to tell which node served the read
+    RedisCache(key='replicated', masters=[replica]).set('key', 'from replica')
+    assert cache.get('key') == 'from replica'
+    assert cache.get_many(['key', 'missing']) == ['from replica', MISSING]
+    assert list(cache.iter_items()) == [('key', 'from replica')]
+    lags[id(replica)] = 5
+    assert cache.get('key') == 'from master'
+    assert cache.get_bytes('key') == b'"from master"'
+
+def test_replica_reads_do_not_write():
+    client = make_client()
+    cache = RedisCache(key='replicated', masters=[client],
+                       replicas=ReplicaRouter([client], lag_probe=lambda client: 0))
+    cache.set('key', 'value', ttl=1)
+    time.sleep(1.5)
+    assert cache.get('key') is None
+    assert cache.get_many(['key']) == [MISSING]
+    assert client.hexists('replicated', 'key')
+    assert len(cache) == 0  # The master reaps it
+
+def test_hash_tag_keeps_the_cache_in_one_slot():
+    client = make_client()
+    cache = RedisCache(key='tagged', masters=[client], hash_tag=True)
+    cache.set('key', 'value', ttl=60)
+    assert client.exists('{tagged}', '{tagged}:expires') == 2
+    assert key_slot(b'{tagged}') == key_slot(b'{tagged}:expires') == key_slot(b'{tagged}:lock:key')
+    with cache.lock('key'):
+        assert cache.get('key') == 'value'
+
+def test_cluster_requires_atomic_consistency():
+    cluster = RedisCluster.__new__(RedisCluster)  # A stand-in: isinstance checks only, never connected
+    with pytest.raises(ValueError):
+        RedisCache(masters=[cluster], consistency='optimistic')
@@ -0,0 +1,93 @@
+import time
+import fakeredis
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.redis.sharded_redis_cache import ShardedRedisCache
+
+def make_shards(count: int) -> dict:
+    return {f'shard{i}': fakeredis.FakeStrictRedis(server=fakeredis.FakeServer()) for i in range(count)}
+
+@pytest.fixture
+def cache():
+    cache = ShardedRedisCache(key='sharded', shards=make_shards(3))
+    yield cache
+    cache.close()
+
+def test_set_and_get(cache: ShardedRedisCache):
+    cache.set('key1', {'a': 1}, ttl=60)
+    assert cache.get('key1') == {'a': 1}
+    assert cache.get_shard('key1').get('key1') == {'a': 1}
+    assert cache.pop('key1') == {'a': 1}
+    assert cache.get('key1') is None
+
+def test_entries_are_spread_over_shards(cache: ShardedRedisCache):
+    cache.set_many({f'key{i}': i for i in range(300)})
+    sizes = [len(shard) for shard in cache.shards.values()]
+    assert sum(sizes) == len(cache) == 300
+    assert all(size > 50 for size in sizes)
+
+def test_bulk_operations(cache: ShardedRedisCache):
+    cache.set_many({f'key{i}': i for i in range(100)}, ttl={'key0': 1})
+    keys = ['key5', 'missing', 'key42', 'key5']
+    assert cache.get_many(keys) == [5, MISSING, 42, 5]
+    time.sleep(1.5)
+    assert cache.get_many(['key0', 'key1'], default=None) == [None, 1]
+    assert cache.delete_many(['key1', 'key2', 'missing']) == 2
+    assert sorted(cache.keys()) == sorted(f'key{i}' for i in range(3, 100))
+
+def test_scan_covers_every_shard(cache: ShardedRedisCache):
+    cache.set_many({f'key{i}': i for i in range(500)})
+    assert dict(cache.iter_items(count=50)) == {f'key{i}': i for i in range(500)}
+    assert sorted(set(cache)) == sorted(f'key{i}' for i in range(500))
+
+def test_add_and_remove_shards(cache: ShardedRedisCache):
+    keys = [f'key{i}' for i in range(1000)]
+    cache.set_many({key: key for key in keys})
+    cache.add_shard('shard3', fakeredis.FakeStrictRedis(server=fakeredis.FakeServer()))
+    hits = sum(value is not MISSING for value in cache.get_many(keys))
+    assert 0.65 < hits / len(keys) < 0.85
+    cache.remove_shard('shard3')
+    assert cache.get_many(keys) == keys
+
+def test_clear_and_expire_all(cache: ShardedRedisCache):
+    cache.set_many({f'key{i}': i for i in range(30)})
+    cache.clear()
+    assert len(cache) == 0
+    cache.set_many({f'key{i}': i for i in range(30)})
+    assert cache.expire(1)
+    time.sleep(1.5)
+    assert len(cache) == 0
+
+def test_lock(cache: ShardedRedisCache):
+    with cache.lock('resource'):
+        cache.set('key', 1)
+    assert cache.get('key') == 1
+
+def test_shards_need_unique_names():
+    client = fakeredis.FakeStrictRedis(server=fakeredis.FakeServer())
+    with pytest.raises(ValueError):
+        ShardedRedisCache(shards=[client, client])
+    with pytest.raises(ValueError):
+        ShardedRedisCache(shards=[])
+
+def test_atomic_operations(cache: ShardedRedisCache):
+    for i in range(10):
+        assert cache.incr(f'counter{i}', i) == i
+        assert cache.add(f'key{i}', i)
+    value, version = cache.get_with_version('key3')
+    assert cache.compare_and_set('key3', value + 1, version)
+    assert cache.get_or_set('key3', 0) == 4
+
+def test_invalidate_tags_and_prefix(cache: ShardedRedisCache):
+    for i in range(30):
+        cache.set(f'user:{i}', i, tags=['even' if i % 2 == 0 else 'odd'])
+    assert cache.invalidate_tags(['even']) == 15
+    assert cache.invalidate_prefix('user:1') == 6
+    assert len(cache) == 9
+
+def test_read_replicas_are_forwarded_to_shards():
+    replica = fakeredis.FakeStrictRedis(server=fakeredis.FakeServer())
+    cache = ShardedRedisCache(key='sharded', shards=make_shards(2), points_per_shard=8, replicas=[replica])
+    assert all(shard._replicas is not None for shard in cache.shards.values())
+    assert len(cache._topology[0]._points) == 16
+    cache.close()
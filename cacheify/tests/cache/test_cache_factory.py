@@ -1,7 +1,18 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
 import pytest
+from cacheify.cache import cache_factory
 from cacheify.cache.cache_factory import CacheifyFactory
 from cacheify.cache.local.local_cache import LocalCache
 from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.local.async_local_cache import AsyncLocalCache
+from cacheify.cache.redis.async_redis_cache import AsyncRedisCache
+from cacheify.cache.tiered.tiered_cache import TieredCache
+from cacheify.cache.redis.sharded_redis_cache import ShardedRedisCache
+from cacheify.cache.local.shared_cache import SharedMemoryCache
+from cacheify.cache.disk.disk_cache import DiskCache
 
 def test_get_local_cache_with_custom_key():
     factory = CacheifyFactory(cache_type='local')
@@ -17,7 +28,92 @@ def test_get_redis_cache_with_custom_key():
     assert isinstance(cache, RedisCache)
     assert cache.key == 'custom_redis_key'
 
+def test_get_tiered_cache_with_custom_key():
+    factory = CacheifyFactory(cache_type='tiered')
+    cache = factory.get_cache(config={'key': 'custom_tiered_key', 'l1_max_entries': 100})
+    assert isinstance(cache, TieredCache)
+    assert cache.key == 'custom_tiered_key'
+    cache.close()
+
+def test_get_sharded_cache():
+    factory = CacheifyFactory(cache_type='sharded')
+    cache = factory.get_cache(config={'key': 'custom_sharded_key', 'shards': ['redis://localhost:6379/0', 'redis://localhost:6379/1']})
+    assert isinstance(cache, ShardedRedisCache)
+    assert sorted(cache.shards) == ['localhost:6379/0', 'localhost:6379/1']
+
+def test_get_cache_with_serializer():
+    cache = CacheifyFactory(cache_type='local').get_cache(config={'key': 'serialized'}, serializer='pickle')
+    cache.set('key', (1, 2))
+    assert cache.get('key') == (1, 2)
+
 def test_invalid_cache_type():
     factory = CacheifyFactory(cache_type='invalid')
     with pytest.raises(ValueError, match='Invalid cache type'):
-        factory.get_cache()
\ No newline at end of file
+        factory.get_cache()
+
+def test_get_async_local_cache():
+    factory = CacheifyFactory(cache_type='local')
+    cache = factory.get_async_cache(config={'key': 'custom_async_local_key'})
+    assert isinstance(cache, AsyncLocalCache)
+    assert cache.key == 'custom_async_local_key'
+
+def test_get_async_redis_cache():
+    factory = CacheifyFactory(cache_type='redis')
+    cache = factory.get_async_cache(config={'key': 'custom_async_redis_key'})
+    assert isinstance(cache, AsyncRedisCache)
+    assert cache.key == 'custom_async_redis_key'
+
+def test_invalid_async_cache_type():
+    factory = CacheifyFactory(cache_type='invalid')
+    with pytest.raises(ValueError, match='Invalid cache type'):
+        factory.get_async_cache()
+
+def test_get_shared_cache(tmp_path):
+    cache = CacheifyFactory(cache_type='shared').get_cache(config={'key': 'custom_shared_key', 'path': str(tmp_path / 'cache')})
+    assert isinstance(cache, SharedMemoryCache)
+    assert cache.key == 'custom_shared_key'
+    cache.close()
+
+def test_get_disk_cache(tmp_path):
+    cache = CacheifyFactory(cache_type='disk').get_cache(config={'key': 'custom_disk_key', 'path': str(tmp_path / 'cache.sqlite')})
+    assert isinstance(cache, DiskCache)
+    assert cache.key == 'custom_disk_key'
+    cache.close()
+
+def test_importing_the_factory_does_not_import_backends():
+    code = 'import sys, cacheify.cache.cache_factory; print(sorted({"redis", "pottery", "cachetools"} & set(sys.modules)))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)})
+    assert result.stdout.strip() == '[]'
+
+def test_register_backend_by_path(monkeypatch):
+    monkeypatch.setitem(CacheifyFactory._backends, 'memory', 'cacheify.cache.local.local_cache:LocalCache')
+    cache = CacheifyFactory(cache_type='memory').get_cache(config={'key': 'registered'})
+    assert isinstance(cache, LocalCache)
+    assert cache.key == 'registered'
+
+def test_register_backend_callable(monkeypatch):
+    monkeypatch.setattr(CacheifyFactory, '_backends', dict(CacheifyFactory._backends))
+    CacheifyFactory.register('bounded', lambda **config: LocalCache(max_entries=10, **config))
+    cache = CacheifyFactory(cache_type='bounded').get_cache(config={'key': 'bounded'})
+    assert isinstance(cache, LocalCache)
+    assert 'bounded' in CacheifyFactory.backends()
+
+def test_register_async_backend(monkeypatch):
+    monkeypatch.setattr(CacheifyFactory, '_async_backends', dict(CacheifyFactory._async_backends))
+    CacheifyFactory.register('memory', AsyncLocalCache, asynchronous=True)
+    assert isinstance(CacheifyFactory(cache_type='memory').get_async_cache(), AsyncLocalCache)
+    with pytest.raises(ValueError, match='Invalid cache type'):
+        CacheifyFactory(cache_type='memory').get_cache()
+
+def test_backends_lists_builtins():
+    assert {'local', 'redis', 'tiered', 'sharded', 'shared', 'disk'} <= set(CacheifyFactory.backends())
+    assert {'local', 'redis'} <= set(CacheifyFactory.backends(asynchronous=True))
+
+def test_discover_entry_point_backends(monkeypatch):
+    entry_point = SimpleNamespace(name='plugin', value='cacheify.cache.disk.disk_cache:DiskCache')
+    monkeypatch.setattr(cache_factory, '_entry_points', lambda group: [entry_point] if group == cache_factory.ENTRY_POINT_GROUP else [])
+    monkeypatch.setattr(CacheifyFactory, '_backends', dict(CacheifyFactory._backends))
+    monkeypatch.setattr(CacheifyFactory, '_discovered', dict.fromkeys(CacheifyFactory._discovered, False))
+    assert CacheifyFactory.backends().count('plugin') == 1
+    assert CacheifyFactory._backends['plugin'] == 'cacheify.cache.disk.disk_cache:DiskCache'
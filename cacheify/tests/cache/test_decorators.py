@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+import pytest
+from cacheify import cached
+from cacheify.cache.decorators import make_key
+from cacheify.cache.local.async_local_cache import AsyncLocalCache
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.metrics import CacheMetrics
+from cacheify.cache.redis.async_redis_cache import AsyncRedisCache
+from cacheify.cache.redis.redis_cache import RedisCache
+
+def add(a, b=1):
+    return a + b
+
+def test_make_key_is_deterministic():
+    assert make_key(add, (1,), {}) == make_key(add, (), {'a': 1, 'b': 1})
+    assert make_key(add, (1,), {}) != make_key(add, (2,), {})
+    assert make_key(add, ({'x': 1, 'y': 2},), {}) == make_key(add, ({'y': 2, 'x': 1},), {})
+
+def test_make_key_leaves_out_the_receiver():
+    class Repository:
+        def load(self, x):
+            return x
+
+    assert make_key(Repository.load, (Repository(), 1), {}) == make_key(Repository.load, (Repository(), 1), {})
+    assert make_key(Repository.load, (Repository(), 1), {}) != make_key(Repository.load, (Repository(), 2), {})
+
+def test_make_key_rejects_arguments_without_stable_repr():
+    with pytest.raises(TypeError, match='key_fn'):
+        make_key(add, (object(),), {})
+
+def test_make_key_with_mixed_dictionary_keys():
+    assert make_key(add, ({1: 'a', 'b': 2},), {}) == make_key(add, ({'b': 2, 1: 'a'},), {})
+    assert make_key(add, ({(1, 2): 'a'},), {}) != make_key(add, ({(1, 3): 'a'},), {})
+
+def test_cached_memoizes_results():
+    calls = []
+
+    @cached(LocalCache(), ttl=60)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert square(3) == 9
+    assert square(4) == 16
+    assert calls == [3, 4]
+
+def test_cached_memoizes_none():
+    calls = []
+
+    @cached(LocalCache())
+    def nothing():
+        calls.append(1)
+
+    assert nothing() is None
+    assert nothing() is None
+    assert len(calls) == 1
+
+def test_cached_with_custom_key_fn():
+    cache = LocalCache()
+
+    @cached(cache, key_fn=lambda user_id: f'user:{user_id}')
+    def load_user(user_id):
+        return {'id': user_id}
+
+    load_user(7)
+    assert cache.get('user:7')[0] == {'id': 7}
+
+@pytest.mark.parametrize('cache', [LocalCache(), RedisCache(key='decorator_cache')], ids=['local', 'redis'])
+def test_cached_single_flight(cache):
+    cache.clear()
+    calls = []
+
+    @cached(cache, ttl=60)
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x
+
+    threads = [threading.Thread(target=slow, args=(1,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+
+def test_cached_returns_the_value_when_the_lock_expired():
+    cache = RedisCache(key='decorator_cache')
+    cache.clear()
+
+    @cached(cache, lock_timeout=0.1)
+    def slow(x):
+        time.sleep(0.3)
+        return x
+
+    assert slow(1) == 1
+    assert cache.get(make_key(slow.__wrapped__, (1,), {}))[0] == 1
+
+def test_cached_refreshes_early_near_expiration():
+    calls = []
+
+    # A huge beta makes the probabilistic early refresh certain
+    @cached(LocalCache(), ttl=60, beta=1e9)
+    def compute():
+        calls.append(1)
+        time.sleep(0.01)
+        return len(calls)
+
+    assert compute() == 1
+    assert compute() == 2
+
+def test_cached_serves_stale_while_refreshing():
+    calls = []
+    release = threading.Event()
+    metrics = CacheMetrics('stale')
+
+    @cached(LocalCache(), ttl=0.2, stale_ttl=60, beta=0)
+    def compute():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return len(calls)
+
+    compute.refresher.metrics = metrics
+    assert compute() == 1
+    time.sleep(0.3)
+    started = time.perf_counter()
+    assert [compute() for _ in range(5)] == [1] * 5  # Stale values returned at once, one refresh scheduled
+    assert time.perf_counter() - started < 0.1
+    assert compute.refresher.pending == 1
+    assert metrics.stats()['refresh_queue'] == 1
+    release.set()
+    compute.refresher.close()
+    assert compute() == 2
+    assert len(calls) == 2
+    stats = metrics.stats()
+    assert stats['refresh_queue'] == 0
+    assert stats['operations']['refresh']['count'] == 1
+
+def test_cached_keeps_stale_value_when_refresh_fails():
+    errors = []
+    failing = threading.Event()
+
+    @cached(LocalCache(), ttl=0.2, stale_ttl=0.5, beta=0)
+    def compute():
+        if failing.is_set():
+            raise RuntimeError('database down')
+        return 'value'
+
+    compute.refresher.on_error = lambda key, error: errors.append(error)
+    assert compute() == 'value'
+    failing.set()
+    time.sleep(0.3)
+    assert compute() == 'value'
+    compute.refresher.close()
+    assert compute.refresher.stats()['failures'] == 1
+    assert isinstance(errors[0], RuntimeError)
+    time.sleep(0.5)
+    with pytest.raises(RuntimeError):
+        compute()  # Past the hard TTL, the caller recomputes
+
+def test_cached_stale_ttl_requires_ttl():
+    with pytest.raises(ValueError, match='stale_ttl'):
+        cached(LocalCache(), stale_ttl=10)
+
+@pytest.mark.asyncio
+async def test_cached_coroutine_serves_stale_while_refreshing():
+    calls = []
+
+    @cached(AsyncLocalCache(), ttl=0.2, stale_ttl=60, beta=0)
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    assert await fetch() == 1
+    await asyncio.sleep(0.3)
+    assert await asyncio.gather(fetch(), fetch(), fetch()) == [1, 1, 1]
+    await fetch.refresher.close()
+    assert await fetch() == 2
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_cached_coroutine_single_flight():
+    calls = []
+
+    @cached(AsyncLocalCache(), ttl=60)
+    async def fetch(x):
+        calls.append(x)
+        await asyncio.sleep(0.1)
+        return x * 2
+
+    results = await asyncio.gather(*(fetch(5) for _ in range(10)))
+    assert results == [10] * 10
+    assert calls == [5]
+
+@pytest.mark.asyncio
+async def test_cached_coroutine_returns_the_value_when_the_lock_expired():
+    cache = AsyncRedisCache(key='async_decorator_cache')
+    await cache.clear()
+
+    @cached(cache, lock_timeout=0.1)
+    async def slow(x):
+        await asyncio.sleep(0.3)
+        return x
+
+    assert await slow(1) == 1
+    assert (await cache.get(make_key(slow.__wrapped__, (1,), {})))[0] == 1
+
+@pytest.mark.asyncio
+async def test_cached_coroutine_with_sync_cache():
+    calls = []
+
+    @cached(LocalCache())
+    async def fetch(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x
+
+    assert await asyncio.gather(fetch(1), fetch(1)) == [1, 1]
+    assert calls == [1]
+
+@pytest.mark.asyncio
+async def test_cached_coroutine_calls_sync_cache_off_the_event_loop():
+    loop_thread = threading.current_thread()
+    threads = []
+
+    class RecordingCache(LocalCache):
+        def get_many(self, keys):
+            threads.append(threading.current_thread())
+            return super().get_many(keys)
+
+        def set(self, key, value, ttl=None, tags=None):
+            threads.append(threading.current_thread())
+            super().set(key, value, ttl, tags)
+
+    @cached(RecordingCache())
+    async def fetch(x):
+        return x
+
+    assert await fetch(1) == 1
+    assert threads and loop_thread not in threads
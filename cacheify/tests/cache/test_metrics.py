@@ -0,0 +1,148 @@
+import socket
+import pytest
+from cacheify.cache.exporters import OpenTelemetryExporter, PrometheusExporter, StatsDExporter
+from cacheify.cache.local.async_local_cache import AsyncLocalCache
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.metrics import CacheMetrics, Histogram, instrument, uninstrument
+from cacheify.cache.redis.redis_cache import RedisCache
+
+@pytest.fixture
+def cache():
+    return LocalCache(key='metrics')
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.snapshot() == {'count': 4, 'sum': 56.5, 'buckets': [(1, 2), (10, 3), (float('inf'), 4)]}
+
+def test_operations_hits_and_misses(cache: LocalCache):
+    metrics = instrument(cache)
+    cache.set('key1', 'value1')
+    cache.get('key1')
+    cache.get('missing')
+    cache.get_many(['key1', 'missing', 'other'])
+    cache.pop('key1')
+    with pytest.raises(KeyError):
+        cache.pop('key1')
+    stats = metrics.stats()
+    assert (stats['hits'], stats['misses']) == (3, 4)
+    assert stats['hit_ratio'] == 3 / 7
+    assert stats['operations']['get']['count'] == 2
+    assert stats['operations']['pop'] == {**stats['operations']['pop'], 'count': 2, 'errors': 0}
+    assert stats['operations']['set']['buckets'][-1] == (float('inf'), 1)
+    assert stats['lock_wait']['count'] >= 6
+    assert stats['payload_bytes']['count'] == 1
+    assert cache.metrics is metrics
+
+def test_errors_are_counted(cache: LocalCache):
+    metrics = instrument(cache)
+    with pytest.raises(TypeError):
+        cache.set('key', object())
+    assert metrics.stats()['operations']['set']['errors'] == 1
+
+def test_evictions():
+    cache = LocalCache(key='metrics:bounded', max_entries=2)
+    metrics = instrument(cache)
+    for i in range(5):
+        cache.set(f'key{i}', i)
+    assert metrics.stats()['evictions'] == 3
+    cache.clear()
+    for i in range(3):
+        cache.set(f'key{i}', i)
+    assert metrics.stats()['evictions'] == 4
+
+def test_uninstrument(cache: LocalCache):
+    metrics = instrument(cache)
+    with pytest.raises(ValueError):
+        instrument(cache)
+    uninstrument(cache)
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert metrics.stats()['operations'] == {}
+    assert 'get' not in vars(cache)
+    assert cache.metrics is None
+
+def test_redis_evictions():
+    cache = RedisCache(key='metrics:redis', max_entries=2)
+    cache.clear()
+    metrics = instrument(cache)
+    cache.set_many({f'key{i}': i for i in range(3)})
+    cache.set('key3', 3)
+    stats = metrics.stats()
+    assert stats['evictions'] == 2
+    assert stats['payload_bytes']['count'] == 4
+    cache.clear()
+
+def test_redlock_wait_is_timed():
+    cache = RedisCache(key='metrics:redlock', consistency='redlock')
+    metrics = instrument(cache)
+    cache.set('key', 'value')
+    assert metrics.stats()['lock_wait']['count'] >= 1
+    cache.clear()
+
+@pytest.mark.asyncio
+async def test_async_cache():
+    cache = AsyncLocalCache(key='metrics:async', max_entries=1)
+    metrics = instrument(cache)
+    await cache.set('key1', 'value1')
+    await cache.set('key2', 'value2')
+    assert await cache.get('key2') == 'value2'
+    assert await cache.get('key1') is None
+    stats = metrics.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+    assert stats['operations']['set']['count'] == 2
+
+def test_prometheus_exporter(cache: LocalCache):
+    exporter = PrometheusExporter()
+    instrument(cache, metrics=CacheMetrics('a "quoted" name'), exporters=[exporter])
+    cache.set('key', 'value')
+    cache.get('key')
+    text = exporter.render()
+    assert '# TYPE cacheify_operations_total counter' in text
+    assert 'cacheify_operations_total{cache="a \\"quoted\\" name",operation="get"} 1' in text
+    assert 'cacheify_operation_duration_seconds_bucket{cache="a \\"quoted\\" name",operation="set",le="+Inf"} 1' in text
+    assert 'cacheify_hits_total{cache="a \\"quoted\\" name"} 1' in text
+    assert 'cacheify_refresh_queue_depth{cache="a \\"quoted\\" name"} 0' in text
+    assert text.endswith('\n')
+
+def test_statsd_exporter(cache: LocalCache):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+    exporter = StatsDExporter(host='127.0.0.1', port=server.getsockname()[1])
+    instrument(cache, exporters=[exporter])
+    cache.set('key', 'value')
+    cache.get('key')
+    cache.get('missing')
+    exporter.export()
+    lines = server.recv(65536).decode().split('\n')
+    assert 'cacheify.metrics.get.count:2|c' in lines
+    assert 'cacheify.metrics.hits:1|c' in lines
+    assert any(line.startswith('cacheify.metrics.get.latency:') and line.endswith('|ms') for line in lines)
+    # Only the changes are sent
+    cache.get('key')
+    exporter.export()
+    lines = server.recv(65536).decode().split('\n')
+    assert 'cacheify.metrics.get.count:1|c' in lines
+    assert not any(line.startswith('cacheify.metrics.set.') for line in lines)
+    server.close()
+
+def test_opentelemetry_exporter(cache: LocalCache):
+    pytest.importorskip('opentelemetry.sdk.metrics')
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    reader = InMemoryMetricReader()
+    exporter = OpenTelemetryExporter(meter=MeterProvider(metric_readers=[reader]).get_meter('test'))
+    instrument(cache, exporters=[exporter])
+    cache.set('key', 'value')
+    cache.get('key')
+    points = {
+        (metric.name, tuple(sorted(point.attributes.items()))): point.value
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+        for point in metric.data.data_points
+    }
+    assert points[('cacheify.operations', (('cache', 'metrics'), ('operation', 'get')))] == 1
+    assert points[('cacheify.hits', (('cache', 'metrics'),))] == 1
@@ -0,0 +1,60 @@
+import json
+import pytest
+from cacheify.cache.serializers import CacheCodec, JSONSerializer, Serializer, get_codec
+
+VALUE = {'name': 'cacheify', 'tags': ['a', 'b'], 'count': 3, 'ratio': 0.5, 'missing': None}
+
+@pytest.mark.parametrize('serializer', ['json', 'orjson', 'msgpack', 'pickle'])
+def test_round_trip(serializer):
+    if serializer in ('orjson', 'msgpack'):
+        pytest.importorskip(serializer)
+    codec = CacheCodec(serializer)
+    assert codec.decode(codec.encode(VALUE)) == VALUE
+
+@pytest.mark.parametrize('compression', ['zlib', 'lz4', 'zstd'])
+def test_compression_threshold(compression):
+    pytest.importorskip({'zlib': 'zlib', 'lz4': 'lz4.frame', 'zstd': 'zstandard'}[compression])
+    codec = CacheCodec(compression=compression, compress_threshold=1024)
+    small, large = 'x' * 10, 'x' * 20000
+    assert len(codec.encode(small)) == len(json.dumps(small)) + 1
+    encoded = codec.encode(large)
+    assert len(encoded) < 1000
+    assert codec.decode(encoded) == large
+
+def test_reads_plain_json():
+    codec = CacheCodec('pickle', compression='zlib')
+    assert codec.decode(json.dumps(VALUE)) == VALUE
+    assert codec.decode(json.dumps(VALUE).encode()) == VALUE
+    assert codec.decode(None) is None
+
+def test_reads_other_codecs():
+    pytest.importorskip('msgpack')
+    encoded = CacheCodec('msgpack', compression='zlib', compress_threshold=0).encode(VALUE)
+    assert CacheCodec('json').decode(encoded) == VALUE
+
+def test_refuses_to_unpickle_unless_configured():
+    encoded = CacheCodec('pickle').encode(VALUE)
+    with pytest.raises(ValueError):
+        CacheCodec('json').decode(encoded)
+
+def test_invalid_names():
+    with pytest.raises(ValueError):
+        CacheCodec('yaml')
+    with pytest.raises(ValueError):
+        CacheCodec(compression='brotli')
+
+def test_custom_serializer():
+    class UpperSerializer(Serializer):
+        name = 'upper'
+        format_id = JSONSerializer.format_id
+
+        def dumps(self, value):
+            return json.dumps(value.upper()).encode()
+
+        def loads(self, data):
+            return json.loads(bytes(data))
+
+    codec = get_codec(UpperSerializer())
+    assert codec.decode(codec.encode('abc')) == 'ABC'
+    assert get_codec(None) is None
+    assert get_codec(codec) is codec
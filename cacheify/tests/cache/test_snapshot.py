@@ -0,0 +1,168 @@
+import gzip
+import threading
+import time
+import pytest
+from redis import Redis
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.disk.disk_cache import DiskCache
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.local.shared_cache import SharedMemoryCache
+from cacheify.cache.redis.migration import copy_keys
+from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.snapshot import MAGIC
+from cacheify.cache.warmup import warm_up
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.snapshot')
+
+@pytest.fixture
+def redis_cache():
+    cache = RedisCache(key='test:snapshot')
+    cache.clear()
+    yield cache
+    cache.clear()
+
+def _fill(cache):
+    cache.set('text', 'value')
+    cache.set('document', {'a': [1, 2]})
+    cache.set('short', 'gone soon', ttl=0.5)
+    cache.set('long', 42, ttl=60)
+    cache.set_bytes('raw', b'\x00\x01payload')
+
+def _check(cache):
+    assert cache.get('text') == 'value'
+    assert cache.get('document') == {'a': [1, 2]}
+    assert cache.get('long') == 42
+    assert cache.get_bytes('raw') == b'\x00\x01payload'
+    assert cache.get('short') is None
+
+def test_local_round_trip(path):
+    source = LocalCache()
+    _fill(source)
+    assert source.dump(path) == 5
+    time.sleep(0.6)
+    target = LocalCache()
+    assert target.load(path) == 4
+    _check(target)
+
+def test_keeps_remaining_ttl(path):
+    source = LocalCache()
+    source.set('key', 'value', ttl=0.5)
+    source.dump(path, compress=False)
+    with open(path, 'rb') as snapshot:
+        assert snapshot.read(len(MAGIC)) == MAGIC
+    target = LocalCache()
+    target.load(path)
+    assert target.get('key') == 'value'
+    time.sleep(0.6)
+    assert target.get('key') is None
+
+def test_compressed_and_streamed(path):
+    source = LocalCache()
+    source.set_many({f'key{i}': 'x' * 100 for i in range(5000)})
+    assert source.dump(path) == 5000
+    with gzip.open(path) as snapshot:
+        assert snapshot.read(len(MAGIC)) == MAGIC
+    target = LocalCache()
+    batches = []
+    load_batch = target._import_entries
+    target._import_entries = lambda entries: (batches.append(len(entries)), load_batch(entries))
+    assert target.load(path, batch_size=1000) == 5000
+    assert batches == [1000] * 5
+    assert len(target) == 5000
+
+def test_rejects_other_files(path):
+    with open(path, 'wb') as file:
+        file.write(b'not a snapshot')
+    with pytest.raises(ValueError, match='not a cacheify snapshot'):
+        LocalCache().load(path)
+
+def test_redis_round_trip(redis_cache: RedisCache, path):
+    redis_cache.set_many({f'key{i}': i for i in range(2500)})
+    _fill(redis_cache)  # After the bulk write, so the short TTL cannot run out before the dump
+    assert redis_cache.dump(path) == 2505
+    redis_cache.clear()
+    time.sleep(0.6)
+    assert redis_cache.load(path) == 2504
+    _check(redis_cache)
+    assert redis_cache.get('key2499') == 2499
+
+def test_across_backends_and_serializers(redis_cache: RedisCache, path, tmp_path):
+    _fill(redis_cache)
+    redis_cache.dump(path)
+    time.sleep(0.6)
+    local = LocalCache(serializer='json')
+    local.load(path)
+    _check(local)
+    local.dump(path)
+    disk = DiskCache(path=str(tmp_path / 'cache.sqlite'))
+    disk.load(path)
+    _check(disk)
+    disk.dump(path)
+    disk.close()
+    shared = SharedMemoryCache(path=str(tmp_path / 'shared.cache'), slots=64, slot_size=256, stripes=2)
+    shared.load(path)
+    _check(shared)
+    shared.close()
+
+def test_copy_from_peer(redis_cache: RedisCache):
+    _fill(redis_cache)
+    replica = RedisCache(key='test:snapshot', masters=Redis(db=1))
+    try:
+        assert replica.copy_from(redis_cache._redis) == 2
+        time.sleep(0.6)
+        _check(replica)
+        assert replica._redis.pttl('test:snapshot:expires') == -1
+    finally:
+        replica.clear()
+
+def test_copy_keys_with_scan():
+    source, target = Redis(db=2), Redis(db=3)
+    source.set('peer:a', 1)
+    source.set('peer:b', 2, px=60000)
+    source.set('other', 3)
+    try:
+        assert copy_keys(source, target, match='peer:*', count=1) == 2
+        assert target.get('peer:a') == b'1'
+        assert 0 < target.pttl('peer:b') <= 60000
+        assert target.get('other') is None
+    finally:
+        source.flushdb()
+        target.flushdb()
+
+def test_warm_up(path):
+    cache = LocalCache()
+    cache.set('key0', 'cached')
+    calls = []
+    lock = threading.Lock()
+
+    def loader(keys):
+        with lock:
+            calls.append(keys)
+        return {key: key.upper() for key in keys if key != 'key5'}
+
+    assert warm_up(cache, [f'key{i}' for i in range(20)], loader, batch_size=4, workers=4, ttl=60) == 18
+    assert cache.get('key0') == 'cached'
+    assert cache.get('key19') == 'KEY19'
+    assert cache.get_many(['key5']) == [MISSING]
+    assert sorted(key for batch in calls for key in batch) == sorted(f'key{i}' for i in range(1, 20))
+
+def test_warm_up_from_snapshot(path):
+    source = LocalCache()
+    source.set('key0', 'from snapshot')
+    source.dump(path)
+    cache = LocalCache()
+    assert warm_up(cache, ['key0', 'key1'], lambda keys: {key: 'loaded' for key in keys}, snapshot=path) == 2
+    assert cache.get('key0') == 'from snapshot'
+    assert cache.get('key1') == 'loaded'
+
+def test_warm_up_with_empty_batches():
+    assert warm_up(LocalCache(), ['key0', 'key1'], lambda keys: None if keys == ['key0'] else {'key1': 1}, batch_size=1) == 1
+
+def test_warm_up_reports_loader_errors():
+    def loader(keys):
+        raise RuntimeError('database down')
+
+    with pytest.raises(RuntimeError, match='database down'):
+        warm_up(LocalCache(), ['key'], loader)
@@ -0,0 +1,29 @@
+import pytest
+from cacheify.cache.disk.disk_cache import DiskCache
+from cacheify.cache.local.local_cache import LocalCache
+from cacheify.cache.redis.redis_cache import RedisCache
+
+@pytest.fixture(params=['local', 'disk', 'redis'])
+def cache(request, tmp_path):
+    if request.param == 'local':
+        yield LocalCache()
+    elif request.param == 'disk':
+        cache = DiskCache(path=str(tmp_path / 'cache.sqlite'))
+        yield cache
+        cache.close()
+    else:
+        cache = RedisCache(key='test:tags')
+        cache.clear()
+        yield cache
+        cache.clear()
+
+def test_atomic_updates_keep_tags(cache):
+    cache.set('counter', 1, tags=['x'])
+    cache.set('document', [1], tags=['x'])
+    cache.set('existing', 'a', tags=['x'])
+    assert cache.incr('counter') == 2
+    value, version = cache.get_with_version('document')
+    assert cache.compare_and_set('document', value + [2], version)
+    assert cache.get_or_set('existing', 'b') == 'a'
+    assert cache.invalidate_tags(['x']) == 3
+    assert cache.get_many(['counter', 'document', 'existing'], None) == [None, None, None]
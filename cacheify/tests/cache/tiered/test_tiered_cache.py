@@ -0,0 +1,149 @@
+import time
+import fakeredis
+import pytest
+from cacheify.cache.cacheable import MISSING
+from cacheify.cache.redis.redis_cache import RedisCache
+from cacheify.cache.tiered.tiered_cache import TieredCache
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def make_node(server, **kwargs) -> TieredCache:
+    return TieredCache(l2=RedisCache(key='tiered', masters=fakeredis.FakeStrictRedis(server=server)), **kwargs)
+
+def wait_until(condition, timeout: float=2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+@pytest.fixture
+def cache(server):
+    node = make_node(server)
+    yield node
+    node.close()
+
+def test_set_and_get(cache: TieredCache):
+    cache.set('key1', 'value1')
+    assert cache.get('key1') == 'value1'
+    assert cache.l2.get('key1') == 'value1'
+
+def test_get_populates_l1(cache: TieredCache):
+    cache.l2.set('key2', 'value2')
+    assert cache.get('key2') == 'value2'
+    assert cache.get('key2') == 'value2'
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert (stats['l1_hits'], stats['l2_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['l1_hit_rate'] == pytest.approx(1 / 3)
+
+def test_get_many_mixes_tiers(cache: TieredCache):
+    cache.set('key3', 'value3')
+    cache.l2.set('key4', 'value4')
+    assert cache.get_many(['key4', 'missing', 'key3']) == ['value4', MISSING, 'value3']
+
+def test_l1_entries_expire(server):
+    node = make_node(server, l1_ttl=0.2)
+    node.set('key5', 'value5')
+    node.l2.set('key5', 'changed_behind_our_back')
+    assert node.get('key5') == 'value5'
+    time.sleep(0.3)
+    assert node.get('key5') == 'changed_behind_our_back'
+    node.close()
+
+def test_writes_invalidate_other_nodes(server, cache: TieredCache):
+    other = make_node(server)
+    cache.set('key6', 'value6')
+    assert other.get('key6') == 'value6'
+    cache.set('key6', 'new_value6')
+    assert wait_until(lambda: other.get('key6') == 'new_value6')
+    cache.delete_many(['key6'])
+    assert wait_until(lambda: other.get('key6') is None)
+    other.close()
+
+def test_clear_invalidates_other_nodes(server, cache: TieredCache):
+    other = make_node(server)
+    cache.set('key7', 'value7')
+    assert other.get('key7') == 'value7'
+    cache.clear()
+    assert wait_until(lambda: other.get('key7') is None)
+    assert len(other) == 0
+    other.close()
+
+def test_pop(cache: TieredCache):
+    cache.set('key8', 'value8')
+    assert cache.pop('key8') == 'value8'
+    assert cache.get('key8') is None
+
+def test_bytes_go_through_both_tiers(server, cache: TieredCache):
+    cache.set_bytes('page', b'<html></html>')
+    assert cache.l2.get_bytes('page') == b'<html></html>'
+    other = make_node(server)
+    assert other.get_bytes('page') == b'<html></html>'
+    assert other.l1.get_bytes('page') == b'<html></html>'
+    assert other.get_bytes('missing') is None
+    other.close()
+
+def test_atomic_operations_invalidate_other_nodes(server, cache: TieredCache):
+    other = make_node(server)
+    assert cache.add('key', 1)
+    assert other.get('key') == 1
+    value, version = cache.get_with_version('key')
+    assert cache.compare_and_set('key', value + 1, version)
+    assert wait_until(lambda: other.get('key') == 2)
+    assert cache.incr('key') == 3
+    assert wait_until(lambda: other.get('key') == 3)
+    assert other.get_or_set('key', 0) == 3
+    other.close()
+
+def test_invalidations_reach_other_nodes(server, cache: TieredCache):
+    other = make_node(server)
+    cache.set('user:1', 'a', tags=['team'])
+    cache.set('user:2', 'b')
+    cache.set('page', 'c')
+    assert other.get_many(['user:1', 'user:2', 'page']) == ['a', 'b', 'c']
+    assert cache.invalidate_tags(['team']) == 1
+    assert wait_until(lambda: other.l1.get_many(['user:1']) == [MISSING])
+    assert other.get('user:1') is None
+    assert cache.invalidate_prefix('user:') == 1
+    assert wait_until(lambda: other.l1.get_many(['user:2']) == [MISSING])
+    assert other.get('page') == 'c'
+    other.close()
+
+def test_l1_copies_expire_with_l2_entries(cache: TieredCache):
+    cache.l2.set('short', 'value', ttl=0.3)
+    cache.l2.set_bytes('short_bytes', b'value', ttl=0.3)
+    assert cache.get_many(['short']) == ['value']
+    assert cache.get_bytes('short_bytes') == b'value'
+    time.sleep(0.4)
+    assert cache.get('short') is None
+    assert cache.get_bytes('short_bytes') is None
+
+def test_get_or_set_copies_the_remaining_l2_ttl(cache: TieredCache):
+    cache.l2.set('short', 'value', ttl=0.3)
+    assert cache.get_or_set('short', 'other', ttl=60) == 'value'
+    time.sleep(0.4)
+    assert cache.get('short') is None
+    assert cache.get_or_set('short', 'other') == 'other'
+    assert cache.get('short') == 'other'
+
+def test_l2_without_ttls_is_not_copied_to_l1(tmp_path):
+    from cacheify.cache.local.shared_cache import SharedMemoryCache
+    node = TieredCache(l2=SharedMemoryCache(path=str(tmp_path / 'cache')))
+    node.l2.set('key', 'value')
+    assert node.get('key') == 'value'
+    assert node.l1.get_many(['key']) == [MISSING]
+    node.close()
+    node.l2.close()
+
+def test_bad_invalidation_message_keeps_the_listener(server, cache: TieredCache):
+    other = make_node(server)
+    cache.set('key', 'value')
+    assert other.get('key') == 'value'
+    fakeredis.FakeStrictRedis(server=server).publish('tiered:invalidations', 'not json')
+    cache.set('key', 'new_value')
+    assert wait_until(lambda: other.get('key') == 'new_value')
+    other.close()